@@ -12,11 +12,25 @@ from sqlalchemy import (
     DateTime,
     Text,
 )
+from sqlalchemy import event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from collections import defaultdict
 from datetime import datetime
+from typing import Tuple
 import os
 
+from app.services import price_stats as price_stats_store
+from app.services.dimensions import (
+    DIMENSION_COLUMNS,
+    DIMENSIONS,
+    PENDING_KEY,
+    backfill as backfill_dimensions,
+    brands,
+    categories,
+    publish_pending,
+)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./capsuleos.db")
 
 if DATABASE_URL.startswith("sqlite"):
@@ -27,6 +41,10 @@ else:
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+for _dimension in DIMENSIONS:
+    _dimension.bind(engine)
+price_stats_store.price_stats.bind(engine)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -43,6 +61,7 @@ class ClosetItem(Base):
     user_id = Column(Integer, index=True)
     brand = Column(String)
     category = Column(String)
+    category_id = Column(Integer, index=True)  # categories.id
     color = Column(String)
     description = Column(Text)
     price = Column(Float)
@@ -54,13 +73,17 @@ class Product(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     brand = Column(String, index=True)
+    brand_id = Column(Integer, index=True)  # brands.id
     name = Column(String)
     category = Column(String, index=True)
+    category_id = Column(Integer, index=True)  # categories.id
     price = Column(Float)
     description = Column(Text)
     colors = Column(JSON)  # Array of colors
     image_url = Column(String)
-    link = Column(String)  # Optional shop URL (brand site, product page, etc.)
+    link = Column(
+        String, index=True
+    )  # Optional shop URL (brand site, product page, etc.)
     product_metadata = Column(JSON)  # Additional product data (renamed from metadata)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -89,13 +112,66 @@ class ReviewInsight(Base):
     extracted_at = Column(DateTime, default=datetime.utcnow)
 
 
+class Category(Base):
+    """Category dimension (interned Product/ClosetItem category strings)"""
+
+    __tablename__ = "categories"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    key = Column(String, nullable=False, unique=True)  # normalized name
+
+
+class Brand(Base):
+    """Brand dimension (interned Product brand strings)"""
+
+    __tablename__ = "brands"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    key = Column(String, nullable=False, unique=True)  # normalized name
+
+
+class CategoryPriceStat(Base):
+    """Price quantiles per category plus the sketch they come from
+    (maintained by app.services.price_stats)"""
+
+    __tablename__ = "category_price_stats"
+
+    category_id = Column(Integer, primary_key=True)  # categories.id
+    n = Column(Integer, nullable=False)
+    p10 = Column(Float)
+    p50 = Column(Float)
+    p90 = Column(Float)
+    sketch = Column(Text)  # PriceSketch JSON
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class CatalogMeta(Base):
+    """Single-row table holding the catalog version (bumped on every product write)"""
+
+    __tablename__ = "catalog_meta"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        exists = conn.execute(text("SELECT id FROM catalog_meta WHERE id = 1")).first()
+        if exists is None:
+            conn.execute(
+                text(
+                    "INSERT INTO catalog_meta (id, version, updated_at) VALUES (1, 1, :now)"
+                ),
+                {"now": datetime.utcnow()},
+            )
+            conn.commit()
     # Add 'link' column to products if missing (e.g. after pulling new code)
     if DATABASE_URL.startswith("sqlite"):
-        from sqlalchemy import text
-
         with engine.connect() as conn:
             try:
                 conn.execute(text("SELECT link FROM products LIMIT 1"))
@@ -105,6 +181,141 @@ def init_db():
                     conn.commit()
                 except Exception:
                     pass
+    # Link lookups (scanner) need an index on existing databases too
+    with engine.connect() as conn:
+        conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_products_link ON products (link)")
+        )
+        conn.commit()
+    _migrate_dimensions()
+    _init_price_stats()
+
+
+def _migrate_dimensions():
+    """Add the dimension id columns to older databases, backfill them and load
+    the in-memory maps"""
+    for table, _, id_column, _ in DIMENSION_COLUMNS:
+        columns = {c["name"] for c in inspect(engine).get_columns(table)}
+        with engine.begin() as conn:
+            if id_column not in columns:
+                conn.execute(
+                    text(f"ALTER TABLE {table} ADD COLUMN {id_column} INTEGER")
+                )
+            conn.execute(
+                text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_{id_column} "
+                    f"ON {table} ({id_column})"
+                )
+            )
+    pending = {}
+    with engine.begin() as conn:
+        backfill_dimensions(conn, pending)
+    with engine.connect() as conn:
+        for dimension in DIMENSIONS:
+            dimension.load(conn)
+
+
+def _init_price_stats():
+    """Build the per-category price stats on databases that predate them"""
+    with engine.begin() as conn:
+        has_stats = conn.execute(
+            text("SELECT 1 FROM category_price_stats LIMIT 1")
+        ).first()
+        if (
+            has_stats is None
+            and conn.execute(text("SELECT 1 FROM products LIMIT 1")).first()
+        ):
+            price_stats_store.rebuild(conn)
+    with engine.connect() as conn:
+        price_stats_store.price_stats.load(conn)
+
+
+def get_catalog_version(db) -> Tuple[int, datetime]:
+    """Return (version, updated_at) of the product catalog"""
+    row = db.execute(
+        text("SELECT version, updated_at FROM catalog_meta WHERE id = 1")
+    ).first()
+    if row is None:
+        return 0, datetime(1970, 1, 1)
+    updated_at = row[1]
+    if isinstance(updated_at, str):
+        updated_at = datetime.fromisoformat(updated_at)
+    return int(row[0]), updated_at or datetime(1970, 1, 1)
+
+
+def bump_catalog_version(connection) -> None:
+    """Increment the catalog version (call inside the transaction that changed products)"""
+    connection.execute(
+        text(
+            "UPDATE catalog_meta SET version = version + 1, updated_at = :now WHERE id = 1"
+        ),
+        {"now": datetime.utcnow()},
+    )
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _bump_catalog_version_on_product_write(session, flush_context):
+    """Any ORM insert/update/delete of a Product invalidates catalog ETags"""
+    changed = (session.new, session.dirty, session.deleted)
+    if any(isinstance(obj, Product) for objs in changed for obj in objs):
+        bump_catalog_version(session.connection())
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _assign_dimension_ids(session, flush_context, instances):
+    """Keep category_id / brand_id in step with the strings on ORM writes"""
+    changed = [
+        obj
+        for obj in (*session.new, *session.dirty)
+        if isinstance(obj, (Product, ClosetItem))
+    ]
+    if not changed:
+        return
+    connection = session.connection()
+    pending = session.info.setdefault(PENDING_KEY, {})
+    for obj in changed:
+        obj.category_id = categories.resolve(connection, obj.category, pending)
+        if isinstance(obj, Product):
+            obj.brand_id = brands.resolve(connection, obj.brand, pending)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _update_price_stats(session, flush_context, instances):
+    """Fold product price changes into the per-category price stats"""
+    deltas = defaultdict(list)
+    for obj in session.new:
+        if isinstance(obj, Product):
+            deltas[obj.category_id].append((obj.price, 1))
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            deltas[obj.category_id].append((obj.price, -1))
+    for obj in session.dirty:
+        if not isinstance(obj, Product):
+            continue
+        state = inspect(obj)
+        price, category = state.attrs.price.history, state.attrs.category_id.history
+        old_price = price.deleted[0] if price.deleted else obj.price
+        old_category = category.deleted[0] if category.deleted else obj.category_id
+        if (old_price, old_category) != (obj.price, obj.category_id):
+            deltas[old_category].append((old_price, -1))
+            deltas[obj.category_id].append((obj.price, 1))
+    deltas.pop(None, None)
+    if deltas:
+        price_stats_store.apply_deltas(session.connection(), deltas)
+        session.info[price_stats_store.PENDING_KEY] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_dimension_ids(session):
+    publish_pending(session.info.pop(PENDING_KEY, None))
+    if session.info.pop(price_stats_store.PENDING_KEY, None):
+        price_stats_store.price_stats.invalidate()
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_dimension_ids(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(price_stats_store.PENDING_KEY, None)
 
 
 def get_db():
@@ -0,0 +1,42 @@
+"""
+Lazily constructed service singletons, injected into routes with Depends()
+
+Nothing here is built (or even imported) when `main` is imported, so worker
+boot stays fast; each service is created on its first request and then shared
+by the whole process. Tests can swap them via app.dependency_overrides.
+"""
+
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from app.services.capsule_generator import CapsuleGenerator
+    from app.services.item_analyzer import ItemAnalyzer
+
+_lock = threading.Lock()
+_capsule_generator: Optional["CapsuleGenerator"] = None
+_item_analyzer: Optional["ItemAnalyzer"] = None
+
+
+def get_capsule_generator() -> "CapsuleGenerator":
+    """Process-wide capsule generator (loads templates on first use)"""
+    global _capsule_generator
+    if _capsule_generator is None:
+        with _lock:
+            if _capsule_generator is None:
+                from app.services.capsule_generator import CapsuleGenerator
+
+                _capsule_generator = CapsuleGenerator()
+    return _capsule_generator
+
+
+def get_item_analyzer() -> "ItemAnalyzer":
+    """Process-wide item analyzer"""
+    global _item_analyzer
+    if _item_analyzer is None:
+        with _lock:
+            if _item_analyzer is None:
+                from app.services.item_analyzer import ItemAnalyzer
+
+                _item_analyzer = ItemAnalyzer()
+    return _item_analyzer
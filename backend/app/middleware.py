@@ -0,0 +1,66 @@
+"""
+ASGI middleware for request instrumentation
+"""
+
+from time import perf_counter
+
+from app.services.metrics import metrics
+from app.services.profiler import profiler
+
+
+class TimingMiddleware:
+    """Record per-route latency, status and DB usage for every HTTP request.
+
+    Implemented as plain ASGI (not BaseHTTPMiddleware) to keep per-request
+    overhead to a couple of attribute lookups and a histogram update.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        request_stats, token = metrics.start_request()
+        start = perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by route template (e.g. /api/capsules/{capsule_id}) to bound cardinality
+            route = scope.get("route")
+            metrics.finish_request(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status_code,
+                perf_counter() - start,
+                request_stats,
+                token,
+            )
+
+
+class ProfilingMiddleware:
+    """Sample stacks for a configurable fraction of requests to hot routes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.should_profile(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        token = profiler.start(scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop(token)
@@ -99,3 +99,10 @@ class AnalyzeItemResponse(BaseModel):
     alternatives: List[Dict[str, Any]]
     review_insights: Optional[Dict[str, Any]] = None
     cost_per_wear_estimate: Optional[float] = None
+
+
+class ProfilerConfig(BaseModel):
+    # Fraction of matching requests to profile (0 disables)
+    sample_rate: Optional[float] = Field(None, ge=0, le=1)
+    routes: Optional[List[str]] = None
+    interval_ms: Optional[float] = Field(None, ge=1, le=1000)
@@ -0,0 +1,38 @@
+"""
+Fast JSON encoding and response classes (orjson-based)
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from starlette.responses import Response
+
+__all__ = ["ORJSONResponse", "PreEncodedJSONResponse", "dumps", "sse_event"]
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize a pydantic model or plain JSON-compatible data to UTF-8 bytes"""
+    if isinstance(content, BaseModel):
+        content = content.model_dump()
+    return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    """Encode one Server-Sent Events frame with a JSON data line"""
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+class PreEncodedJSONResponse(Response):
+    """JSON response for bodies that were already serialized (e.g. cached capsules).
+
+    Accepts bytes and sends them untouched; anything else is encoded with orjson.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
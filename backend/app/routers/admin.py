@@ -0,0 +1,60 @@
+"""
+Admin endpoints (runtime profiler control, cache warm-up status)
+"""
+
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from app.models import ProfilerConfig
+from app.services.profiler import profiler
+from app.services.warmup import capsule_warmup
+
+router = APIRouter()
+
+
+def _check_admin(token: Optional[str]) -> None:
+    """Admin routes are disabled unless ADMIN_TOKEN is set and matches X-Admin-Token"""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled")
+    if token != expected:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.get("/profiler")
+def get_profiler(x_admin_token: Optional[str] = Header(None)):
+    """Current profiler settings and sample counts per route"""
+    _check_admin(x_admin_token)
+    return profiler.status()
+
+
+@router.post("/profiler")
+def configure_profiler(
+    config: ProfilerConfig, x_admin_token: Optional[str] = Header(None)
+):
+    """Enable/disable or retune sampling without restarting the worker"""
+    _check_admin(x_admin_token)
+    profiler.configure(
+        sample_rate=config.sample_rate,
+        routes=config.routes,
+        interval_ms=config.interval_ms,
+    )
+    return profiler.status()
+
+
+@router.post("/profiler/flush")
+def flush_profiler(reset: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """Write collapsed-stack files now; optionally clear aggregated samples"""
+    _check_admin(x_admin_token)
+    files = profiler.flush()
+    if reset:
+        profiler.reset()
+    return {"files": files}
+
+
+@router.get("/warmup")
+def get_warmup(x_admin_token: Optional[str] = Header(None)):
+    """Progress of the startup capsule cache warm-up"""
+    _check_admin(x_admin_token)
+    return capsule_warmup.status()
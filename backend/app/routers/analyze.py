@@ -2,17 +2,18 @@
 Item analysis endpoints
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from loguru import logger
+from app.dependencies import get_item_analyzer
 from app.models import AnalyzeItemRequest, AnalyzeItemResponse
-from app.services.item_analyzer import ItemAnalyzer
 
 router = APIRouter()
-item_analyzer = ItemAnalyzer()
 
 
 @router.post("/analyze-item", response_model=AnalyzeItemResponse)
-async def analyze_item(request: AnalyzeItemRequest):
+async def analyze_item(
+    request: AnalyzeItemRequest, item_analyzer=Depends(get_item_analyzer)
+):
     """
     Analyze a product and provide purchase recommendation
     """
@@ -2,16 +2,21 @@
 Capsule generation endpoints
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from loguru import logger
+from app.dependencies import get_capsule_generator
 from app.models import CapsuleRequest, CapsuleResponse
-from app.services.capsule_generator import CapsuleGenerator
+from app.responses import PreEncodedJSONResponse, sse_event
+from app.services import http_cache
+from app.services.cache import capsule_cache
+from app.services.tracing import tracer
 from app.services.style_refiner import refine_style_words
 
 router = APIRouter()
-capsule_generator = CapsuleGenerator()
 
 
+@tracer.traced("capsule.style_descriptors")
 def _get_style_descriptors(request: CapsuleRequest) -> list:
     """Resolve style descriptors from three words (refined) or legacy style_keywords."""
     if request.style_three_words and request.style_three_words.strip():
@@ -22,10 +27,15 @@ def _get_style_descriptors(request: CapsuleRequest) -> list:
 
 
 @router.post("/generate-capsule", response_model=CapsuleResponse)
-async def generate_capsule(request: CapsuleRequest):
+@tracer.traced("POST /api/generate-capsule")
+async def generate_capsule(
+    request: CapsuleRequest, capsule_generator=Depends(get_capsule_generator)
+):
     """
     Generate a quarterly capsule wardrobe based on user preferences.
     Style: use style_three_words (e.g. "relaxed, minimal, French") or legacy style_keywords.
+    The body is returned pre-serialized, so cached capsules skip validation and encoding.
+    Content-Location points at the content-addressed GET variant (/api/capsules/{id}).
     """
     try:
         style_descriptors = _get_style_descriptors(request)
@@ -33,7 +43,7 @@ async def generate_capsule(request: CapsuleRequest):
             f"Generating capsule for {request.quarter}, climate: {request.climate}, style: {style_descriptors}"
         )
 
-        capsule = await capsule_generator.generate(
+        body = await capsule_generator.generate_encoded(
             quarter=request.quarter,
             climate=request.climate,
             style_descriptors=style_descriptors,
@@ -42,7 +52,77 @@ async def generate_capsule(request: CapsuleRequest):
             closet_items=request.closet_items or [],
         )
 
-        return capsule
+        capsule_id = capsule_generator.cache_key(
+            request.quarter,
+            request.climate,
+            style_descriptors,
+            request.budget,
+            request.shopping_preferences,
+        )
+        return PreEncodedJSONResponse(
+            body,
+            headers={
+                "ETag": http_cache.content_etag(body),
+                "Content-Location": f"/api/capsules/{capsule_id}",
+            },
+        )
     except Exception as e:
         logger.error(f"Error generating capsule: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/generate-capsule/stream")
+async def generate_capsule_stream(
+    request: CapsuleRequest, capsule_generator=Depends(get_capsule_generator)
+):
+    """
+    Server-Sent Events variant of /generate-capsule. Events, in order:
+    palette (template palette, capsule_id, slot count), item (one per slot as it
+    resolves, with its slot index), outfit_formulas (final palette, formulas,
+    do_not_buy), coherence_scores, done. Cached capsules replay the same events.
+    """
+    style_descriptors = _get_style_descriptors(request)
+    logger.info(
+        f"Streaming capsule for {request.quarter}, climate: {request.climate}, style: {style_descriptors}"
+    )
+
+    async def events():
+        try:
+            async for event, data in capsule_generator.stream(
+                quarter=request.quarter,
+                climate=request.climate,
+                style_descriptors=style_descriptors,
+                budget=request.budget,
+                shopping_preferences=request.shopping_preferences,
+                closet_items=request.closet_items or [],
+            ):
+                yield sse_event(event, data)
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            logger.error(f"Error streaming capsule: {str(e)}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/capsules/{capsule_id}", response_model=CapsuleResponse)
+async def get_capsule(capsule_id: str, request: Request):
+    """
+    Content-addressed read of a generated capsule, keyed by the request hash.
+    Cacheable by browsers and reverse proxies; 404 once the server-side entry
+    expires (POST /api/generate-capsule again to regenerate it). The ETag hashes
+    the body, so a regenerated capsule revalidates as changed.
+    """
+    body = capsule_cache.get_encoded(capsule_id)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Capsule not found or expired")
+
+    etag = http_cache.content_etag(body)
+    headers = http_cache.cache_headers(etag, http_cache.CAPSULE_CACHE_MAX_AGE)
+    if http_cache.is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return PreEncodedJSONResponse(body, headers=headers)
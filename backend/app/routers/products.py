@@ -4,44 +4,65 @@ Product catalog endpoints — list products for Browse / Shop
 
 from typing import Optional
 
-from fastapi import APIRouter, Query
-from app.database import SessionLocal, Product
+from fastapi import APIRouter, Query, Request, Response
+from app.database import SessionLocal, Product, get_catalog_version
+from app.responses import ORJSONResponse
+from app.services import http_cache
+from app.services.dimensions import categories
 
 router = APIRouter()
 
 
 @router.get("/products")
 def list_products(
+    request: Request,
     category: Optional[str] = Query(None, description="Filter by category"),
     limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
 ):
-    """List products for Browse page. Optional category filter (Top, Bottom, Outerwear, Shoes, Dress, Accessory)."""
+    """List products for Browse page. Optional category filter (Top, Bottom, Outerwear, Shoes, Dress, Accessory).
+
+    Responses carry an ETag / Last-Modified derived from the catalog version, so
+    repeat visits revalidate with If-None-Match and get a 304 until the next reseed.
+    """
     db = SessionLocal()
     try:
+        version, updated_at = get_catalog_version(db)
+        etag = http_cache.make_etag("products", version, category, limit, offset)
+        headers = http_cache.cache_headers(
+            etag, http_cache.CATALOG_CACHE_MAX_AGE, last_modified=updated_at
+        )
+        if http_cache.is_not_modified(request, etag, updated_at):
+            return Response(status_code=304, headers=headers)
+
         q = db.query(Product)
         if category:
-            q = q.filter(Product.category == category)
+            # 0 matches no row: unknown categories list nothing
+            q = q.filter(Product.category_id == (categories.lookup(category) or 0))
         total = q.count()
         products = q.order_by(Product.id).offset(offset).limit(limit).all()
-        return {
-            "products": [
-                {
-                    "id": p.id,
-                    "brand": p.brand,
-                    "name": p.name,
-                    "category": p.category,
-                    "price": p.price,
-                    "description": p.description,
-                    "colors": p.colors or [],
-                    "image_url": p.image_url,
-                    "link": p.link,
-                }
-                for p in products
-            ],
-            "total": total,
-            "limit": limit,
-            "offset": offset,
-        }
+        # Return the response directly so the payload skips jsonable_encoder
+        return ORJSONResponse(
+            {
+                "products": [
+                    {
+                        "id": p.id,
+                        "brand": p.brand,
+                        "name": p.name,
+                        "category": p.category,
+                        "price": p.price,
+                        "description": p.description,
+                        "colors": p.colors or [],
+                        "image_url": p.image_url,
+                        "link": p.link,
+                    }
+                    for p in products
+                ],
+                "total": total,
+                "limit": limit,
+                "offset": offset,
+            },
+            headers=headers,
+        )
     finally:
         db.close()
@@ -0,0 +1,455 @@
+"""
+Approximate nearest-neighbour index (IVF-Flat) over product embeddings, used
+for scanner alternatives at catalog scale.
+
+Vectors are clustered with k-means into `nlist` inverted lists and stored
+contiguously by list, so a query scores the centroids, probes the `nprobe`
+closest lists and runs one matrix-vector product over their rows. Category
+and price-window filters are applied to the probed rows before scoring; if
+the filters leave fewer than k hits, more lists are probed.
+
+The index is built offline (scripts/build_ann_index.py), memory-mapped at
+startup, and updated incrementally: products inserted through the ORM (or
+passed to submit_rows by Core bulk writers such as the crawler) are encoded
+on a background thread into a small brute-force "delta" segment that is
+searched alongside the lists until the next rebuild.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import event
+
+from app.services.embedding_service import get_embedding_service
+from app.services.embeddings import EMBEDDING_MODEL, product_text, top_k
+
+ANN_INDEX_DIR = os.getenv("ANN_INDEX_DIR", "./ann_index")
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+
+_ARRAYS = ("centroids", "offsets", "ids", "vectors", "categories", "prices")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def kmeans(
+    vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """Spherical k-means (cosine) returning L2-normalized centroids"""
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        # Re-seed empty clusters with random points
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted-file index with category / price filtering"""
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        ids: np.ndarray,
+        vectors: np.ndarray,
+        categories: np.ndarray,
+        prices: np.ndarray,
+        category_names: List[str],
+        model_name: str = EMBEDDING_MODEL,
+    ):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.vectors = vectors
+        self.categories = categories
+        self.prices = prices
+        self.category_names = list(category_names)
+        self.category_code: Dict[str, int] = {
+            name: code for code, name in enumerate(self.category_names)
+        }
+        self.model_name = model_name
+        self.dim = centroids.shape[1]
+        # Delta segment for products added since the build
+        self._delta_ids: List[int] = []
+        self._delta_vectors: List[np.ndarray] = []
+        self._delta_categories: List[int] = []
+        self._delta_prices: List[float] = []
+        self._delta_row: Dict[int, int] = {}
+        self._removed: set = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(
+        cls,
+        ids: Sequence[int],
+        vectors: np.ndarray,
+        categories: Sequence[Optional[str]],
+        prices: Sequence[Optional[float]],
+        nlist: Optional[int] = None,
+        train_size: int = 50_000,
+        dtype: str = "float16",
+        model_name: str = EMBEDDING_MODEL,
+    ) -> "IVFIndex":
+        """Cluster vectors and lay them out contiguously per inverted list"""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        n = len(vectors)
+        nlist = nlist or max(1, int(4 * np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(n, size=min(n, train_size), replace=False)]
+        centroids = kmeans(sample, nlist)
+
+        # Assign in chunks to bound memory on large catalogs
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 65_536):
+            chunk = vectors[start : start + 65_536]
+            assign[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        category_names = sorted({c for c in categories if c})
+        code = {name: i for i, name in enumerate(category_names)}
+        category_codes = np.array([code.get(c, -1) for c in categories], dtype=np.int16)
+        price_arr = np.array(
+            [p if p is not None else np.nan for p in prices], dtype=np.float32
+        )
+
+        return cls(
+            centroids=centroids,
+            offsets=offsets,
+            ids=np.asarray(ids, dtype=np.int64)[order],
+            vectors=vectors[order].astype(dtype),
+            categories=category_codes[order],
+            prices=price_arr[order],
+            category_names=category_names,
+            model_name=model_name,
+        )
+
+    def save(self, index_dir: str = ANN_INDEX_DIR) -> None:
+        """Write one .npy per array (memory-mappable) plus meta.json"""
+        os.makedirs(index_dir, exist_ok=True)
+        for name in _ARRAYS:
+            tmp = os.path.join(index_dir, f"{name}.tmp.npy")
+            np.save(tmp, getattr(self, name))
+            os.replace(tmp, os.path.join(index_dir, f"{name}.npy"))
+        with open(os.path.join(index_dir, "meta.json"), "w") as f:
+            json.dump(
+                {
+                    "model": self.model_name,
+                    "dim": self.dim,
+                    "nlist": len(self.centroids),
+                    "count": len(self.ids),
+                    "category_names": self.category_names,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, index_dir: str = ANN_INDEX_DIR) -> Optional["IVFIndex"]:
+        meta_path = os.path.join(index_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+            for name in _ARRAYS
+        }
+        # Centroids are scanned on every query; keep them in RAM
+        arrays["centroids"] = np.asarray(arrays["centroids"], dtype=np.float32)
+        arrays["offsets"] = np.asarray(arrays["offsets"])
+        logger.info(f"Loaded ANN index: {meta['count']} vectors, {meta['nlist']} lists")
+        return cls(
+            category_names=meta["category_names"], model_name=meta["model"], **arrays
+        )
+
+    @property
+    def max_id(self) -> int:
+        base = int(self.ids.max()) if len(self.ids) else 0
+        return max([base] + self._delta_ids)
+
+    def add(
+        self,
+        ids: Sequence[int],
+        vectors: np.ndarray,
+        categories: Sequence[Optional[str]],
+        prices: Sequence[Optional[float]],
+    ) -> None:
+        """Add (or replace) products in the delta segment"""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            for pid, vec, cat, price in zip(ids, vectors, categories, prices):
+                pid = int(pid)
+                self._removed.add(pid)  # hide any older copy in the lists
+                if cat and cat not in self.category_code:
+                    self.category_code[cat] = len(self.category_names)
+                    self.category_names.append(cat)
+                row = self._delta_row.get(pid)
+                if row is None:
+                    self._delta_row[pid] = len(self._delta_ids)
+                    self._delta_ids.append(pid)
+                    self._delta_vectors.append(vec)
+                    self._delta_categories.append(self.category_code.get(cat, -1))
+                    self._delta_prices.append(np.nan if price is None else float(price))
+                else:
+                    self._delta_vectors[row] = vec
+                    self._delta_categories[row] = self.category_code.get(cat, -1)
+                    self._delta_prices[row] = np.nan if price is None else float(price)
+
+    def _filter_mask(
+        self,
+        categories: np.ndarray,
+        prices: np.ndarray,
+        category: Optional[int],
+        price_range: Optional[Tuple[float, float]],
+    ) -> np.ndarray:
+        mask = np.ones(len(categories), dtype=bool)
+        if category is not None:
+            mask &= categories == category
+        if price_range is not None:
+            low, high = price_range
+            mask &= (prices >= low) & (prices <= high)
+        return mask
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        category: Optional[str] = None,
+        price_range: Optional[Tuple[float, float]] = None,
+        nprobe: int = ANN_NPROBE,
+        exclude_ids: Iterable[int] = (),
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (product_id, cosine similarity) pairs, best first"""
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        category_code = None
+        if category is not None:
+            category_code = self.category_code.get(category)
+            if category_code is None:
+                return []
+        excluded = set(int(i) for i in exclude_ids)
+        exclude = excluded | self._removed
+
+        nlist = len(self.centroids)
+        order = np.argsort(-(self.centroids @ query))
+        hits: Dict[int, float] = {}
+        probed = 0
+        probe = min(nprobe, nlist)
+        while True:
+            lists = order[probed:probe]
+            probed = probe
+            if len(lists):
+                rows = np.concatenate(
+                    [np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists]
+                )
+                mask = self._filter_mask(
+                    self.categories[rows], self.prices[rows], category_code, price_range
+                )
+                rows = rows[mask]
+                if len(rows):
+                    scores = self.vectors[rows].astype(np.float32) @ query
+                    for idx in top_k(scores, k + len(exclude)):
+                        pid = int(self.ids[rows[idx]])
+                        if pid not in exclude:
+                            hits[pid] = float(scores[idx])
+            if len(hits) >= k or probed >= nlist:
+                break
+            probe = min(nlist, probe * 2)
+
+        # Delta segment: brute force (small until the next rebuild)
+        with self._lock:
+            if self._delta_ids:
+                delta_vectors = np.stack(self._delta_vectors)
+                mask = self._filter_mask(
+                    np.asarray(self._delta_categories),
+                    np.asarray(self._delta_prices, dtype=np.float32),
+                    category_code,
+                    price_range,
+                )
+                scores = delta_vectors @ query
+                for i in np.flatnonzero(mask):
+                    pid = self._delta_ids[i]
+                    if pid in excluded:
+                        continue
+                    hits[pid] = float(scores[i])
+
+        ranked = sorted(hits.items(), key=lambda kv: kv[1], reverse=True)
+        return ranked[:k]
+
+
+class IncrementalUpdater:
+    """Encode newly inserted products on a daemon thread and add them to the index"""
+
+    def __init__(self, index: IVFIndex, encoder):
+        self.index = index
+        self.encoder = encoder
+        self._queue: "queue.Queue[List[Dict[str, Any]]]" = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="ann-updater", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, records: List[Dict[str, Any]]) -> None:
+        if records:
+            self._queue.put(records)
+
+    def _run(self) -> None:
+        while True:
+            records = self._queue.get()
+            try:
+                texts = [r["text"] for r in records]
+                vectors = np.asarray(self.encoder.encode(texts), dtype=np.float32)
+                self.index.add(
+                    [r["id"] for r in records],
+                    vectors,
+                    [r["category"] for r in records],
+                    [r["price"] for r in records],
+                )
+                logger.debug(f"ANN index: added {len(records)} products")
+            except Exception as e:
+                logger.warning(f"ANN incremental update failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self) -> None:
+        """Block until queued records are indexed (tests / scripts)"""
+        self._queue.join()
+
+
+def product_record(product) -> Dict[str, Any]:
+    return {
+        "id": product.id,
+        "text": product_text(
+            product.name, product.description, product.product_metadata
+        ),
+        "category": product.category,
+        "price": product.price,
+    }
+
+
+def row_record(row: Dict[str, Any]) -> Dict[str, Any]:
+    """product_record for a plain products-table row dict (with its id)"""
+    return {
+        "id": row["id"],
+        "text": product_text(
+            row.get("name"), row.get("description"), row.get("product_metadata")
+        ),
+        "category": row.get("category"),
+        "price": row.get("price"),
+    }
+
+
+_index: Optional[IVFIndex] = None
+_updater: Optional[IncrementalUpdater] = None
+_encoder = None
+
+
+def get_ann_index() -> Optional[IVFIndex]:
+    return _index
+
+
+def get_updater() -> Optional[IncrementalUpdater]:
+    return _updater
+
+
+def load_ann_index(index_dir: str = ANN_INDEX_DIR, encoder=None) -> Optional[IVFIndex]:
+    """Load the index at startup, catch up on products inserted since the build,
+    and start incremental updates. No-op when no index has been built."""
+    global _index, _updater, _encoder
+    try:
+        index = IVFIndex.load(index_dir)
+    except Exception as e:
+        logger.warning(f"Could not load ANN index: {e}")
+        return None
+    if index is None:
+        return None
+    if encoder is None:
+        encoder = get_embedding_service(index.model_name)
+    _index = index
+    _encoder = encoder
+    if encoder:
+        _updater = IncrementalUpdater(index, encoder)
+        _catch_up(index, _updater)
+    return index
+
+
+def submit_rows(rows: Iterable[Dict[str, Any]]) -> None:
+    """Queue committed product rows for incremental indexing. For writes that
+    bypass the ORM session hooks (Core bulk insert/update); no-op without a
+    loaded index."""
+    if _updater is not None:
+        _updater.submit([row_record(row) for row in rows])
+
+
+def similar_products(
+    text: str,
+    k: int = 3,
+    category: Optional[str] = None,
+    price_range: Optional[Tuple[float, float]] = None,
+    exclude_ids: Iterable[int] = (),
+) -> Optional[List[Tuple[int, float]]]:
+    """Search the loaded index for products similar to `text` (None when no index
+    or encoder is available, so callers can fall back to SQL)"""
+    if _index is None or not _encoder or not text:
+        return None
+    query = np.asarray(_encoder.encode([text]), dtype=np.float32)[0]
+    return _index.search(
+        query, k=k, category=category, price_range=price_range, exclude_ids=exclude_ids
+    )
+
+
+def _catch_up(index: IVFIndex, updater: IncrementalUpdater) -> None:
+    from app.database import SessionLocal, Product
+
+    db = SessionLocal()
+    try:
+        newer = db.query(Product).filter(Product.id > index.max_id).all()
+        if newer:
+            logger.info(f"ANN index: indexing {len(newer)} products added since build")
+            updater.submit([product_record(p) for p in newer])
+    finally:
+        db.close()
+
+
+def _register_session_hooks() -> None:
+    from app.database import SessionLocal, Product
+
+    @event.listens_for(SessionLocal, "after_flush")
+    def _collect_products(session, flush_context):
+        changed = [
+            obj
+            for obj in list(session.new) + list(session.dirty)
+            if isinstance(obj, Product)
+        ]
+        if changed and _updater is not None:
+            session.info.setdefault("ann_pending", []).extend(changed)
+
+    @event.listens_for(SessionLocal, "after_commit")
+    def _index_products(session):
+        pending = session.info.pop("ann_pending", None)
+        if pending and _updater is not None:
+            _updater.submit([product_record(p) for p in pending])
+
+    @event.listens_for(SessionLocal, "after_rollback")
+    def _drop_pending(session):
+        session.info.pop("ann_pending", None)
+
+
+_register_session_hooks()
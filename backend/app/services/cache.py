@@ -21,6 +21,9 @@ class TTLCache:
         """
         self.cache: Dict[str, Dict[str, Any]] = {}
         self.ttl_seconds = ttl_seconds
+        # Lookup counters (exported via /api/metrics)
+        self.hits = 0
+        self.misses = 0
 
     def _generate_key(self, data: Dict[str, Any]) -> str:
         """Generate cache key from request data"""
@@ -28,27 +31,58 @@ class TTLCache:
         sorted_data = json.dumps(data, sort_keys=True)
         return hashlib.md5(sorted_data.encode()).hexdigest()
 
-    def get(self, key: str) -> Optional[Any]:
-        """Get value from cache if not expired"""
-        if key not in self.cache:
+    def _get_entry(
+        self, key: str, require: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get raw cache entry if present and not expired (and, with require,
+        holding a non-None value for that field; otherwise it counts as a miss)"""
+        entry = self.cache.get(key)
+        if entry is None or (require is not None and entry.get(require) is None):
+            self.misses += 1
             return None
 
-        entry = self.cache[key]
         expires_at = entry.get("expires_at")
 
         if expires_at and datetime.now() > expires_at:
             # Expired, remove from cache
             del self.cache[key]
             logger.debug(f"Cache entry expired: {key}")
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get value from cache if not expired"""
+        entry = self._get_entry(key)
+        if entry is None:
             return None
 
         logger.debug(f"Cache hit: {key}")
         return entry.get("value")
 
-    def set(self, key: str, value: Any) -> None:
-        """Set value in cache with TTL"""
+    def get_encoded(self, key: str) -> Optional[bytes]:
+        """Get the pre-serialized JSON body stored alongside a value, if any"""
+        entry = self._get_entry(key, require="encoded")
+        if entry is None:
+            return None
+
+        logger.debug(f"Cache hit (encoded): {key}")
+        return entry["encoded"]
+
+    def set(self, key: str, value: Any, encoded: Optional[bytes] = None) -> None:
+        """
+        Set value in cache with TTL
+
+        Args:
+            key: Cache key
+            value: Value to store
+            encoded: Optional pre-serialized JSON body for the value, served
+                as-is on cache hits so responses skip validation and encoding
+        """
         expires_at = datetime.now() + timedelta(seconds=self.ttl_seconds)
-        self.cache[key] = {"value": value, "expires_at": expires_at}
+        self.cache[key] = {"value": value, "encoded": encoded, "expires_at": expires_at}
         logger.debug(f"Cache set: {key} (expires at {expires_at})")
 
     def clear(self) -> None:
@@ -12,11 +12,41 @@ from app.models import (
 )
 from app.services.scoring import CapsuleScorer
 from app.services.cache import capsule_cache
+from app.services.dimensions import brands, categories
+from app.services.price_stats import price_stats
+from app.services.metrics import metrics
+from app.services.profiler import profiler
+from app.services.product_records import ProductRecord, query_records
+from app.services.capsule_templates import (
+    CompiledSlot,
+    CompiledTemplate,
+    compile_templates,
+)
+from app.responses import dumps
+from app.services.tracing import tracer
+from app.services.llm import LLMError, generate_capsule_content, get_llm_client
 from app.database import SessionLocal, Product
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
 import json
 import os
 
+import numpy as np
+
+# Per slot, best value / best quality are picked among this many most on-style products
+STYLE_TOP_K = int(os.getenv("STYLE_TOP_K", "20"))
+# Worker threads resolving capsule slots concurrently (each holds its own DB session)
+CAPSULE_SLOT_WORKERS = int(os.getenv("CAPSULE_SLOT_WORKERS", "12"))
+
+# Preferred by _select_best_quality
+PREMIUM_BRANDS = ["Aritzia", "Everlane", "Reformation"]
+
+_slot_executor = ThreadPoolExecutor(
+    max_workers=CAPSULE_SLOT_WORKERS, thread_name_prefix="capsule-slot"
+)
+
 
 class CapsuleGenerator:
     """Generate quarterly capsule wardrobes"""
@@ -27,7 +57,10 @@ class CapsuleGenerator:
             os.path.dirname(__file__), "../../data/capsule_templates.json"
         )
         self._load_templates()
-        self._load_category_mapping()
+        self._compile_templates()
+        # (quarter, climate) -> {slot: budget share}, valid for one price_stats.version
+        self._price_shares: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._price_shares_version = None
 
     def _load_templates(self):
         """Load capsule templates"""
@@ -53,42 +86,14 @@ class CapsuleGenerator:
         logger.warning(f"Templates file not found, using defaults")
         self.templates = self._default_templates()
 
-    def _load_category_mapping(self):
-        """Map template item names to database categories"""
-        self.category_mapping = {
-            "trench_coat": ["Outerwear"],
-            "wool_coat": ["Outerwear"],
-            "sweater": ["Top", "Sweater"],
-            "jeans": ["Bottom", "Jeans"],
-            "boots": ["Shoes"],
-            "scarf": ["Accessory"],
-            "turtleneck": ["Top"],
-            "blazer": ["Outerwear"],
-            "trousers": ["Bottom"],
-            "loafers": ["Shoes"],
-            "bag": ["Accessory"],
-            "belt": ["Accessory"],
-            "tee": ["Top", "Tee"],
-            "trousers": ["Bottom"],
-            "sneakers": ["Shoes"],
-            "tote": ["Accessory"],
-            "cardigan": ["Top", "Sweater"],
-            "midi_dress": ["Dress"],
-            "sandals": ["Shoes"],
-            "linen_shirt": ["Top"],
-            "wide_leg_pants": ["Bottom"],
-            "crossbody": ["Accessory"],
-            "sunglasses": ["Accessory"],
-            "sundress": ["Dress"],
-            "shorts": ["Bottom"],
-            "tank": ["Top"],
-            "hat": ["Accessory"],
-            "linen_pants": ["Bottom"],
-            "kimono": ["Outerwear"],
-            "bikini": ["Top"],
-            "coverup": ["Outerwear"],
-            "gloves": ["Accessory"],
-        }
+    def _compile_templates(self):
+        """Compile every (quarter, climate) pair into resolved slot lists"""
+        self.template_table = compile_templates(self.templates)
+        for (quarter, climate), template in self.template_table.items():
+            if template.substitutions:
+                logger.debug(
+                    f"Template {quarter}/{climate} substitutions: {template.substitutions}"
+                )
 
     def _default_templates(self):
         """Default capsule templates"""
@@ -103,20 +108,15 @@ class CapsuleGenerator:
             },
         }
 
-    async def generate(
+    def cache_key(
         self,
         quarter: Quarter,
         climate: Climate,
         style_descriptors: List[str],
         budget: float,
         shopping_preferences: List[str],
-        closet_items: List[Dict[str, Any]],
-    ) -> CapsuleResponse:
-        """
-        Generate capsule wardrobe with caching.
-        style_descriptors: refined from user's "three words" or legacy keywords.
-        """
-        # Create cache key from request parameters
+    ) -> str:
+        """Hash of the request parameters that determine a capsule"""
         cache_key_data = {
             "quarter": quarter.value,
             "climate": climate.value,
@@ -125,40 +125,317 @@ class CapsuleGenerator:
             "shopping_preferences": sorted(shopping_preferences),
             # Note: closet_items excluded from cache key for now
         }
-        cache_key = capsule_cache._generate_key(cache_key_data)
+        llm = get_llm_client()
+        if llm is not None:
+            # LLM-generated capsules differ from heuristic ones
+            cache_key_data["llm"] = llm.identity
+        return capsule_cache._generate_key(cache_key_data)
 
-        # Check cache
-        cached_result = capsule_cache.get(cache_key)
-        if cached_result:
-            logger.info(f"Returning cached capsule for {quarter}")
-            return cached_result
+    async def generate(
+        self,
+        quarter: Quarter,
+        climate: Climate,
+        style_descriptors: List[str],
+        budget: float,
+        shopping_preferences: List[str],
+        closet_items: List[Dict[str, Any]],
+    ) -> CapsuleResponse:
+        """
+        Generate capsule wardrobe with caching.
+        style_descriptors: refined from user's "three words" or legacy keywords.
+        """
+        cache_key = self.cache_key(
+            quarter, climate, style_descriptors, budget, shopping_preferences
+        )
+
+        with tracer.span("capsule.generate", quarter=quarter.value) as span:
+            # Check cache
+            cached_result = capsule_cache.get(cache_key)
+            span.set_attribute("cache_hit", bool(cached_result))
+            if cached_result:
+                logger.info(f"Returning cached capsule for {quarter}")
+                return cached_result
+
+            result = await self._build_capsule(
+                quarter,
+                climate,
+                style_descriptors,
+                budget,
+                shopping_preferences,
+                closet_items,
+            )
+
+            # Cache the result together with its serialized body
+            capsule_cache.set(cache_key, result, encoded=dumps(result))
+
+            return result
+
+    async def generate_encoded(
+        self,
+        quarter: Quarter,
+        climate: Climate,
+        style_descriptors: List[str],
+        budget: float,
+        shopping_preferences: List[str],
+        closet_items: List[Dict[str, Any]],
+    ) -> bytes:
+        """
+        Same as generate(), but returns the serialized JSON body.
+        Cache hits return the stored bytes without revalidation or re-encoding.
+        """
+        cache_key = self.cache_key(
+            quarter, climate, style_descriptors, budget, shopping_preferences
+        )
+
+        with tracer.span("capsule.generate", quarter=quarter.value) as span:
+            cached_body = capsule_cache.get_encoded(cache_key)
+            span.set_attribute("cache_hit", cached_body is not None)
+            if cached_body is not None:
+                logger.info(f"Returning cached capsule for {quarter}")
+                return cached_body
+
+            result = await self._build_capsule(
+                quarter,
+                climate,
+                style_descriptors,
+                budget,
+                shopping_preferences,
+                closet_items,
+            )
+
+            with tracer.span("capsule.encode"):
+                body = dumps(result)
+            capsule_cache.set(cache_key, result, encoded=body)
 
+            return body
+
+    async def _build_capsule(
+        self,
+        quarter: Quarter,
+        climate: Climate,
+        style_descriptors: List[str],
+        budget: float,
+        shopping_preferences: List[str],
+        closet_items: List[Dict[str, Any]],
+    ) -> CapsuleResponse:
+        """Run the full generation pipeline (no caching)"""
         logger.info(
             f"Generating {quarter} capsule for {climate} climate, style: {style_descriptors}"
         )
 
-        # Get base template
-        template_key = str(quarter.value)
-        template = self.templates.get(template_key, self.templates.get("Q1"))
+        # Compiled template for this quarter and climate
+        template = self._get_template(quarter, climate)
+
+        # LLM generation when enabled (falls back to the catalog on any failure)
+        items, outfit_formulas = await self._generate_llm_items(
+            quarter, climate, style_descriptors, budget, shopping_preferences, template
+        )
 
         # Generate items from database
-        items = await self._generate_items(
-            template=template,
-            climate=climate,
-            style_descriptors=style_descriptors,
-            budget=budget,
-            shopping_preferences=shopping_preferences,
-            closet_items=closet_items,
+        if items is None:
+            with tracer.span("capsule.generate_items") as span:
+                items = await self._generate_items(
+                    template=template,
+                    climate=climate,
+                    style_descriptors=style_descriptors,
+                    budget=budget,
+                    shopping_preferences=shopping_preferences,
+                    closet_items=closet_items,
+                )
+                span.set_attribute("items", len(items))
+
+        return self._finish_capsule(
+            quarter, template, items, outfit_formulas, closet_items
+        )
+
+    async def stream(
+        self,
+        quarter: Quarter,
+        climate: Climate,
+        style_descriptors: List[str],
+        budget: float,
+        shopping_preferences: List[str],
+        closet_items: List[Dict[str, Any]],
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Generate a capsule as a sequence of (event, payload) pairs:
+        palette (template palette) -> item per slot as it resolves -> outfit_formulas
+        (final palette, formulas, do_not_buy) -> coherence_scores -> done.
+        Cached capsules are replayed in the same format.
+        """
+        cache_key = self.cache_key(
+            quarter, climate, style_descriptors, budget, shopping_preferences
+        )
+
+        cached_result = capsule_cache.get(cache_key)
+        if cached_result:
+            logger.info(f"Replaying cached capsule stream for {quarter}")
+            for event in self._replay_events(cache_key, cached_result):
+                yield event
+            return
+
+        with tracer.span("capsule.stream", quarter=quarter.value) as span:
+            template = self._get_template(quarter, climate)
+            yield "palette", {
+                "capsule_id": cache_key,
+                "quarter": quarter.value,
+                "palette": template.palette,
+                "slots": len(template.slots),
+                "cached": False,
+            }
+
+            items, outfit_formulas = await self._generate_llm_items(
+                quarter,
+                climate,
+                style_descriptors,
+                budget,
+                shopping_preferences,
+                template,
+            )
+            if items is not None:
+                for index, item in enumerate(items):
+                    yield "item", {"index": index, "item": item.model_dump()}
+            else:
+                items = [None] * len(template.slots)
+                async for index, item in self._iter_slots(
+                    template, style_descriptors, budget, shopping_preferences
+                ):
+                    items[index] = item
+                    yield "item", {"index": index, "item": item.model_dump()}
+
+            result = self._finish_capsule(
+                quarter, template, items, outfit_formulas, closet_items
+            )
+            capsule_cache.set(cache_key, result, encoded=dumps(result))
+            span.set_attribute("items", len(items))
+
+        for event in self._summary_events(cache_key, result):
+            yield event
+
+    def _replay_events(
+        self, cache_key: str, result: CapsuleResponse
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Stream events for an already generated capsule"""
+        events = [
+            (
+                "palette",
+                {
+                    "capsule_id": cache_key,
+                    "quarter": result.quarter,
+                    "palette": result.palette,
+                    "slots": len(result.items),
+                    "cached": True,
+                },
+            )
+        ]
+        events.extend(
+            ("item", {"index": index, "item": item.model_dump()})
+            for index, item in enumerate(result.items)
         )
+        return events + self._summary_events(cache_key, result)
+
+    def _summary_events(
+        self, cache_key: str, result: CapsuleResponse
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Trailing stream events, emitted once every slot has resolved"""
+        return [
+            (
+                "outfit_formulas",
+                {
+                    "palette": result.palette,
+                    "outfit_formulas": result.outfit_formulas,
+                    "do_not_buy": result.do_not_buy,
+                },
+            ),
+            ("coherence_scores", {"coherence_scores": result.coherence_scores}),
+            ("done", {"capsule_id": cache_key}),
+        ]
+
+    def _slot_price_shares(
+        self, template: CompiledTemplate
+    ) -> Dict[CompiledSlot, float]:
+        """Budget share per slot, proportional to each slot category's median
+        price; the template's static shares when any median is unknown"""
+        version = price_stats.current_version()
+        if version != self._price_shares_version:
+            self._price_shares, self._price_shares_version = {}, version
+        key = (template.quarter, template.climate)
+        shares = self._price_shares.get(key)
+        if shares is None:
+            medians = {
+                slot: next(
+                    filter(
+                        None, map(price_stats.median, categories.ids(slot.categories))
+                    ),
+                    None,
+                )
+                for slot in template.slots
+            }
+            if medians and all(medians.values()):
+                total = sum(medians.values())
+                shares = {slot: m / total for slot, m in medians.items()}
+            else:
+                shares = {slot: slot.price_share for slot in template.slots}
+            self._price_shares[key] = shares
+        return shares
+
+    def _get_template(self, quarter: Quarter, climate: Climate) -> CompiledTemplate:
+        """Compiled template for a quarter and climate (Q1 when missing)"""
+        template = self.template_table.get((quarter.value, climate.value))
+        if template is None:
+            template = self.template_table[("Q1", climate.value)]
+        return template
+
+    async def _generate_llm_items(
+        self,
+        quarter: Quarter,
+        climate: Climate,
+        style_descriptors: List[str],
+        budget: float,
+        shopping_preferences: List[str],
+        template: CompiledTemplate,
+    ) -> Tuple[Optional[List[CapsuleItem]], Optional[List[str]]]:
+        """Items and outfit formulas from the LLM; (None, None) when disabled or failed"""
+        llm = get_llm_client()
+        if llm is None:
+            return None, None
+        with tracer.span("capsule.llm", model=llm.identity) as span:
+            try:
+                return await generate_capsule_content(
+                    llm,
+                    quarter.value,
+                    climate.value,
+                    style_descriptors,
+                    budget,
+                    shopping_preferences,
+                    template.palette,
+                )
+            except LLMError as e:
+                logger.warning(f"LLM capsule generation failed, using catalog: {e}")
+                span.set_attribute("fallback", True)
+        return None, None
 
+    def _finish_capsule(
+        self,
+        quarter: Quarter,
+        template: CompiledTemplate,
+        items: List[CapsuleItem],
+        outfit_formulas: Optional[List[str]],
+        closet_items: List[Dict[str, Any]],
+    ) -> CapsuleResponse:
+        """Palette, outfit formulas, do_not_buy and coherence scores for resolved items"""
         # Extract palette from selected items
-        palette = self._extract_palette(items, template["palette"])
+        with tracer.span("capsule.palette"):
+            palette = self._extract_palette(items, template.palette)
 
         # Generate outfit formulas
-        outfit_formulas = self._generate_outfit_formulas(items, palette)
+        if not outfit_formulas:
+            with tracer.span("capsule.outfit_formulas"):
+                outfit_formulas = self._generate_outfit_formulas(items, palette)
 
         # Compute do_not_buy list
-        do_not_buy = self._compute_do_not_buy(closet_items, items)
+        with tracer.span("capsule.do_not_buy"):
+            do_not_buy = self._compute_do_not_buy(closet_items, items)
 
         # Compute coherence scores (palette + versatility + overlap)
         score_input = [
@@ -168,7 +445,7 @@ class CapsuleGenerator:
             score_input, palette, closet_items or []
         )
 
-        result = CapsuleResponse(
+        return CapsuleResponse(
             quarter=quarter.value,
             palette=palette,
             outfit_formulas=outfit_formulas,
@@ -177,14 +454,9 @@ class CapsuleGenerator:
             coherence_scores=coherence_scores,
         )
 
-        # Cache the result
-        capsule_cache.set(cache_key, result)
-
-        return result
-
     async def _generate_items(
         self,
-        template: Dict,
+        template: CompiledTemplate,
         climate: Climate,
         style_descriptors: List[str],
         budget: float,
@@ -192,113 +464,267 @@ class CapsuleGenerator:
         closet_items: List[Dict[str, Any]],
     ) -> List[CapsuleItem]:
         """Generate capsule items with best value/quality options from database."""
-        db = SessionLocal()
+        capsule_items = [None] * len(template.slots)
+        async for index, item in self._iter_slots(
+            template, style_descriptors, budget, shopping_preferences
+        ):
+            capsule_items[index] = item
+        return capsule_items
+
+    async def _iter_slots(
+        self,
+        template: CompiledTemplate,
+        style_descriptors: List[str],
+        budget: float,
+        shopping_preferences: List[str],
+    ) -> AsyncIterator[Tuple[int, CapsuleItem]]:
+        """
+        Resolve template slots concurrently on the slot pool (one DB session
+        each), yielding (slot index, item) in completion order.
+        """
+        # Style query vector, computed once per capsule (None without an index)
+        # on the slot pool: unknown descriptors go through the encoder
+        loop = asyncio.get_running_loop()
+        style_query = None
+        if style_descriptors:
+            style_query = await loop.run_in_executor(
+                _slot_executor,
+                contextvars.copy_context().run,
+                self._style_query,
+                style_descriptors,
+            )
+
+        async def resolve(index: int, slot: CompiledSlot):
+            # Copy the context so slot spans nest under the current trace
+            context = contextvars.copy_context()
+            item = await loop.run_in_executor(
+                _slot_executor,
+                context.run,
+                self._resolve_slot,
+                slot,
+                template,
+                budget,
+                shopping_preferences,
+                style_query,
+            )
+            return index, item
+
+        tasks = [
+            asyncio.ensure_future(resolve(index, slot))
+            for index, slot in enumerate(template.slots)
+        ]
         try:
-            template_items = template.get("items", [])[:12]  # Limit to 12 items
-            capsule_items = []
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
 
-            for template_item in template_items:
-                # Map template item to database categories
-                categories = self.category_mapping.get(
-                    template_item, [template_item.capitalize()]
-                )
+    def _style_query(self, style_descriptors: List[str]):
+        """Style vector for the descriptors (runs in a worker thread); numpy and
+        the index are only imported once a capsule is generated"""
+        from app.services.embeddings import get_style_index
 
-                # Query products matching categories
-                products = (
-                    db.query(Product).filter(Product.category.in_(categories)).all()
-                )
+        style_index = get_style_index()
+        if style_index is None:
+            return None
+        with profiler.attach(), tracer.span("capsule.style_vector"):
+            return style_index.style_vector(style_descriptors)
 
-                if not products:
-                    # Fallback: create placeholder item
-                    capsule_items.append(
-                        self._create_placeholder_item(
-                            template_item, budget, shopping_preferences
-                        )
-                    )
-                    continue
-
-                # Filter by shopping preferences if provided
-                if shopping_preferences:
-                    preferred_products = [
-                        p for p in products if p.brand in shopping_preferences
-                    ]
-                    if preferred_products:
-                        products = preferred_products
-
-                # Select best value and best quality
-                best_value = self._select_best_value(products, budget / 12)
-                best_quality = self._select_best_quality(products, budget / 12)
-
-                # Get colors from selected items
-                item_colors = []
-                if best_value and best_value.colors:
-                    item_colors.extend(best_value.colors)
-                if best_quality and best_quality.colors:
-                    item_colors.extend(best_quality.colors)
-
-                best_value_image = (
-                    getattr(best_value, "image_url", None) if best_value else None
+    def _resolve_slot(
+        self,
+        slot: CompiledSlot,
+        template: CompiledTemplate,
+        budget: float,
+        shopping_preferences: List[str],
+        style_query=None,
+    ) -> CapsuleItem:
+        """Resolve one slot in its own session (runs in a worker thread)"""
+        db = SessionLocal()
+        try:
+            with profiler.attach(), tracer.span("capsule.slot", slot=slot.key) as span:
+                return self._generate_slot(
+                    db,
+                    span,
+                    slot,
+                    template,
+                    budget,
+                    shopping_preferences,
+                    style_query,
                 )
-                best_quality_image = (
-                    getattr(best_quality, "image_url", None) if best_quality else None
+        finally:
+            db.close()
+
+    def _generate_slot(
+        self,
+        db,
+        span,
+        slot: CompiledSlot,
+        template: CompiledTemplate,
+        budget: float,
+        shopping_preferences: List[str],
+        style_query=None,
+    ) -> CapsuleItem:
+        """Pick best value / best quality products for one template slot."""
+        category_ids = categories.ids(slot.categories)
+        target_price = budget * self._slot_price_shares(template)[slot]
+
+        # Query products matching categories
+        with tracer.span(
+            "capsule.slot.query", categories=slot.categories
+        ) as query_span:
+            # Shared mmap'd snapshot while within its staleness bounds, else SQL
+            from app.services.catalog_snapshot import get_catalog_snapshot
+
+            snapshot = get_catalog_snapshot()
+            if snapshot is not None:
+                candidates = snapshot.category_rows(category_ids)
+            else:
+                # Unpriced rows can't be ranked (the snapshot path drops NaN)
+                candidates = query_records(
+                    db,
+                    Product.category_id.in_(category_ids),
+                    Product.price.isnot(None),
                 )
+            source = "snapshot" if snapshot is not None else "sql"
+            query_span.set_attribute("rows", len(candidates))
+            query_span.set_attribute("source", source)
+            metrics.record_read_source("capsule.slot", source)
+
+        if not len(candidates):
+            # Fallback: create placeholder item
+            span.set_attribute("placeholder", True)
+            return self._create_placeholder_item(
+                slot, budget, shopping_preferences, target_price
+            )
+
+        # Select best value and best quality
+        if snapshot is not None:
+            best_value, best_quality = self._select_from_snapshot(
+                snapshot, candidates, target_price, shopping_preferences, style_query
+            )
+        else:
+            best_value, best_quality = self._select_from_records(
+                candidates, target_price, shopping_preferences, style_query
+            )
 
-                capsule_items.append(
-                    CapsuleItem(
-                        category=self._format_category_name(template_item),
-                        item_name=template_item.replace("_", " ").title(),
-                        best_value=ItemOption(
-                            brand=best_value.brand if best_value else "Generic",
-                            name=(
-                                best_value.name
-                                if best_value
-                                else f"{template_item} (Value)"
-                            ),
-                            price=best_value.price if best_value else budget / 12 * 0.6,
-                            image_url=best_value_image,
-                            link=(
-                                getattr(best_value, "link", None)
-                                if best_value
-                                else None
-                            ),
-                            reason="Great quality-to-price ratio",
-                        ),
-                        best_quality=ItemOption(
-                            brand=best_quality.brand if best_quality else "Generic",
-                            name=(
-                                best_quality.name
-                                if best_quality
-                                else f"{template_item} (Quality)"
-                            ),
-                            price=(
-                                best_quality.price
-                                if best_quality
-                                else budget / 12 * 1.4
-                            ),
-                            image_url=best_quality_image,
-                            link=(
-                                getattr(best_quality, "link", None)
-                                if best_quality
-                                else None
-                            ),
-                            reason="Premium materials and construction",
-                        ),
-                        palette_colors=(
-                            list(set(item_colors))[:3]
-                            if item_colors
-                            else template["palette"][:2]
-                        ),
-                    )
+        # Get colors from selected items
+        item_colors = []
+        if best_value and best_value.colors:
+            item_colors.extend(best_value.colors)
+        if best_quality and best_quality.colors:
+            item_colors.extend(best_quality.colors)
+
+        return CapsuleItem(
+            category=slot.label,
+            item_name=slot.label,
+            best_value=ItemOption(
+                brand=best_value.brand if best_value else "Generic",
+                name=(best_value.name if best_value else f"{slot.key} (Value)"),
+                price=best_value.price if best_value else target_price * 0.6,
+                image_url=best_value.image_url if best_value else None,
+                link=best_value.link if best_value else None,
+                reason="Great quality-to-price ratio",
+            ),
+            best_quality=ItemOption(
+                brand=best_quality.brand if best_quality else "Generic",
+                name=(best_quality.name if best_quality else f"{slot.key} (Quality)"),
+                price=(best_quality.price if best_quality else target_price * 1.4),
+                image_url=best_quality.image_url if best_quality else None,
+                link=best_quality.link if best_quality else None,
+                reason="Premium materials and construction",
+            ),
+            palette_colors=(
+                list(set(item_colors))[:3] if item_colors else template.palette[:2]
+            ),
+        )
+
+    def _select_from_records(
+        self,
+        products: List[ProductRecord],
+        target_price: float,
+        shopping_preferences: List[str],
+        style_query=None,
+    ) -> Tuple[Optional[ProductRecord], Optional[ProductRecord]]:
+        """Best value and best quality among a slot's products"""
+        # Filter by shopping preferences if provided
+        if shopping_preferences:
+            preferred_ids = set(brands.ids(shopping_preferences))
+            preferred_products = [p for p in products if p.brand_id in preferred_ids]
+            if preferred_products:
+                products = preferred_products
+
+        # Narrow to the products closest to the user's style descriptors
+        style_index = None
+        if style_query is not None:
+            from app.services.embeddings import get_style_index
+
+            style_index = get_style_index()
+        if style_index is not None:
+            with tracer.span("capsule.slot.style_rank", candidates=len(products)):
+                products = style_index.filter_by_style(
+                    products, style_query, keep=STYLE_TOP_K
                 )
 
-            return capsule_items[:12]  # Ensure max 12 items
+        return (
+            self._select_best_value(products, target_price),
+            self._select_best_quality(products, target_price),
+        )
 
-        finally:
-            db.close()
+    def _select_from_snapshot(
+        self,
+        snapshot,
+        rows: np.ndarray,
+        target_price: float,
+        shopping_preferences: List[str],
+        style_query=None,
+    ) -> Tuple[Optional[ProductRecord], Optional[ProductRecord]]:
+        """_select_from_records on the snapshot's columns: same picks, but only
+        the two winning rows become ProductRecords"""
+        rows = rows[~np.isnan(snapshot.prices[rows])]  # unpriced rows can't rank
+        if not len(rows):
+            return None, None
+        if shopping_preferences:
+            preferred = np.isin(
+                snapshot.brand_ids[rows], brands.ids(shopping_preferences)
+            )
+            if preferred.any():
+                rows = rows[preferred]
+
+        style_index = None
+        if style_query is not None and len(rows) > STYLE_TOP_K:
+            from app.services.embeddings import get_style_index
+
+            style_index = get_style_index()
+        if style_index is not None:
+            with tracer.span("capsule.slot.style_rank", candidates=len(rows)):
+                ids = snapshot.ids[rows]
+                ranked = style_index.rank(ids.tolist(), style_query, STYLE_TOP_K)
+                if ranked:
+                    order = np.argsort(ids)
+                    rows = rows[order[np.searchsorted(ids, ranked, sorter=order)]]
+
+        # Best value: closest to 70% of target among those within 20% of it,
+        # else the cheapest (argmin/argmax keep the first row on ties, like
+        # _select_best_value / _select_best_quality)
+        prices = snapshot.prices[rows]
+        near = prices <= target_price * 1.2
+        if near.any():
+            value_row = rows[
+                np.argmin(np.where(near, np.abs(prices - target_price * 0.7), np.inf))
+            ]
+        else:
+            value_row = rows[np.argmin(prices)]
+
+        # Best quality: highest priced premium brand, else highest priced
+        premium = np.isin(snapshot.brand_ids[rows], brands.ids(PREMIUM_BRANDS))
+        pool = rows[premium] if premium.any() else rows
+        quality_row = pool[np.argmax(snapshot.prices[pool])]
+        return snapshot.record(int(value_row)), snapshot.record(int(quality_row))
 
     def _select_best_value(
-        self, products: List[Product], target_price: float
-    ) -> Optional[Product]:
+        self, products: List[ProductRecord], target_price: float
+    ) -> Optional[ProductRecord]:
         """Select product with best value (price closest to target, lower preferred)"""
         if not products:
             return None
@@ -321,16 +747,16 @@ class CapsuleGenerator:
         return best_product
 
     def _select_best_quality(
-        self, products: List[Product], target_price: float
-    ) -> Optional[Product]:
+        self, products: List[ProductRecord], target_price: float
+    ) -> Optional[ProductRecord]:
         """Select product with best quality (higher price, premium brands)"""
         if not products:
             return None
 
         # Prefer higher-priced items (proxy for quality)
         # Also prefer premium brands
-        premium_brands = ["Aritzia", "Everlane", "Reformation"]
-        premium_products = [p for p in products if p.brand in premium_brands]
+        premium_ids = set(brands.ids(PREMIUM_BRANDS))
+        premium_products = [p for p in products if p.brand_id in premium_ids]
 
         if premium_products:
             # Select highest priced premium product
@@ -340,17 +766,23 @@ class CapsuleGenerator:
         return max(products, key=lambda p: p.price)
 
     def _create_placeholder_item(
-        self, template_item: str, budget: float, shopping_preferences: List[str]
+        self,
+        slot: CompiledSlot,
+        budget: float,
+        shopping_preferences: List[str],
+        target_price: Optional[float] = None,
     ) -> CapsuleItem:
         """Create placeholder item when no products found"""
-        category = self._format_category_name(template_item)
+        category = slot.label
+        if target_price is None:
+            target_price = budget * slot.price_share
         return CapsuleItem(
             category=category,
-            item_name=template_item.replace("_", " ").title(),
+            item_name=category,
             best_value=ItemOption(
                 brand=shopping_preferences[0] if shopping_preferences else "Generic",
                 name=f"Best Value {category}",
-                price=budget / 12 * 0.6,
+                price=target_price * 0.6,
                 image_url=None,
                 reason="Great quality-to-price ratio",
             ),
@@ -361,17 +793,13 @@ class CapsuleGenerator:
                     else "Premium"
                 ),
                 name=f"Best Quality {category}",
-                price=budget / 12 * 1.4,
+                price=target_price * 1.4,
                 image_url=None,
                 reason="Premium materials and construction",
             ),
             palette_colors=["black", "white"],
         )
 
-    def _format_category_name(self, template_item: str) -> str:
-        """Format template item name to readable category"""
-        return template_item.replace("_", " ").title()
-
     def _extract_palette(
         self, items: List[CapsuleItem], default_palette: List[str]
     ) -> List[str]:
@@ -435,12 +863,15 @@ class CapsuleGenerator:
         if not closet_items:
             return []
 
-        # Check for duplicate categories
-        closet_categories = {item.get("category", "").lower() for item in closet_items}
+        # Check for duplicate categories (normalized names; closet categories
+        # needn't exist in the catalog)
+        closet_categories = {
+            categories.key(item.get("category")) for item in closet_items
+        }
         duplicates = [
             item.category
             for item in new_items
-            if item.category.lower() in closet_categories
+            if categories.key(item.category) in closet_categories
         ]
 
         return duplicates[:3]  # Return top 3
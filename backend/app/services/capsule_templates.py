@@ -0,0 +1,206 @@
+"""
+Compiled capsule template table
+
+Templates (data/capsule_templates.json) are keyed by quarter only; each names
+the climate it was written for. At load, every (quarter, climate) pair is
+compiled once into an immutable slot list:
+  - climate substitutions swap slots that don't suit the requested climate
+    (e.g. wool coat -> linen shirt when a cold-weather quarter is asked for hot)
+  - catalog categories are resolved per slot
+  - each slot gets its share of the budget (outerwear and shoes get more)
+Generation then only reads attributes off CompiledSlot objects.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from app.models import Climate
+
+# Template slot -> catalog categories
+SLOT_CATEGORIES = {
+    "trench_coat": ("Outerwear",),
+    "wool_coat": ("Outerwear",),
+    "sweater": ("Top", "Sweater"),
+    "jeans": ("Bottom", "Jeans"),
+    "boots": ("Shoes",),
+    "scarf": ("Accessory",),
+    "turtleneck": ("Top",),
+    "blazer": ("Outerwear",),
+    "trousers": ("Bottom",),
+    "loafers": ("Shoes",),
+    "bag": ("Accessory",),
+    "belt": ("Accessory",),
+    "tee": ("Top", "Tee"),
+    "sneakers": ("Shoes",),
+    "tote": ("Accessory",),
+    "cardigan": ("Top", "Sweater"),
+    "midi_dress": ("Dress",),
+    "sandals": ("Shoes",),
+    "linen_shirt": ("Top",),
+    "wide_leg_pants": ("Bottom",),
+    "crossbody": ("Accessory",),
+    "sunglasses": ("Accessory",),
+    "sundress": ("Dress",),
+    "shorts": ("Bottom",),
+    "tank": ("Top",),
+    "hat": ("Accessory",),
+    "linen_pants": ("Bottom",),
+    "kimono": ("Outerwear",),
+    "bikini": ("Top",),
+    "coverup": ("Outerwear",),
+    "gloves": ("Accessory",),
+}
+
+# Requested climate -> slot -> replacements in order of preference. Applied only
+# when the template was written for a different climate; the first replacement
+# not already in the capsule wins (the slot is kept if all are taken).
+CLIMATE_SUBSTITUTIONS = {
+    Climate.HOT.value: {
+        "wool_coat": ("linen_shirt", "kimono"),
+        "trench_coat": ("kimono", "coverup"),
+        "blazer": ("linen_shirt", "coverup"),
+        "sweater": ("tank", "tee"),
+        "turtleneck": ("tee", "tank"),
+        "cardigan": ("coverup", "kimono"),
+        "jeans": ("shorts", "linen_pants"),
+        "trousers": ("linen_pants", "wide_leg_pants"),
+        "boots": ("sandals", "sneakers"),
+        "loafers": ("sandals", "sneakers"),
+        "scarf": ("sunglasses", "hat"),
+        "gloves": ("hat", "sunglasses"),
+    },
+    Climate.WARM.value: {
+        "wool_coat": ("trench_coat", "blazer"),
+        "sweater": ("cardigan", "linen_shirt"),
+        "turtleneck": ("tee", "linen_shirt"),
+        "jeans": ("wide_leg_pants", "linen_pants"),
+        "boots": ("sneakers", "sandals"),
+        "scarf": ("sunglasses", "hat"),
+        "gloves": ("sunglasses", "crossbody"),
+    },
+    Climate.MODERATE.value: {
+        "wool_coat": ("trench_coat", "blazer"),
+        "gloves": ("scarf", "crossbody"),
+        "bikini": ("tee", "linen_shirt"),
+        "tank": ("tee",),
+        "shorts": ("jeans", "wide_leg_pants"),
+        "sundress": ("midi_dress",),
+        "coverup": ("cardigan", "blazer"),
+    },
+    Climate.COLD.value: {
+        "tank": ("turtleneck", "sweater"),
+        "tee": ("turtleneck", "sweater"),
+        "bikini": ("sweater", "cardigan"),
+        "linen_shirt": ("sweater", "turtleneck"),
+        "shorts": ("jeans", "trousers"),
+        "linen_pants": ("trousers", "jeans"),
+        "wide_leg_pants": ("trousers", "jeans"),
+        "sundress": ("midi_dress",),
+        "kimono": ("wool_coat", "trench_coat"),
+        "coverup": ("cardigan", "wool_coat"),
+        "sandals": ("boots", "loafers"),
+        "sunglasses": ("scarf", "gloves"),
+    },
+}
+
+# Relative budget weight per catalog category (first category of a slot)
+CATEGORY_BUDGET_WEIGHTS = {
+    "Outerwear": 1.8,
+    "Shoes": 1.3,
+    "Dress": 1.2,
+    "Bottom": 1.0,
+    "Top": 0.8,
+    "Accessory": 0.6,
+}
+
+MAX_SLOTS = 12
+
+
+class CompiledSlot:
+    """One resolved capsule slot"""
+
+    __slots__ = ("key", "label", "categories", "price_share")
+
+    def __init__(self, key: str, categories: Tuple[str, ...], price_share: float):
+        self.key = key
+        # Display name, used for both CapsuleItem.category and .item_name
+        self.label = key.replace("_", " ").title()
+        self.categories = categories
+        # Fraction of the capsule budget targeted for this slot
+        self.price_share = price_share
+
+    def __repr__(self) -> str:
+        return f"CompiledSlot({self.key!r}, {self.categories}, {self.price_share:.3f})"
+
+
+class CompiledTemplate:
+    """Slots and palette for one (quarter, climate) pair"""
+
+    __slots__ = ("quarter", "climate", "palette", "slots", "substitutions")
+
+    def __init__(
+        self,
+        quarter: str,
+        climate: str,
+        palette: List[str],
+        slots: Tuple[CompiledSlot, ...],
+        substitutions: Dict[str, str],
+    ):
+        self.quarter = quarter
+        self.climate = climate
+        self.palette = palette
+        self.slots = slots
+        # Original slot -> substitute, for logging / debugging
+        self.substitutions = substitutions
+
+
+def _slot_categories(key: str) -> Tuple[str, ...]:
+    return SLOT_CATEGORIES.get(key, (key.replace("_", " ").title(),))
+
+
+def _substitute(
+    keys: List[str], template_climate: Optional[str], climate: str
+) -> Tuple[List[str], Dict[str, str]]:
+    """Apply climate substitution rules to a template's slot keys"""
+    if template_climate == climate:
+        return list(keys), {}
+    rules = CLIMATE_SUBSTITUTIONS.get(climate, {})
+    resolved: List[str] = []
+    substitutions: Dict[str, str] = {}
+    for key in keys:
+        taken = set(resolved) | set(keys)
+        replacement = next(
+            (alt for alt in rules.get(key, ()) if alt not in taken), None
+        )
+        if replacement is not None:
+            substitutions[key] = replacement
+            key = replacement
+        resolved.append(key)
+    return resolved, substitutions
+
+
+def compile_template(template: Dict, quarter: str, climate: str) -> CompiledTemplate:
+    """Compile one template for a requested climate"""
+    keys, substitutions = _substitute(
+        template.get("items", [])[:MAX_SLOTS], template.get("climate"), climate
+    )
+    categories = [_slot_categories(key) for key in keys]
+    weights = [CATEGORY_BUDGET_WEIGHTS.get(c[0], 1.0) for c in categories]
+    total = sum(weights) or 1.0
+    slots = tuple(
+        CompiledSlot(key, cats, weight / total)
+        for key, cats, weight in zip(keys, categories, weights)
+    )
+    return CompiledTemplate(
+        quarter, climate, list(template["palette"]), slots, substitutions
+    )
+
+
+def compile_templates(
+    templates: Dict[str, Dict],
+) -> Dict[Tuple[str, str], CompiledTemplate]:
+    """(quarter, climate) -> CompiledTemplate for every template and climate"""
+    return {
+        (quarter, climate.value): compile_template(template, quarter, climate.value)
+        for quarter, template in templates.items()
+        for climate in Climate
+    }
@@ -0,0 +1,255 @@
+"""
+Columnar (Parquet) export of the catalog and reviews
+
+scripts/export_parquet.py streams products, reviews and review_insights out of
+the database in batches (yield_per, so memory stays flat at any catalog size)
+into hive-partitioned Parquet datasets for merchandising analyses (pandas,
+DuckDB, Spark):
+
+    <out>/manifest.json                      catalog version + row counts
+    <out>/products/category=Top/part-0.parquet
+    <out>/reviews/product_bucket=3/part-0.parquet
+    <out>/review_insights/product_bucket=3/part-0.parquet
+
+Reviews are bucketed by product_id % PRODUCT_BUCKETS so per-product joins read
+one partition. The products dataset loads straight back into the catalog
+snapshot (scripts/build_catalog_snapshot.py --from-parquet) without SQL.
+pyarrow is imported lazily; it is only needed by these tools.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence
+import json
+import os
+import shutil
+
+from loguru import logger
+from sqlalchemy import select
+
+from app.database import Product, Review, ReviewInsight, get_catalog_version
+from app.services.product_records import ProductRecord
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+PRODUCT_BUCKETS = 16
+MANIFEST = "manifest.json"
+
+# table -> (model, exported columns, JSON-encoded columns, partition column)
+TABLES = {
+    "products": (
+        Product,
+        (
+            "id",
+            "brand",
+            "brand_id",
+            "name",
+            "category",
+            "category_id",
+            "price",
+            "description",
+            "colors",
+            "image_url",
+            "link",
+            "product_metadata",
+            "created_at",
+        ),
+        ("product_metadata",),
+        "category",
+    ),
+    "reviews": (
+        Review,
+        ("id", "product_id", "rating", "text", "reviewer_info", "created_at"),
+        ("reviewer_info",),
+        "product_bucket",
+    ),
+    "review_insights": (
+        ReviewInsight,
+        (
+            "id",
+            "product_id",
+            "fit_signal",
+            "quality_score",
+            "fabric_quality",
+            "common_complaints",
+            "review_sentiment",
+            "extracted_at",
+        ),
+        (),
+        "product_bucket",
+    ),
+}
+
+
+def _schema(table: str):
+    """Arrow schema for an exported table"""
+    import pyarrow as pa
+
+    json_text, ts = pa.string(), pa.timestamp("us")
+    fields = {
+        "products": [
+            ("id", pa.int64()),
+            ("brand", pa.string()),
+            ("brand_id", pa.int32()),
+            ("name", pa.string()),
+            ("category", pa.string()),
+            ("category_id", pa.int32()),
+            ("price", pa.float64()),
+            ("description", pa.string()),
+            ("colors", pa.list_(pa.string())),
+            ("image_url", pa.string()),
+            ("link", pa.string()),
+            ("product_metadata", json_text),
+            ("created_at", ts),
+        ],
+        "reviews": [
+            ("id", pa.int64()),
+            ("product_id", pa.int64()),
+            ("rating", pa.int8()),
+            ("text", pa.string()),
+            ("reviewer_info", json_text),
+            ("created_at", ts),
+            ("product_bucket", pa.int16()),
+        ],
+        "review_insights": [
+            ("id", pa.int64()),
+            ("product_id", pa.int64()),
+            ("fit_signal", pa.string()),
+            ("quality_score", pa.float64()),
+            ("fabric_quality", pa.string()),
+            ("common_complaints", pa.list_(pa.string())),
+            ("review_sentiment", pa.float64()),
+            ("extracted_at", ts),
+            ("product_bucket", pa.int16()),
+        ],
+    }[table]
+    return pa.schema(fields)
+
+
+def _partitioning(table: str):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    column = TABLES[table][3]
+    return ds.partitioning(pa.schema([_schema(table).field(column)]), flavor="hive")
+
+
+def _batches(db, table: str, batch_rows: int):
+    """Stream a table as Arrow record batches"""
+    import pyarrow as pa
+
+    model, columns, json_columns, partition = TABLES[table]
+    schema = _schema(table)
+    statement = (
+        select(*(getattr(model, c) for c in columns))
+        .order_by(model.id)
+        .execution_options(yield_per=batch_rows)
+    )
+    result = db.execute(statement)
+    for rows in result.partitions():
+        data = dict(zip(columns, (list(values) for values in zip(*rows))))
+        for column in json_columns:
+            data[column] = [
+                None if v is None else json.dumps(v, default=str) for v in data[column]
+            ]
+        if partition == "product_bucket":
+            data[partition] = [
+                None if pid is None else pid % PRODUCT_BUCKETS
+                for pid in data["product_id"]
+            ]
+        yield pa.RecordBatch.from_pydict(data, schema=schema)
+
+
+def export_table(db, table: str, out_dir: str, batch_rows: int = EXPORT_BATCH_ROWS):
+    """Write one table as a hive-partitioned Parquet dataset; returns rows written"""
+    import pyarrow.dataset as ds
+
+    target = os.path.join(out_dir, table)
+    tmp = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)  # empty tables still get a (readable, empty) dataset
+    written = 0
+
+    def counted():
+        nonlocal written
+        for batch in _batches(db, table, batch_rows):
+            written += batch.num_rows
+            yield batch
+
+    ds.write_dataset(
+        counted(),
+        tmp,
+        schema=_schema(table),
+        format="parquet",
+        partitioning=_partitioning(table),
+        basename_template="part-{i}.parquet",
+        max_rows_per_group=batch_rows,
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return written
+
+
+def export_catalog(
+    db,
+    out_dir: str,
+    tables: Sequence[str] = tuple(TABLES),
+    batch_rows: int = EXPORT_BATCH_ROWS,
+) -> Dict:
+    """Export tables and write the manifest (last, so readers never see a
+    manifest for a half-written export); returns the manifest"""
+    os.makedirs(out_dir, exist_ok=True)
+    # Version first: a write during the export makes the export stale, not wrong
+    version, _ = get_catalog_version(db)
+    counts = {}
+    for table in tables:
+        counts[table] = export_table(db, table, out_dir, batch_rows)
+        logger.info(f"Exported {counts[table]} {table} rows")
+    manifest = {
+        "catalog_version": version,
+        "exported_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "product_buckets": PRODUCT_BUCKETS,
+        "tables": counts,
+    }
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(export_dir: str) -> Dict:
+    with open(os.path.join(export_dir, MANIFEST)) as f:
+        return json.load(f)
+
+
+def open_dataset(export_dir: str, table: str):
+    """pyarrow Dataset over an exported table (partition column restored)"""
+    import pyarrow.dataset as ds
+
+    return ds.dataset(
+        os.path.join(export_dir, table),
+        format="parquet",
+        partitioning=_partitioning(table),
+    )
+
+
+def iter_product_records(
+    export_dir: str, batch_rows: int = EXPORT_BATCH_ROWS
+) -> Iterator[ProductRecord]:
+    """ProductRecords from an exported products dataset"""
+    fields: List[str] = list(ProductRecord.__slots__)
+    dataset = open_dataset(export_dir, "products")
+    for batch in dataset.to_batches(columns=fields, batch_size=batch_rows):
+        columns = batch.to_pydict()
+        yield from map(ProductRecord, *(columns[f] for f in fields))
+
+
+def snapshot_from_export(
+    export_dir: str, snapshot_path: str, catalog_version: Optional[int] = None
+) -> Dict:
+    """Build the catalog snapshot from an export; returns the snapshot header"""
+    from app.services.catalog_snapshot import write_snapshot
+
+    if catalog_version is None:
+        catalog_version = read_manifest(export_dir)["catalog_version"]
+    return write_snapshot(
+        snapshot_path, iter_product_records(export_dir), catalog_version
+    )
@@ -0,0 +1,335 @@
+"""
+Memory-mapped columnar catalog snapshot, shared across uvicorn workers
+
+scripts/build_catalog_snapshot.py writes the products table into one file of
+columnar arrays plus a string table. Every worker maps it read-only, so the
+pages live once in the OS page cache however many workers there are. Rows are
+sorted by category_id, so the products of a capsule slot are a contiguous
+range.
+
+File layout (little-endian):
+    0   8   magic b"CAPSNAP\\0"
+    8   4   format version (uint32)
+    12  4   header length H (uint32)
+    16  H   JSON header: catalog_version, rows, strings, built_at and the
+            section table {name: [offset, dtype, count]}
+    ...     sections, each 64-byte aligned
+
+The builder writes to a temp file and renames it over the old one. Workers
+re-stat the path every CATALOG_SNAPSHOT_CHECK_SECONDS and map the new file
+when its inode changes; reload is a reference swap, and in-flight readers keep
+the old mapping until they drop it. Every catalog write bumps the database
+version, so a snapshot is served with bounded staleness: while it is at most
+CATALOG_SNAPSHOT_MAX_LAG versions behind and has been behind for at most
+CATALOG_SNAPSHOT_MAX_STALE_SECONDS (rows written since then are missing
+until the next rebuild). Past either bound callers fall back to SQL; the
+lag and the per-source read counts are exported as metrics.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+from loguru import logger
+
+from app.services.metrics import metrics
+from app.services.product_records import ProductRecord
+
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", "./catalog.snap")
+CATALOG_SNAPSHOT_CHECK_SECONDS = float(os.getenv("CATALOG_SNAPSHOT_CHECK_SECONDS", "5"))
+CATALOG_SNAPSHOT_MAX_LAG = int(os.getenv("CATALOG_SNAPSHOT_MAX_LAG", "1000"))
+CATALOG_SNAPSHOT_MAX_STALE_SECONDS = float(
+    os.getenv("CATALOG_SNAPSHOT_MAX_STALE_SECONDS", "3600")
+)
+
+MAGIC = b"CAPSNAP\0"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 64
+NULL = -1  # string reference for None
+
+
+class SnapshotFormatError(ValueError):
+    """File is not a catalog snapshot of a supported format version"""
+
+
+class StringTableBuilder:
+    """Interns strings into an offsets + UTF-8 blob table"""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.blobs: List[bytes] = []
+
+    def ref(self, value: Optional[str]) -> int:
+        if value is None:
+            return NULL
+        ref = self.index.get(value)
+        if ref is None:
+            ref = self.index[value] = len(self.blobs)
+            self.blobs.append(value.encode("utf-8"))
+        return ref
+
+    def arrays(self):
+        lengths = np.fromiter(
+            (len(b) for b in self.blobs), dtype=np.int64, count=len(self.blobs)
+        )
+        offsets = np.zeros(len(self.blobs) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        data = np.frombuffer(b"".join(self.blobs), dtype=np.uint8)
+        return offsets, data
+
+
+def write_snapshot(
+    path: str, records: Iterable[ProductRecord], catalog_version: int
+) -> Dict:
+    """Write records as a snapshot file (atomically replacing `path`); returns
+    the header"""
+    records = sorted(records, key=lambda r: (r.category_id or 0, r.id))
+    n = len(records)
+    strings = StringTableBuilder()
+
+    def ints(values, dtype=np.int32):
+        return np.fromiter(values, dtype=dtype, count=n)
+
+    def refs(field):
+        return ints(strings.ref(getattr(r, field)) for r in records)
+
+    category_ids = ints(r.category_id or 0 for r in records)
+    keys, starts = np.unique(category_ids, return_index=True)
+    color_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(
+        ints((len(r.colors or ()) for r in records), np.int64), out=color_offsets[1:]
+    )
+    color_refs = np.array(
+        [strings.ref(c) for r in records for c in (r.colors or ())], dtype=np.int32
+    )
+    name_refs, brand_refs, category_refs = refs("name"), refs("brand"), refs("category")
+    image_refs, link_refs = refs("image_url"), refs("link")
+    string_offsets, string_data = strings.arrays()
+
+    sections = {
+        "ids": ints((r.id for r in records), np.int64),
+        "category_ids": category_ids,
+        "brand_ids": ints(r.brand_id or 0 for r in records),
+        "prices": ints(
+            (np.nan if r.price is None else r.price for r in records), np.float64
+        ),
+        "name_refs": name_refs,
+        "brand_refs": brand_refs,
+        "category_refs": category_refs,
+        "image_refs": image_refs,
+        "link_refs": link_refs,
+        "color_offsets": color_offsets,
+        "color_refs": color_refs,
+        "category_keys": keys.astype(np.int32),
+        "category_starts": np.append(starts, n).astype(np.int64),
+        "string_offsets": string_offsets,
+        "string_data": string_data,
+    }
+    header = {
+        "catalog_version": int(catalog_version),
+        "rows": n,
+        "strings": len(strings.blobs),
+        "built_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "sections": {},
+    }
+    # Header size depends on the offsets it records; reserve generously
+    header_len = 256 + 96 * len(sections)
+    offset = _aligned(_PREAMBLE.size + header_len)
+    for name, array in sections.items():
+        header["sections"][name] = [offset, array.dtype.str, int(array.size)]
+        offset = _aligned(offset + array.nbytes)
+    encoded = json.dumps(header).encode()
+    if len(encoded) > header_len:
+        raise ValueError("snapshot header overflow")
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, header_len))
+        f.write(encoded.ljust(header_len, b" "))
+        for name, array in sections.items():
+            f.seek(header["sections"][name][0])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return header
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class CatalogSnapshot:
+    """Read-only view over a mapped snapshot file"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotFormatError(f"{path}: not a v{FORMAT_VERSION} snapshot")
+        header = json.loads(
+            bytes(self._mmap[_PREAMBLE.size : _PREAMBLE.size + header_len])
+        )
+        self.path = path
+        self.catalog_version: int = header["catalog_version"]
+        self.rows: int = header["rows"]
+        self.built_at: str = header["built_at"]
+        for name, (offset, dtype, count) in header["sections"].items():
+            array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+            setattr(self, name, array)
+        self._category_range = {
+            int(key): (int(self.category_starts[i]), int(self.category_starts[i + 1]))
+            for i, key in enumerate(self.category_keys)
+        }
+
+    def string(self, ref: int) -> Optional[str]:
+        if ref == NULL:
+            return None
+        start, end = self.string_offsets[ref], self.string_offsets[ref + 1]
+        return self.string_data[start:end].tobytes().decode("utf-8")
+
+    def record(self, row: int) -> ProductRecord:
+        string = self.string
+        price = float(self.prices[row])
+        colors = self.color_refs[self.color_offsets[row] : self.color_offsets[row + 1]]
+        return ProductRecord(
+            int(self.ids[row]),
+            string(int(self.brand_refs[row])),
+            int(self.brand_ids[row]) or None,
+            string(int(self.name_refs[row])),
+            string(int(self.category_refs[row])),
+            int(self.category_ids[row]) or None,
+            None if price != price else price,
+            [string(int(c)) for c in colors],
+            string(int(self.image_refs[row])),
+            string(int(self.link_refs[row])),
+        )
+
+    def rows_in_categories(self, category_ids: Sequence[int]) -> List[range]:
+        """Row ranges holding the given categories"""
+        ranges = []
+        for category_id in category_ids:
+            bounds = self._category_range.get(category_id)
+            if bounds is not None:
+                ranges.append(range(*bounds))
+        return ranges
+
+    def category_rows(self, category_ids: Sequence[int]) -> np.ndarray:
+        """Row numbers of the given categories, for filtering and ranking on the
+        column arrays before building records for the few rows kept"""
+        ranges = self.rows_in_categories(category_ids)
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(r.start, r.stop) for r in ranges])
+
+    def records_in_categories(self, category_ids: Sequence[int]) -> List[ProductRecord]:
+        """Products of the given categories, in (category_id, id) order (builds a
+        record per row: hot paths use category_rows() and record())"""
+        return [
+            self.record(row)
+            for rows in self.rows_in_categories(category_ids)
+            for row in rows
+        ]
+
+
+class SnapshotHolder:
+    """Process-wide handle on the current snapshot file"""
+
+    def __init__(
+        self,
+        path: str = CATALOG_SNAPSHOT_PATH,
+        check_seconds: float = CATALOG_SNAPSHOT_CHECK_SECONDS,
+        max_lag: int = CATALOG_SNAPSHOT_MAX_LAG,
+        max_stale_seconds: float = CATALOG_SNAPSHOT_MAX_STALE_SECONDS,
+    ):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.max_lag = max_lag
+        self.max_stale_seconds = max_stale_seconds
+        self.snapshot: Optional[CatalogSnapshot] = None
+        # Whether the mapped snapshot is within the staleness bounds
+        self.usable = False
+        self._file_id = None
+        self._checked_at: Optional[float] = None
+        self._stale_since: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[CatalogSnapshot]:
+        """Current snapshot, or None when missing or too far behind the database"""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_seconds:
+            with self._lock:
+                if (
+                    self._checked_at is None
+                    or now - self._checked_at >= self.check_seconds
+                ):
+                    self._refresh(now)
+                    self._checked_at = now
+        return self.snapshot if self.usable else None
+
+    def _refresh(self, now: float) -> None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.snapshot, self._file_id, self.usable = None, None, False
+            return
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id != self._file_id:
+            try:
+                snapshot = CatalogSnapshot(self.path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not map catalog snapshot {self.path}: {e}")
+                return
+            # Pointer swap; readers holding the old snapshot keep its mapping
+            self.snapshot, self._file_id = snapshot, file_id
+            self._stale_since = None
+            logger.info(
+                f"Mapped catalog snapshot v{snapshot.catalog_version} "
+                f"({snapshot.rows} products)"
+            )
+        lag = _database_catalog_version() - self.snapshot.catalog_version
+        metrics.set_gauge(
+            "capsuleos_catalog_snapshot_lag_versions",
+            lag,
+            "Catalog versions the mapped snapshot is behind the database",
+        )
+        if lag == 0:
+            self._stale_since = None
+        elif self._stale_since is None:
+            self._stale_since = now
+        usable = 0 <= lag <= self.max_lag and (
+            self._stale_since is None
+            or now - self._stale_since <= self.max_stale_seconds
+        )
+        if self.usable and not usable:
+            logger.warning(
+                f"Catalog snapshot is {lag} versions behind the database; "
+                f"using SQL until scripts/build_catalog_snapshot.py is re-run"
+            )
+        self.usable = usable
+
+
+def _database_catalog_version() -> int:
+    from app.database import SessionLocal, get_catalog_version
+
+    db = SessionLocal()
+    try:
+        return get_catalog_version(db)[0]
+    finally:
+        db.close()
+
+
+catalog_snapshot = SnapshotHolder()
+
+
+def get_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    return catalog_snapshot.get()
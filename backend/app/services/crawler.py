@@ -0,0 +1,516 @@
+"""
+Retailer catalog crawl-and-ingest pipeline.
+
+Stages, connected by bounded asyncio queues so a slow stage backpressures the
+ones before it:
+
+    frontier (CrawlState, on disk) -> feeder -> url queue -> fetch workers
+        -> page queue -> parse dispatcher (ProcessPoolExecutor)
+        -> product queue -> batch writer (bulk upsert into products)
+
+Discovered links go to the on-disk frontier rather than back into the URL
+queue, so parsing never blocks on fetching and the crawl can be stopped and
+resumed: URLs handed out but not finished are reset to pending on restart.
+Products are upserted by canonical link (idempotent), and the URLs in a batch
+are only marked done after the batch commits. Frontier updates are committed
+in groups (CRAWL_STATE_COMMIT_EVERY / _SECONDS) rather than once per URL, so
+the event loop doesn't wait on sqlite commits; losing an uncommitted group
+only means those URLs are fetched again on resume.
+
+Pages are parsed once with lxml; the tree feeds both link extraction and
+link_extractor.parse_product_doc. Sitemaps (<urlset>/<sitemapindex>) and
+listing pages only contribute links.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Set
+from urllib.parse import urljoin, urlsplit
+import asyncio
+import os
+import sqlite3
+import time
+
+import httpx
+from loguru import logger
+from lxml import etree
+from lxml import html as lxml_html
+from sqlalchemy import insert, update
+
+from app.services.link_extractor import (
+    LinkExtractor,
+    ResponseTooLarge,
+    UnsafeURLError,
+    canonical_url,
+    normalize_category,
+    parse_product_doc,
+)
+
+CRAWL_STATE_PATH = os.getenv("CRAWL_STATE_PATH", "./crawl_state.sqlite")
+CRAWL_STATE_COMMIT_EVERY = int(os.getenv("CRAWL_STATE_COMMIT_EVERY", "500"))
+CRAWL_STATE_COMMIT_SECONDS = float(os.getenv("CRAWL_STATE_COMMIT_SECONDS", "2"))
+
+_SKIP_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".css", ".js")
+
+
+class CrawlState:
+    """Resumable URL frontier: pending -> queued -> done | failed"""
+
+    def __init__(
+        self,
+        path: str = CRAWL_STATE_PATH,
+        commit_every: int = CRAWL_STATE_COMMIT_EVERY,
+        commit_seconds: float = CRAWL_STATE_COMMIT_SECONDS,
+    ):
+        self.path = path
+        self.commit_every = commit_every
+        self.commit_seconds = commit_seconds
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: commits don't fsync (only checkpoints do)
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, status TEXT NOT NULL DEFAULT 'pending', "
+            "attempts INTEGER NOT NULL DEFAULT 0, error TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_urls_status ON urls (status)")
+        # URLs handed out by a previous (interrupted) run are retried
+        self._conn.execute("UPDATE urls SET status = 'pending' WHERE status = 'queued'")
+        self._conn.commit()
+        self._uncommitted = 0
+        self._committed_at = time.monotonic()
+
+    def _changed(self, count: int = 1) -> None:
+        """Count a write; commit once enough have accumulated or enough time
+        has passed (reads on this connection already see uncommitted rows)"""
+        self._uncommitted += count
+        if (
+            self._uncommitted >= self.commit_every
+            or time.monotonic() - self._committed_at >= self.commit_seconds
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Commit pending frontier updates"""
+        if self._uncommitted:
+            self._conn.commit()
+            self._uncommitted = 0
+        self._committed_at = time.monotonic()
+
+    def add(self, urls: Sequence[str]) -> int:
+        before = self._conn.total_changes
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO urls (url) VALUES (?)", [(u,) for u in urls]
+        )
+        added = self._conn.total_changes - before
+        if added:
+            self._changed(added)
+        return added
+
+    def take_pending(self, limit: int) -> List[str]:
+        rows = self._conn.execute(
+            "SELECT url FROM urls WHERE status = 'pending' LIMIT ?", (limit,)
+        ).fetchall()
+        urls = [r[0] for r in rows]
+        if urls:
+            self._conn.executemany(
+                "UPDATE urls SET status = 'queued' WHERE url = ?",
+                [(u,) for u in urls],
+            )
+            self._changed(len(urls))
+        return urls
+
+    def mark_done(self, urls: Sequence[str]) -> None:
+        self._conn.executemany(
+            "UPDATE urls SET status = 'done', error = NULL WHERE url = ?",
+            [(u,) for u in urls],
+        )
+        self._changed(len(urls))
+
+    def mark_failed(self, url: str, error: str, retry: bool) -> None:
+        self._conn.execute(
+            "UPDATE urls SET status = ?, attempts = attempts + 1, error = ? "
+            "WHERE url = ?",
+            ("pending" if retry else "failed", error[:500], url),
+        )
+        self._changed()
+
+    def attempts(self, url: str) -> int:
+        row = self._conn.execute(
+            "SELECT attempts FROM urls WHERE url = ?", (url,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn.execute(
+            "SELECT status, COUNT(*) FROM urls GROUP BY status"
+        ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+
+def _extract_links(doc, base_url: str) -> List[str]:
+    links = []
+    for href in doc.xpath("//a/@href"):
+        href = href.strip()
+        if not href or href.startswith(("#", "mailto:", "javascript:", "tel:")):
+            continue
+        url = urljoin(base_url, href)
+        if urlsplit(url).path.lower().endswith(_SKIP_EXTENSIONS):
+            continue
+        links.append(canonical_url(url))
+    return links
+
+
+def parse_page(body: str, url: str) -> Dict[str, Any]:
+    """Parse one fetched page (runs in a worker process).
+
+    Returns {"product": info or None, "links": [...]}; a page counts as a
+    product page when it carries a product name and price."""
+    stripped = body.lstrip()
+    if stripped.startswith("<?xml") or stripped[:200].find("<urlset") >= 0:
+        root = etree.fromstring(body.encode())
+        locs = root.xpath("//*[local-name()='loc']/text()")
+        return {"product": None, "links": [canonical_url(u) for u in locs]}
+
+    doc = lxml_html.fromstring(body)
+    links = _extract_links(doc, url)
+    info = parse_product_doc(doc, url)
+    if not info.get("name") or info.get("price") is None:
+        return {"product": None, "links": links}
+    return {"product": info, "links": links}
+
+
+def normalize_product(info: Dict[str, Any], url: str) -> Optional[Dict[str, Any]]:
+    """Map parsed page fields onto the products table (None if uncategorizable)"""
+    category = info.get("category") or normalize_category(
+        info.get("name"), info.get("description")
+    )
+    if category is None:
+        return None
+    return {
+        "brand": info.get("brand") or urlsplit(url).netloc,
+        "name": info["name"],
+        "category": category,
+        "price": info["price"],
+        "description": info.get("description"),
+        "colors": [info["color"].lower()] if info.get("color") else [],
+        "image_url": info.get("image_url"),
+        "link": canonical_url(url),
+        "product_metadata": {
+            "source": "crawl",
+            "currency": info.get("currency"),
+            "material": info.get("material"),
+            "sku": info.get("sku"),
+        },
+    }
+
+
+def upsert_products(session_factory, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Bulk insert/update products keyed by link, in one transaction that also
+    bumps the catalog version. Core statements skip the ORM hooks, so the ANN
+    delta segment is fed explicitly after the commit."""
+    from app.database import Product, bump_catalog_version
+    from app.services import ann_index, price_stats
+    from app.services.dimensions import PENDING_KEY, assign_ids
+
+    by_link = {r["link"]: r for r in rows}
+    db = session_factory()
+    try:
+        existing, old_categories = {}, set()
+        for link, product_id, category_id in (
+            db.query(Product.link, Product.id, Product.category_id)
+            .filter(Product.link.in_(list(by_link)))
+            .all()
+        ):
+            existing[link] = product_id
+            old_categories.add(category_id)
+        new = [r for link, r in by_link.items() if link not in existing]
+        changed = [
+            {**r, "id": existing[link]}
+            for link, r in by_link.items()
+            if link in existing
+        ]
+        # Core bulk statements skip the ORM flush hook; set dimension ids here
+        # (published when the session commits)
+        pending = db.info.setdefault(PENDING_KEY, {})
+        assign_ids(db.connection(), new, pending)
+        assign_ids(db.connection(), changed, pending)
+        if new:
+            db.execute(insert(Product), new)
+        if changed:
+            db.execute(update(Product), changed)
+        touched = old_categories | {r.get("category_id") for r in (*new, *changed)}
+        price_stats.refresh_categories(db.connection(), touched)
+        db.info[price_stats.PENDING_KEY] = True
+        bump_catalog_version(db.connection())
+        indexed: List[Dict[str, Any]] = []
+        if ann_index.get_updater() is not None:
+            # Bulk inserts don't return ids; look them up before committing
+            ids = {}
+            if new:
+                ids = dict(
+                    db.query(Product.link, Product.id).filter(
+                        Product.link.in_([r["link"] for r in new])
+                    )
+                )
+            indexed = [{**r, "id": ids[r["link"]]} for r in new] + changed
+        db.commit()
+        ann_index.submit_rows(indexed)
+        return {"inserted": len(new), "updated": len(changed)}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class CrawlStats:
+    """Counters for one crawl run"""
+
+    COUNTERS = (
+        "fetched",
+        "bytes",
+        "fetch_errors",
+        "parsed",
+        "products",
+        "skipped",
+        "inserted",
+        "updated",
+        "batches",
+    )
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.started_at = time.monotonic()
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        data = {name: getattr(self, name) for name in self.COUNTERS}
+        data["elapsed_s"] = round(elapsed, 3)
+        data["pages_per_s"] = round(self.fetched / elapsed, 2)
+        data["products_per_s"] = round((self.inserted + self.updated) / elapsed, 2)
+        return data
+
+
+class CatalogCrawler:
+    """Crawl seed URLs on their hosts and ingest product pages"""
+
+    def __init__(
+        self,
+        state: CrawlState,
+        session_factory,
+        fetch_concurrency: int = 16,
+        parse_workers: Optional[int] = None,
+        queue_size: int = 256,
+        batch_size: int = 500,
+        flush_interval_s: float = 2.0,
+        max_attempts: int = 3,
+        max_pages: Optional[int] = None,
+        extractor: Optional[LinkExtractor] = None,
+        executor: Optional[Executor] = None,
+    ):
+        self.state = state
+        self.session_factory = session_factory
+        self.fetch_concurrency = fetch_concurrency
+        self.parse_workers = parse_workers or os.cpu_count() or 2
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_attempts = max_attempts
+        self.max_pages = max_pages
+        self.extractor = extractor or LinkExtractor()
+        self._executor = executor
+        self.stats = CrawlStats()
+        self.allowed_hosts: Set[str] = set()
+        self._in_flight = 0
+        self._handed_out = 0
+
+    def _allowed(self, url: str) -> bool:
+        return urlsplit(url).netloc in self.allowed_hosts
+
+    async def run(self, seeds: Sequence[str]) -> Dict[str, Any]:
+        """Crawl until the frontier is exhausted (or max_pages); returns stats"""
+        seeds = [canonical_url(s) for s in seeds]
+        self.allowed_hosts = {urlsplit(s).netloc for s in seeds}
+        self.state.add(seeds)
+
+        url_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        page_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        product_queue: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 2)
+
+        executor = self._executor or ProcessPoolExecutor(self.parse_workers)
+        self.stats = CrawlStats()
+        fetchers = [
+            asyncio.create_task(self._fetch_worker(url_queue, page_queue))
+            for _ in range(self.fetch_concurrency)
+        ]
+        parser = asyncio.create_task(
+            self._parse_dispatcher(page_queue, product_queue, executor)
+        )
+        writer = asyncio.create_task(self._batch_writer(product_queue))
+        progress = asyncio.create_task(self._report_progress())
+        try:
+            await self._feed(url_queue)
+            # Feeder returns once nothing is in flight: drain and stop stages
+            for _ in fetchers:
+                await url_queue.put(None)
+            await asyncio.gather(*fetchers)
+            await page_queue.put(None)
+            await parser
+            await product_queue.put(None)
+            await writer
+        finally:
+            progress.cancel()
+            for task in fetchers + [parser, writer]:
+                task.cancel()
+            if self._executor is None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            self.state.flush()
+            await self.extractor.aclose()
+        summary = {**self.stats.as_dict(), "frontier": self.state.counts()}
+        logger.info(f"Crawl finished: {summary}")
+        return summary
+
+    async def _feed(self, url_queue: asyncio.Queue) -> None:
+        while True:
+            budget = self.queue_size
+            if self.max_pages is not None:
+                budget = min(budget, self.max_pages - self._handed_out)
+            urls = self.state.take_pending(max(budget, 0)) if budget > 0 else []
+            for url in urls:
+                self._in_flight += 1
+                self._handed_out += 1
+                await url_queue.put(url)  # blocks while fetchers are saturated
+            if not urls:
+                if self._in_flight == 0:
+                    return
+                await asyncio.sleep(0.05)
+
+    def _finish(self, count: int = 1) -> None:
+        self._in_flight -= count
+
+    async def _fetch_worker(
+        self, url_queue: asyncio.Queue, page_queue: asyncio.Queue
+    ) -> None:
+        while True:
+            url = await url_queue.get()
+            if url is None:
+                return
+            try:
+                final_url, body = await self.extractor.fetch(url)
+            except Exception as e:
+                self.stats.fetch_errors += 1
+                permanent = isinstance(e, (UnsafeURLError, ResponseTooLarge)) or (
+                    isinstance(e, httpx.HTTPStatusError)
+                    and e.response.status_code < 500
+                )
+                retry = not permanent and (
+                    self.state.attempts(url) + 1 < self.max_attempts
+                )
+                self.state.mark_failed(url, f"{type(e).__name__}: {e}", retry)
+                logger.debug(
+                    f"Fetch failed ({'retrying' if retry else 'giving up'}): {url}"
+                )
+                self._finish()
+                continue
+            self.stats.fetched += 1
+            self.stats.bytes += len(body)
+            await page_queue.put((url, final_url, body))
+
+    async def _parse_dispatcher(
+        self,
+        page_queue: asyncio.Queue,
+        product_queue: asyncio.Queue,
+        executor: Executor,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.parse_workers * 2)
+        pending: Set[asyncio.Task] = set()
+
+        async def parse_one(url: str, final_url: str, body: str) -> None:
+            try:
+                result = await loop.run_in_executor(
+                    executor, parse_page, body, final_url
+                )
+                self.stats.parsed += 1
+                links = [u for u in result["links"] if self._allowed(u)]
+                if links:
+                    self.state.add(links)
+                info = result["product"]
+                row = normalize_product(info, url) if info else None
+            except Exception as e:
+                self.state.mark_failed(url, f"parse: {e}", retry=False)
+                self._finish()
+                return
+            finally:
+                slots.release()
+            if row is None:
+                if info:
+                    self.stats.skipped += 1
+                self.state.mark_done([url])
+                self._finish()
+            else:
+                self.stats.products += 1
+                await product_queue.put((url, row))
+
+        while True:
+            item = await page_queue.get()
+            if item is None:
+                break
+            await slots.acquire()  # bounds pages held by the process pool
+            task = asyncio.create_task(parse_one(*item))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def _batch_writer(self, product_queue: asyncio.Queue) -> None:
+        batch: List = []
+        deadline = time.monotonic() + self.flush_interval_s
+        done = False
+        while not done:
+            timeout = max(deadline - time.monotonic(), 0.0)
+            try:
+                item = await asyncio.wait_for(product_queue.get(), timeout)
+                if item is None:
+                    done = True
+                else:
+                    batch.append(item)
+            except asyncio.TimeoutError:
+                pass
+            if batch and (
+                done or len(batch) >= self.batch_size or time.monotonic() >= deadline
+            ):
+                await self._write(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval_s
+
+    async def _write(self, batch: List) -> None:
+        urls = [url for url, _ in batch]
+        try:
+            result = await asyncio.to_thread(
+                upsert_products, self.session_factory, [row for _, row in batch]
+            )
+        except Exception as e:
+            logger.error(f"Upsert of {len(batch)} products failed: {e}")
+            for url in urls:
+                retry = self.state.attempts(url) + 1 < self.max_attempts
+                self.state.mark_failed(url, f"upsert: {e}", retry)
+            self._finish(len(batch))
+            return
+        self.state.mark_done(urls)
+        self.stats.inserted += result["inserted"]
+        self.stats.updated += result["updated"]
+        self.stats.batches += 1
+        self._finish(len(batch))
+
+    async def _report_progress(self, every_s: float = 10.0) -> None:
+        while True:
+            await asyncio.sleep(every_s)
+            logger.info(f"Crawl progress: {self.stats.as_dict()}")
@@ -0,0 +1,290 @@
+"""
+Category and brand dimension maps
+
+Product.category, Product.brand and ClosetItem.category are free-form strings.
+Each is interned into a small dimension table (categories, brands) keyed by its
+normalized form ("  Outerwear " and "outerwear" share an id), and the integer id
+is stored next to the string (category_id, brand_id). The in-memory maps mirror
+those tables so filters, joins and set comparisons run on ints:
+
+    categories.lookup("Outerwear")      -> 3       (map hit, no DB access)
+    categories.lookup("no such thing")  -> None    (never creates anything)
+    categories.resolve(conn, "Parkas")  -> 17      (get-or-create the row)
+
+Read paths (request input, scraped pages) use lookup(): a miss checks the
+table once and is then remembered for DIMENSION_REFRESH_SECONDS in a bounded
+set, so arbitrary strings can't grow the map. The map also reloads when the
+catalog version moves (checked at most every DIMENSION_REFRESH_SECONDS), so
+names added by another process (seed_db.py, crawl_catalog.py) become visible
+without a restart. id() additionally hands out process-local negative ids for
+names outside the table; 0 is the empty name. Ids created inside a transaction
+are held as pending and only published to the map on commit, so a rollback
+can't leave an id that points at nothing.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+# Key under which a session collects ids created in its transaction
+PENDING_KEY = "dimension_ids"
+
+DIMENSION_REFRESH_SECONDS = float(os.getenv("DIMENSION_REFRESH_SECONDS", "5"))
+MAX_REMEMBERED_MISSES = 4096
+
+
+class Dimension:
+    """Interned name <-> integer id map backed by one dimension table"""
+
+    def __init__(self, table: str, refresh_seconds: float = DIMENSION_REFRESH_SECONDS):
+        self.table = table
+        self.refresh_seconds = refresh_seconds
+        self._ids: Dict[str, int] = {"": 0}
+        self._keys: Dict[int, str] = {0: ""}
+        self._next_local = -1
+        self._lock = threading.Lock()
+        self._engine = None
+        self._loaded = False
+        self._catalog_version: Optional[int] = None
+        self._checked_at: Optional[float] = None
+        self._misses: Dict[str, float] = {}  # key -> when the table lacked it
+
+    @staticmethod
+    def key(name: Optional[str]) -> str:
+        """Normalized form: whitespace-collapsed and case-folded"""
+        return " ".join(str(name).split()).casefold() if name else ""
+
+    def bind(self, engine) -> None:
+        """Engine to load the table from on first lookup (if load() wasn't called)"""
+        self._engine = engine
+
+    def load(self, connection) -> int:
+        """Replace table-backed entries with the table's rows; returns row count"""
+        rows = connection.execute(text(f"SELECT id, key FROM {self.table}")).all()
+        with self._lock:
+            local = {k: i for k, i in self._ids.items() if i < 0}
+            self._ids = {"": 0}
+            self._keys = {0: ""}
+            for ident, key in rows:
+                self._ids[key] = ident
+                self._keys[ident] = key
+            for key, ident in local.items():
+                if key not in self._ids:
+                    self._ids[key] = ident
+                    self._keys[ident] = key
+            self._loaded = True
+        return len(rows)
+
+    def _refresh(self) -> None:
+        """Load the map, and reload it when the catalog version has moved (checked
+        at most every refresh_seconds)"""
+        now = time.monotonic()
+        if self._engine is None or (
+            self._checked_at is not None
+            and now - self._checked_at < self.refresh_seconds
+        ):
+            return
+        self._checked_at = now
+        try:
+            with self._engine.connect() as conn:
+                row = conn.execute(
+                    text("SELECT version FROM catalog_meta WHERE id = 1")
+                ).first()
+                version = int(row[0]) if row else 0
+                if not self._loaded or version != self._catalog_version:
+                    self.load(conn)
+                    self._catalog_version = version
+                    self._misses = {}
+        except Exception as e:
+            # Tables not created yet (init_db not run); use local ids only
+            logger.debug(f"Dimension {self.table} not loaded: {e}")
+
+    def _fetch(self, key: str) -> Optional[int]:
+        """Table id for a key missing from the map (misses remembered for
+        refresh_seconds, at most MAX_REMEMBERED_MISSES of them)"""
+        if self._engine is None:
+            return None
+        now = time.monotonic()
+        missed_at = self._misses.get(key)
+        if missed_at is not None and now - missed_at < self.refresh_seconds:
+            return None
+        try:
+            with self._engine.connect() as conn:
+                row = conn.execute(
+                    text(f"SELECT id FROM {self.table} WHERE key = :key"),
+                    {"key": key},
+                ).first()
+        except Exception as e:
+            logger.debug(f"Dimension {self.table} lookup failed: {e}")
+            row = None
+        if row is None:
+            with self._lock:
+                if len(self._misses) >= MAX_REMEMBERED_MISSES:
+                    self._misses = {}
+                self._misses[key] = now
+            return None
+        ident = int(row[0])
+        self.publish({(self.table, key): ident})
+        return ident
+
+    def lookup(self, name: Optional[str]) -> Optional[int]:
+        """Table id for a name, None when the table doesn't have it. Never creates
+        ids, so it is safe on untrusted input."""
+        key = self.key(name)
+        if not key:
+            return None
+        self._refresh()
+        ident = self._ids.get(key)
+        if ident is not None and ident > 0:
+            return ident
+        return self._fetch(key)
+
+    def id(self, name: Optional[str]) -> int:
+        """Id for a name; names outside the table get a stable process-local
+        negative id (which is kept for the life of the process: use lookup()
+        for request input)"""
+        key = self.key(name)
+        ident = self._ids.get(key)
+        if ident is not None:
+            return ident
+        self._refresh()
+        with self._lock:
+            ident = self._ids.get(key)
+            if ident is None:
+                ident = self._next_local
+                self._next_local -= 1
+                self._ids[key] = ident
+                self._keys[ident] = key
+        return ident
+
+    def ids(self, names: Iterable[Optional[str]]) -> List[int]:
+        """Table ids for several names via lookup() (order kept, duplicates and
+        unknown names dropped)"""
+        found = (self.lookup(name) for name in names)
+        return list(dict.fromkeys(ident for ident in found if ident is not None))
+
+    def key_of(self, ident: int) -> str:
+        """Normalized name for an id ("" when unknown)"""
+        return self._keys.get(ident, "")
+
+    def resolve(
+        self, connection, name: Optional[str], pending: Optional[Dict] = None
+    ) -> Optional[int]:
+        """
+        Table id for a name, inserting the row when missing (None for empty names).
+        New ids go into `pending` when given (published on commit), otherwise
+        straight into the map.
+        """
+        key = self.key(name)
+        if not key:
+            return None
+        ident = self._ids.get(key)
+        if ident is None:
+            self._refresh()
+            ident = self._ids.get(key)
+        if ident is not None and ident > 0:
+            return ident
+        if pending is not None and (self.table, key) in pending:
+            return pending[(self.table, key)]
+
+        select = text(f"SELECT id FROM {self.table} WHERE key = :key")
+        row = connection.execute(select, {"key": key}).first()
+        if row is None:
+            try:
+                with connection.begin_nested():
+                    connection.execute(
+                        text(
+                            f"INSERT INTO {self.table} (name, key) VALUES (:name, :key)"
+                        ),
+                        {"name": " ".join(str(name).split()), "key": key},
+                    )
+            except IntegrityError:
+                pass  # inserted concurrently; read it back
+            row = connection.execute(select, {"key": key}).first()
+        ident = int(row[0])
+        if pending is not None:
+            pending[(self.table, key)] = ident
+        else:
+            self.publish({(self.table, key): ident})
+        return ident
+
+    def publish(self, pending: Dict[Tuple[str, str], int]) -> None:
+        """Make committed ids visible (replacing local ids for the same names)"""
+        with self._lock:
+            for (table, key), ident in pending.items():
+                if table != self.table:
+                    continue
+                old = self._ids.get(key)
+                if old is not None and old < 0:
+                    self._keys.pop(old, None)
+                self._ids[key] = ident
+                self._keys[ident] = key
+                self._misses.pop(key, None)
+
+
+categories = Dimension("categories")
+brands = Dimension("brands")
+
+DIMENSIONS = (categories, brands)
+
+# (table, string column, id column, dimension) kept in sync by the ORM listener
+# in app.database and backfilled on existing databases
+DIMENSION_COLUMNS = (
+    ("products", "category", "category_id", categories),
+    ("products", "brand", "brand_id", brands),
+    ("closet_items", "category", "category_id", categories),
+)
+
+
+def publish_pending(pending: Optional[Dict]) -> None:
+    """Publish ids collected during a committed transaction"""
+    if pending:
+        for dimension in DIMENSIONS:
+            dimension.publish(pending)
+
+
+def backfill(connection, pending: Dict, columns=DIMENSION_COLUMNS) -> int:
+    """Set missing id columns from their string columns; returns rows updated"""
+    updated = 0
+    for table, column, id_column, dimension in columns:
+        names = (
+            connection.execute(
+                text(
+                    f"SELECT DISTINCT {column} FROM {table} "
+                    f"WHERE {id_column} IS NULL AND {column} IS NOT NULL"
+                )
+            )
+            .scalars()
+            .all()
+        )
+        for name in names:
+            ident = dimension.resolve(connection, name, pending)
+            if ident is None:
+                continue
+            result = connection.execute(
+                text(
+                    f"UPDATE {table} SET {id_column} = :id "
+                    f"WHERE {column} = :name AND {id_column} IS NULL"
+                ),
+                {"id": ident, "name": name},
+            )
+            updated += result.rowcount or 0
+    if updated:
+        logger.info(f"Backfilled {updated} dimension ids")
+    return updated
+
+
+def assign_ids(connection, rows: List[Dict], pending: Dict) -> None:
+    """Add category_id / brand_id to product row dicts (bulk Core inserts)"""
+    for row in rows:
+        if "category" in row:
+            row["category_id"] = categories.resolve(
+                connection, row["category"], pending
+            )
+        if "brand" in row:
+            row["brand_id"] = brands.resolve(connection, row["brand"], pending)
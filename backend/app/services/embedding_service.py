@@ -0,0 +1,213 @@
+"""
+Batched, cached embedding computation.
+
+EmbeddingService wraps an encoder (sentence-transformers model or the local
+HashingEncoder stub) behind the same `encode(texts)` call:
+
+- every text is keyed by sha256(model + text) in an on-disk SQLite store, so
+  unchanged product descriptions and style descriptors are never re-encoded,
+  across restarts and reseeds;
+- misses are queued to a single worker thread which waits up to
+  EMBEDDING_BATCH_WINDOW_MS for more requests, deduplicates the texts, and
+  runs the model once per micro-batch (up to EMBEDDING_MAX_BATCH texts).
+
+Set EMBEDDING_MODEL=hashing-stub to use the deterministic stub (no weights,
+no network) for tests and offline development.
+"""
+
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from loguru import logger
+
+STUB_MODEL = "hashing-stub"
+EMBEDDING_STORE_PATH = os.getenv(
+    "EMBEDDING_STORE_PATH", "./embeddings/vector_store.sqlite"
+)
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "256"))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEncoder:
+    """Deterministic bag-of-words feature-hashing encoder (stand-in model).
+
+    Texts sharing words get similar vectors, which is enough to exercise
+    ranking offline; identical input always yields identical output."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.calls = 0
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        self.calls += 1
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in _TOKEN.findall(text.lower()):
+                digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                out[i, bucket] += 1.0 if digest[4] & 1 else -1.0
+        return out
+
+
+def content_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{text}".encode()).hexdigest()
+
+
+class VectorStore:
+    """Content-hash -> float32 vector store in a single SQLite file"""
+
+    def __init__(self, path: str = EMBEDDING_STORE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB)"
+        )
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: List[Tuple[str, np.ndarray]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?)",
+                [(k, np.asarray(v, dtype=np.float32).tobytes()) for k, v in items],
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class EmbeddingService:
+    """Encoder facade with a persistent cache and a micro-batching worker"""
+
+    def __init__(
+        self,
+        encoder,
+        model_name: str,
+        store: Optional[VectorStore] = None,
+        batch_window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+        max_batch: int = EMBEDDING_MAX_BATCH,
+    ):
+        self.encoder = encoder
+        self.model_name = model_name
+        self.store = store if store is not None else VectorStore()
+        self.batch_window_ms = batch_window_ms
+        self.max_batch = max_batch
+        self.stats = {"hits": 0, "misses": 0, "batches": 0, "encoded": 0}
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="embedding-worker", daemon=True
+        )
+        self._thread.start()
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        """Vectors for texts (cached or freshly encoded); blocks until ready.
+        batch_size is accepted for encoder compatibility and ignored."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [content_key(self.model_name, t) for t in texts]
+        found = self.store.get_many(list(dict.fromkeys(keys)))
+        missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in found))
+        self.stats["hits"] += len(texts) - len(missing)
+        self.stats["misses"] += len(missing)
+        if missing:
+            # Split so one caller can't exceed the batch size on its own
+            futures = []
+            for start in range(0, len(missing), self.max_batch):
+                future: Future = Future()
+                self._queue.put((missing[start : start + self.max_batch], future))
+                futures.append(future)
+            for future in futures:
+                found.update(future.result())
+        return np.stack([found[k] for k in keys])
+
+    def _run(self) -> None:
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + self.batch_window_ms / 1000.0
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._encode_batch(pending)
+
+    def _encode_batch(self, pending: List[Tuple[List[str], Future]]) -> None:
+        texts = list(dict.fromkeys(t for batch, _ in pending for t in batch))
+        try:
+            vectors = np.asarray(
+                self.encoder.encode(texts, batch_size=len(texts)), dtype=np.float32
+            )
+            by_key = {
+                content_key(self.model_name, t): v for t, v in zip(texts, vectors)
+            }
+            self.store.put_many(list(by_key.items()))
+        except Exception as e:
+            logger.warning(f"Embedding batch of {len(texts)} failed: {e}")
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        self.stats["batches"] += 1
+        self.stats["encoded"] += len(texts)
+        for batch, future in pending:
+            future.set_result(
+                {
+                    key: by_key[key]
+                    for key in (content_key(self.model_name, t) for t in batch)
+                }
+            )
+
+
+_services: Dict[str, Optional[EmbeddingService]] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(
+    model_name: Optional[str] = None,
+) -> Optional[EmbeddingService]:
+    """Process-wide service per model (None when the model can't be loaded)"""
+    from app.services.embeddings import EMBEDDING_MODEL, load_encoder
+
+    model_name = model_name or EMBEDDING_MODEL
+    with _services_lock:
+        if model_name not in _services:
+            encoder = load_encoder(model_name)
+            _services[model_name] = (
+                EmbeddingService(encoder, model_name) if encoder else None
+            )
+        return _services[model_name]
@@ -0,0 +1,335 @@
+"""
+Product embedding index for style-descriptor matching.
+
+Product vectors (name + description + product_metadata) are precomputed by
+scripts/build_embeddings.py into a memory-mapped float16/float32 matrix, so
+workers share pages through the OS cache and loading costs no encode time.
+Style descriptors are embedded once each and cached; per-slot ranking is a
+single matrix-vector product over the slot's candidate rows plus an
+argpartition top-k. The index records the catalog version it was built
+from; once the database moves on it keeps being served (products added
+since are simply not ranked) and the lag is logged and exported as a metric.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from loguru import logger
+
+from app.services.embedding_service import STUB_MODEL, HashingEncoder
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_INDEX_DIR = os.getenv("EMBEDDING_INDEX_DIR", "./embeddings")
+# Descriptors outside the precomputed vocabulary come from user input: LRU-bounded
+EMBEDDING_DESCRIPTOR_CACHE_SIZE = int(
+    os.getenv("EMBEDDING_DESCRIPTOR_CACHE_SIZE", "4096")
+)
+EMBEDDING_VERSION_CHECK_SECONDS = float(
+    os.getenv("EMBEDDING_VERSION_CHECK_SECONDS", "5")
+)
+
+MATRIX_FILE = "products.bin"
+IDS_FILE = "product_ids.npy"
+META_FILE = "meta.json"
+DESCRIPTORS_FILE = "descriptors.npz"
+
+
+def product_text(name: Optional[str], description: Optional[str], metadata: Any) -> str:
+    """Text embedded for a product: name, description and flattened metadata values"""
+    parts = [name or "", description or ""]
+    if isinstance(metadata, dict):
+        for value in metadata.values():
+            if isinstance(value, (list, tuple)):
+                parts.extend(str(v).replace("_", " ") for v in value)
+            elif value is not None:
+                parts.append(str(value).replace("_", " "))
+    return ". ".join(p for p in parts if p)
+
+
+def load_encoder(model_name: str = EMBEDDING_MODEL):
+    """Load the sentence-transformers model (deferred import; None if unavailable).
+    Callers should normally go through embedding_service.get_embedding_service."""
+    if model_name == STUB_MODEL:
+        return HashingEncoder()
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.warning("sentence-transformers not installed; style matching disabled")
+        return None
+    return SentenceTransformer(model_name)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    idx = np.argpartition(-scores, k)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+class ProductEmbeddingIndex:
+    """Read-only, memory-mapped product embedding matrix with id -> row lookup"""
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        product_ids: np.ndarray,
+        model_name: str,
+        descriptor_vectors: Optional[Dict[str, np.ndarray]] = None,
+        encoder=None,
+        catalog_version: Optional[int] = None,
+    ):
+        self.matrix = matrix
+        self.product_ids = product_ids
+        self.model_name = model_name
+        # Catalog version the vectors were built from (None: unknown, older build)
+        self.catalog_version = catalog_version
+        self.dim = matrix.shape[1] if matrix.ndim == 2 else 0
+        self.row_of: Dict[int, int] = {
+            int(pid): row for row, pid in enumerate(product_ids)
+        }
+        # Vocabulary precomputed at build time (fixed), plus an LRU of other
+        # descriptors encoded at request time
+        self._vocabulary: Dict[str, np.ndarray] = dict(descriptor_vectors or {})
+        self._descriptor_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._encoder = encoder
+
+    @classmethod
+    def load(
+        cls, index_dir: str = EMBEDDING_INDEX_DIR
+    ) -> Optional["ProductEmbeddingIndex"]:
+        """Map an index built by scripts/build_embeddings.py (None if absent)"""
+        meta_path = os.path.join(index_dir, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if not meta["count"]:
+            return None
+        matrix = np.memmap(
+            os.path.join(index_dir, MATRIX_FILE),
+            dtype=np.dtype(meta["dtype"]),
+            mode="r",
+            shape=(meta["count"], meta["dim"]),
+        )
+        product_ids = np.load(os.path.join(index_dir, IDS_FILE))
+        descriptors: Dict[str, np.ndarray] = {}
+        descriptors_path = os.path.join(index_dir, DESCRIPTORS_FILE)
+        if os.path.exists(descriptors_path):
+            with np.load(descriptors_path) as data:
+                for word, vec in zip(data["words"], data["vectors"]):
+                    descriptors[str(word)] = vec.astype(np.float32)
+        logger.info(
+            f"Loaded product embeddings: {meta['count']} x {meta['dim']} ({meta['dtype']})"
+        )
+        return cls(
+            matrix,
+            product_ids,
+            meta["model"],
+            descriptors,
+            catalog_version=meta.get("catalog_version"),
+        )
+
+    @staticmethod
+    def build(
+        products: Iterable[Any],
+        encoder,
+        index_dir: str = EMBEDDING_INDEX_DIR,
+        model_name: str = EMBEDDING_MODEL,
+        dtype: str = "float16",
+        descriptors: Sequence[str] = (),
+        batch_size: int = 256,
+        catalog_version: Optional[int] = None,
+    ) -> int:
+        """Encode products (objects with id/name/description/product_metadata) to disk.
+        Pass the catalog_version the products were read at so stale indexes
+        can be detected."""
+        os.makedirs(index_dir, exist_ok=True)
+        ids: List[int] = []
+        texts: List[str] = []
+        for p in products:
+            ids.append(int(p.id))
+            texts.append(product_text(p.name, p.description, p.product_metadata))
+
+        if texts:
+            vectors = _normalize(
+                np.asarray(
+                    encoder.encode(texts, batch_size=batch_size), dtype=np.float32
+                )
+            )
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        count, dim = vectors.shape
+
+        matrix_path = os.path.join(index_dir, MATRIX_FILE)
+        vectors.astype(dtype).tofile(matrix_path + ".tmp")
+        np.save(os.path.join(index_dir, IDS_FILE), np.asarray(ids, dtype=np.int64))
+        os.replace(matrix_path + ".tmp", matrix_path)
+
+        if descriptors:
+            words = sorted(set(d.lower() for d in descriptors))
+            vecs = _normalize(np.asarray(encoder.encode(words), dtype=np.float32))
+            np.savez(
+                os.path.join(index_dir, DESCRIPTORS_FILE),
+                words=np.asarray(words),
+                vectors=vecs,
+            )
+
+        with open(os.path.join(index_dir, META_FILE), "w") as f:
+            json.dump(
+                {
+                    "model": model_name,
+                    "dim": dim,
+                    "dtype": dtype,
+                    "count": count,
+                    "catalog_version": catalog_version,
+                },
+                f,
+            )
+        return count
+
+    def _encode_descriptors(self, words: List[str]) -> Dict[str, np.ndarray]:
+        if self._encoder is None:
+            from app.services.embedding_service import get_embedding_service
+
+            self._encoder = get_embedding_service(self.model_name) or False
+        if not self._encoder:
+            return {}
+        vecs = _normalize(np.asarray(self._encoder.encode(words), dtype=np.float32))
+        encoded = dict(zip(words, vecs))
+        with self._cache_lock:
+            self._descriptor_cache.update(encoded)
+            while len(self._descriptor_cache) > EMBEDDING_DESCRIPTOR_CACHE_SIZE:
+                self._descriptor_cache.popitem(last=False)
+        return encoded
+
+    def _descriptor(self, word: str) -> Optional[np.ndarray]:
+        vec = self._vocabulary.get(word)
+        if vec is None:
+            with self._cache_lock:
+                vec = self._descriptor_cache.get(word)
+                if vec is not None:
+                    self._descriptor_cache.move_to_end(word)
+        return vec
+
+    def style_vector(self, descriptors: List[str]) -> Optional[np.ndarray]:
+        """Mean of (cached) descriptor embeddings, L2-normalized. May call the
+        encoder (and load the model on first use): keep off the event loop."""
+        words = [d.lower() for d in descriptors if d and d.strip()]
+        found = {w: self._descriptor(w) for w in dict.fromkeys(words)}
+        missing = [w for w, vec in found.items() if vec is None]
+        if missing:
+            found.update(self._encode_descriptors(missing))
+        vecs = [found[w] for w in words if found[w] is not None]
+        if not vecs:
+            return None
+        return _normalize(np.mean(vecs, axis=0))
+
+    def rank(self, product_ids: Sequence[int], query: np.ndarray, k: int) -> List[int]:
+        """Top-k of the given products by cosine similarity to query (ids not in the
+        index are skipped)"""
+        row_of = self.row_of
+        pairs = [(pid, row_of[pid]) for pid in product_ids if pid in row_of]
+        if not pairs:
+            return []
+        rows = np.fromiter((r for _, r in pairs), dtype=np.int64, count=len(pairs))
+        scores = self.matrix[rows].astype(np.float32) @ query
+        return [pairs[i][0] for i in top_k(scores, k)]
+
+    def filter_by_style(
+        self, products: List[Any], query: np.ndarray, keep: int
+    ) -> List[Any]:
+        """Keep the `keep` products (objects with .id) closest to the style query.
+        Products missing from the index are dropped, unless none are indexed."""
+        if len(products) <= keep:
+            return products
+        by_id = {p.id: p for p in products}
+        ranked = self.rank(list(by_id), query, keep)
+        if not ranked:
+            return products
+        return [by_id[pid] for pid in ranked]
+
+
+_style_index: Optional[ProductEmbeddingIndex] = None
+_style_index_loaded = False
+_style_index_lag: Optional[int] = 0
+_style_checked_at: Optional[float] = None
+_style_lock = threading.Lock()
+
+
+def get_style_index() -> Optional[ProductEmbeddingIndex]:
+    """Process-wide index, loaded on first use (None when no index has been
+    built). An index behind the catalog is still served; its lag is checked at
+    most every EMBEDDING_VERSION_CHECK_SECONDS, logged when it changes from
+    current to stale, and exported as capsuleos_style_index_lag_versions."""
+    global _style_index, _style_index_loaded, _style_checked_at
+    if not _style_index_loaded:
+        _style_index_loaded = True
+        try:
+            _style_index = ProductEmbeddingIndex.load()
+        except Exception as e:
+            logger.warning(f"Could not load product embeddings: {e}")
+            _style_index = None
+    if _style_index is None:
+        return None
+    now = time.monotonic()
+    if (
+        _style_checked_at is None
+        or now - _style_checked_at >= EMBEDDING_VERSION_CHECK_SECONDS
+    ):
+        with _style_lock:
+            if (
+                _style_checked_at is None
+                or now - _style_checked_at >= EMBEDDING_VERSION_CHECK_SECONDS
+            ):
+                _check_style_index_lag(_style_index)
+                _style_checked_at = now
+    return _style_index
+
+
+def _check_style_index_lag(index: ProductEmbeddingIndex) -> None:
+    global _style_index_lag
+    from app.services.metrics import metrics
+
+    database_version = _database_catalog_version()
+    lag = None
+    if index.catalog_version is not None and database_version is not None:
+        lag = database_version - index.catalog_version
+        metrics.set_gauge(
+            "capsuleos_style_index_lag_versions",
+            lag,
+            "Catalog versions the style embedding index is behind the database",
+        )
+    if lag != 0 and _style_index_lag == 0:
+        behind = lag if lag is not None else "an unknown number of"
+        logger.warning(
+            f"Product embeddings are {behind} catalog writes behind; products "
+            f"added since are not style-ranked until scripts/build_embeddings.py "
+            f"is re-run"
+        )
+    _style_index_lag = lag
+
+
+def _database_catalog_version() -> Optional[int]:
+    from app.database import SessionLocal, get_catalog_version
+
+    db = SessionLocal()
+    try:
+        return get_catalog_version(db)[0]
+    except Exception as e:
+        logger.warning(f"Could not read the catalog version: {e}")
+        return None
+    finally:
+        db.close()
@@ -0,0 +1,85 @@
+"""
+HTTP caching helpers: ETag / Last-Modified generation and conditional GET handling
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+import hashlib
+import os
+
+from fastapi import Request
+
+# Browsers / reverse proxies may reuse a catalog page for this long before revalidating
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", "300"))
+# Capsules are content-addressed by request hash; matches the capsule cache TTL
+CAPSULE_CACHE_MAX_AGE = int(os.getenv("CAPSULE_CACHE_MAX_AGE", "3600"))
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag from the given parts (e.g. catalog version + query params)"""
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return '"' + hashlib.md5(raw.encode()).hexdigest() + '"'
+
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag for a response body (changes whenever the bytes do)"""
+    return '"' + hashlib.md5(body).hexdigest() + '"'
+
+
+def http_date(dt: datetime) -> str:
+    """Format a (naive UTC or aware) datetime as an HTTP-date"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return format_datetime(
+        dt.astimezone(timezone.utc).replace(microsecond=0), usegmt=True
+    )
+
+
+def cache_headers(
+    etag: str, max_age: int, last_modified: Optional[datetime] = None
+) -> Dict[str, str]:
+    """Validator and Cache-Control headers for a cacheable GET response"""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, must-revalidate",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    ours = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == ours
+        for candidate in if_none_match.split(",")
+    )
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime] = None
+) -> bool:
+    """
+    True if the client's cached copy is still valid (respond 304).
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
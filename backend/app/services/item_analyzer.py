@@ -2,11 +2,35 @@
 Item analysis service - "Should I Buy This?" functionality
 """
 
+import asyncio
 from loguru import logger
 from app.models import AnalyzeItemRequest, AnalyzeItemResponse, Verdict
 from app.services.review_analyzer import ReviewAnalyzer
 from app.services.scoring import ItemScorer
+from app.services.llm import (
+    LLMClient,
+    LLMError,
+    analyze_item_content,
+    get_llm_client,
+    merge_analysis,
+)
+from app.services.metrics import metrics
+from app.services.profiler import profiler
 from typing import Optional, Dict, Any, List, Tuple
+import os
+import time
+
+# Verdict thresholds on the heuristic total score
+BUY_THRESHOLD = 0.7
+WAIT_THRESHOLD = 0.4
+# Escalate to the LLM only when the score is this close to a threshold
+LLM_ESCALATION_MARGIN = float(os.getenv("LLM_ESCALATION_MARGIN", "0.08"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_ESCALATION_TIMEOUT = float(os.getenv("LLM_ESCALATION_TIMEOUT", "4"))
+
+
+async def _none() -> None:
+    return None
 
 
 class ItemAnalyzer:
@@ -15,6 +39,7 @@ class ItemAnalyzer:
     def __init__(self):
         self.review_analyzer = ReviewAnalyzer()
         self.scorer = ItemScorer()
+        self._llm_semaphore: Optional[Tuple[asyncio.AbstractEventLoop, Any]] = None
 
     async def analyze(
         self,
@@ -25,8 +50,12 @@ class ItemAnalyzer:
         user_id: Optional[int] = None,
     ) -> AnalyzeItemResponse:
         """
-        Analyze a product and generate purchase recommendation
+        Analyze a product and generate purchase recommendation.
+        Tiered: the heuristic score answers directly unless it falls within
+        LLM_ESCALATION_MARGIN of a verdict threshold, in which case the LLM
+        prompts are consulted (bounded concurrency, timeout, heuristic fallback).
         """
+        started = time.perf_counter()
         logger.info(f"Analyzing item: {product_link or product_description}")
 
         # Extract product info
@@ -59,13 +88,20 @@ class ItemAnalyzer:
             score_result, review_insights, product_info
         )
 
-        # Check closet overlap
-        closet_warning = await self._check_closet_overlap(product_info, user_id)
-
-        # Get alternatives
-        alternatives = await self._get_alternatives(product_info)
+        # Closet check, alternatives and (if escalated) the LLM run concurrently
+        llm = get_llm_client()
+        escalate = llm is not None and self._is_borderline(score_result["total_score"])
+        closet_warning, alternatives, llm_fields = await asyncio.gather(
+            self._check_closet_overlap(product_info, user_id),
+            self._get_alternatives(product_info),
+            (
+                self._escalate(llm, product_info, review_insights, score_result)
+                if escalate
+                else _none()
+            ),
+        )
 
-        return AnalyzeItemResponse(
+        response = AnalyzeItemResponse(
             verdict=verdict,
             confidence=abs(score_result["total_score"]),  # Normalize to 0-1
             pros=pros,
@@ -75,24 +111,81 @@ class ItemAnalyzer:
             review_insights=review_insights,
             cost_per_wear_estimate=score_result.get("cost_per_wear"),
         )
+        tier = "heuristic"
+        if escalate:
+            tier = "llm_fallback"
+            if llm_fields:
+                try:
+                    response = merge_analysis(response, llm_fields)
+                    tier = "llm"
+                except LLMError as e:
+                    logger.warning(
+                        f"LLM analysis rejected, using heuristic verdict: {e}"
+                    )
+        metrics.record_tier("analyze_item", tier, time.perf_counter() - started)
+        return response
+
+    def _is_borderline(self, score: float) -> bool:
+        """Score close enough to a verdict threshold that the heuristic may be wrong"""
+        return (
+            min(abs(score - BUY_THRESHOLD), abs(score - WAIT_THRESHOLD))
+            < LLM_ESCALATION_MARGIN
+        )
+
+    def _llm_slots(self) -> asyncio.Semaphore:
+        """Concurrency limit for escalations (one semaphore per event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._llm_semaphore is None or self._llm_semaphore[0] is not loop:
+            self._llm_semaphore = (loop, asyncio.Semaphore(LLM_MAX_CONCURRENCY))
+        return self._llm_semaphore[1]
+
+    async def _escalate(
+        self,
+        llm: LLMClient,
+        product_info: Dict[str, Any],
+        review_insights: Optional[Dict[str, Any]],
+        score_result: Dict[str, Any],
+    ) -> Optional[Dict[str, Any]]:
+        """LLM verdict / pros / cons within LLM_ESCALATION_TIMEOUT (including the
+        wait for a slot); None on failure so the heuristic answer stands"""
+
+        async def call():
+            async with self._llm_slots():
+                return await analyze_item_content(
+                    llm, product_info, review_insights, score_result
+                )
+
+        try:
+            return await asyncio.wait_for(call(), LLM_ESCALATION_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"LLM analysis exceeded {LLM_ESCALATION_TIMEOUT}s, using heuristic verdict"
+            )
+        except LLMError as e:
+            logger.warning(f"LLM analysis failed, using heuristic verdict: {e}")
+        return None
 
     async def _extract_from_link(self, link: str) -> Dict[str, Any]:
-        """Extract product info from URL (MVP: basic parsing).
-        NOTE: Product link is not fetched or parsed yet. Placeholder returns generic info.
-        TODO: Fetch URL, parse product page or integrate product API (e.g. affiliate/retailer).
-        """
-        return {
-            "link": link,
-            "brand": "Unknown",
-            "name": "Product from link",
-            "price": None,
-        }
+        """Extract product info from URL (JSON-LD / OpenGraph on the product page).
+        Falls back to generic info when the page can't be fetched or parsed."""
+        from app.services.link_extractor import link_extractor
+
+        try:
+            return await link_extractor.extract(link)
+        except Exception as e:
+            logger.warning(f"Link extraction failed for {link}: {e}")
+            return {
+                "link": link,
+                "brand": "Unknown",
+                "name": "Product from link",
+                "price": None,
+            }
 
     def _determine_verdict(self, score: float) -> Verdict:
         """Determine verdict from score"""
-        if score > 0.7:
+        if score > BUY_THRESHOLD:
             return Verdict.BUY
-        elif score > 0.4:
+        elif score > WAIT_THRESHOLD:
             return Verdict.WAIT
         else:
             return Verdict.SKIP
@@ -150,8 +243,19 @@ class ItemAnalyzer:
     async def _get_alternatives(
         self, product_info: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
-        """Get alternative product recommendations from DB (same category or price range)."""
+        """Get alternative product recommendations from DB (same category or price range).
+        Runs in a worker thread: the query embedding and the DB reads block."""
+
+        def find():
+            with profiler.attach():
+                return self._find_alternatives(product_info)
+
+        return await asyncio.to_thread(find)
+
+    def _find_alternatives(self, product_info: Dict[str, Any]) -> List[Dict[str, Any]]:
         from app.database import SessionLocal, Product
+        from app.services.dimensions import brands
+        from app.services.product_records import query_records
 
         price = product_info.get("price")
         target_price = price if price and price > 0 else 50.0
@@ -160,15 +264,17 @@ class ItemAnalyzer:
 
         db = SessionLocal()
         try:
-            # Get products in similar price range, exclude same brand if known
             brand = product_info.get("brand")
-            query = db.query(Product).filter(
-                Product.price >= low,
-                Product.price <= high,
-            )
-            if brand and brand != "Unknown":
-                query = query.filter(Product.brand != brand)
-            products = query.order_by(Product.price).limit(3).all()
+            similar = self._similar_alternatives(db, product_info, brand, (low, high))
+            if similar:
+                return similar
+
+            # Get products in similar price range, exclude same brand if known
+            criteria = [Product.price >= low, Product.price <= high]
+            brand_id = brands.lookup(brand) if brand != "Unknown" else None
+            if brand_id is not None:
+                criteria.append(Product.brand_id != brand_id)
+            products = query_records(db, *criteria, order_by=Product.price, limit=3)
 
             return [
                 {
@@ -191,3 +297,53 @@ class ItemAnalyzer:
             ]
         finally:
             db.close()
+
+    def _similar_alternatives(
+        self,
+        db,
+        product_info: Dict[str, Any],
+        brand: Optional[str],
+        price_range: Tuple[float, float],
+    ) -> List[Dict[str, Any]]:
+        """Alternatives ranked by embedding similarity via the ANN index (empty when
+        no index is loaded)"""
+        from app.database import Product
+        from app.services.ann_index import similar_products
+        from app.services.dimensions import brands
+        from app.services.embeddings import product_text
+        from app.services.product_records import query_records
+
+        text = product_text(
+            product_info.get("name"), product_info.get("description"), None
+        )
+        # Over-fetch so the same-brand filter still leaves three
+        hits = similar_products(
+            text,
+            k=9,
+            category=product_info.get("category"),
+            price_range=price_range,
+            # The scanned product itself, when the link is already in the catalog
+            exclude_ids=[pid for pid in [product_info.get("product_id")] if pid],
+        )
+        if not hits:
+            return []
+        by_id = {
+            p.id: p for p in query_records(db, Product.id.in_([pid for pid, _ in hits]))
+        }
+        brand_id = brands.lookup(brand) if brand != "Unknown" else None
+        alternatives = []
+        for pid, _score in hits:
+            p = by_id.get(pid)
+            if p is None or (brand_id is not None and p.brand_id == brand_id):
+                continue
+            alternatives.append(
+                {
+                    "brand": p.brand,
+                    "name": p.name,
+                    "price": float(p.price) if p.price is not None else None,
+                    "reason": "Similar style at a comparable price",
+                }
+            )
+            if len(alternatives) == 3:
+                break
+        return alternatives
@@ -0,0 +1,504 @@
+"""
+Product link extraction for the scanner.
+
+Fetches product pages through one shared httpx.AsyncClient (connection
+pooling, HTTP/2 when the h2 package is installed, per-host concurrency
+limits, timeouts) and parses JSON-LD Product data with an OpenGraph
+fallback using lxml. Only public http(s) hosts are fetched: every hop
+of a redirect chain is resolved and checked against private, loopback,
+link-local and reserved ranges, the connection is pinned to the checked
+address, and bodies are streamed up to LINK_MAX_BYTES. Results are keyed by canonical URL: held in a TTL
+cache and stored as a Product row, so repeat scans of a link never
+refetch. Concurrent scans of the same link share one fetch.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+
+from loguru import logger
+
+from app.services.cache import TTLCache
+
+# httpx and lxml are imported on first use (they dominate this module's import time)
+if TYPE_CHECKING:
+    import httpx
+
+LINK_FETCH_TIMEOUT = float(os.getenv("LINK_FETCH_TIMEOUT", "8"))
+LINK_PER_HOST_LIMIT = int(os.getenv("LINK_PER_HOST_LIMIT", "4"))
+LINK_MAX_CONNECTIONS = int(os.getenv("LINK_MAX_CONNECTIONS", "50"))
+LINK_CACHE_TTL = int(os.getenv("LINK_CACHE_TTL", "86400"))
+LINK_MAX_BYTES = int(os.getenv("LINK_MAX_BYTES", str(5 * 1024 * 1024)))
+LINK_MAX_REDIRECTS = int(os.getenv("LINK_MAX_REDIRECTS", "5"))
+# Only for local development against a fixture server
+LINK_ALLOW_PRIVATE_HOSTS = (
+    os.getenv("LINK_ALLOW_PRIVATE_HOSTS", "false").lower() == "true"
+)
+USER_AGENT = "CapsuleOS/0.1 (+product scanner)"
+
+# Query parameters that never change the product a URL points to
+_TRACKING_PARAMS = {"gclid", "fbclid", "mc_cid", "mc_eid", "ref", "ref_", "srsltid"}
+
+# Keyword -> catalog category (first match wins)
+CATEGORY_KEYWORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("Dress", ("dress", "jumpsuit", "romper")),
+    ("Shoes", ("shoe", "sneaker", "boot", "loafer", "sandal", "heel", "flat")),
+    (
+        "Outerwear",
+        ("coat", "jacket", "blazer", "trench", "parka", "outerwear", "cardigan"),
+    ),
+    (
+        "Bottom",
+        ("pant", "trouser", "jean", "skirt", "short", "legging", "bottom"),
+    ),
+    (
+        "Accessory",
+        ("bag", "tote", "belt", "scarf", "hat", "backpack", "jewel", "accessor"),
+    ),
+    (
+        "Top",
+        ("shirt", "tee", "top", "blouse", "sweater", "knit", "bodysuit", "tank"),
+    ),
+]
+
+
+class UnsafeURLError(ValueError):
+    """A link the server refuses to fetch (scheme, address or redirect chain)"""
+
+
+class ResponseTooLarge(ValueError):
+    """A page body over LINK_MAX_BYTES"""
+
+
+def normalize_category(*texts: Optional[str]) -> Optional[str]:
+    """Map free-text retailer categories / titles onto catalog categories"""
+    for text in texts:
+        if not text:
+            continue
+        lowered = text.lower()
+        for category, keywords in CATEGORY_KEYWORDS:
+            if any(k in lowered for k in keywords):
+                return category
+    return None
+
+
+def canonical_url(url: str) -> str:
+    """Lowercase scheme/host, drop fragment, tracking params and trailing slash"""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.startswith("utm_") and k not in _TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(
+        (
+            parts.scheme.lower() or "https",
+            parts.netloc.lower(),
+            path,
+            urlencode(query),
+            "",
+        )
+    )
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _name_of(value: Any) -> Optional[str]:
+    if isinstance(value, dict):
+        return value.get("name")
+    if isinstance(value, list):
+        return _name_of(value[0]) if value else None
+    return str(value) if value else None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(str(value).replace(",", "").strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _find_products(node: Any) -> List[Dict[str, Any]]:
+    """All JSON-LD nodes typed Product (handles @graph and nested lists)"""
+    found = []
+    for item in _as_list(node):
+        if not isinstance(item, dict):
+            continue
+        types = _as_list(item.get("@type"))
+        if "Product" in types or "ProductGroup" in types:
+            found.append(item)
+        if "@graph" in item:
+            found.extend(_find_products(item["@graph"]))
+    return found
+
+
+def _parse_json_ld(doc) -> Dict[str, Any]:
+    for script in doc.xpath('//script[@type="application/ld+json"]'):
+        try:
+            data = json.loads(script.text_content())
+        except (TypeError, ValueError):
+            continue
+        products = _find_products(data)
+        if not products:
+            continue
+        product = products[0]
+        offers = _as_list(product.get("offers"))
+        if product.get("hasVariant") and not offers:
+            offers = _as_list(_as_list(product["hasVariant"])[0].get("offers"))
+        offer = offers[0] if offers else {}
+        if isinstance(offer, dict) and offer.get("@type") == "AggregateOffer":
+            offer = {**offer, "price": offer.get("lowPrice") or offer.get("price")}
+        image = _as_list(product.get("image"))
+        image_url = (
+            image[0].get("url") if image and isinstance(image[0], dict) else None
+        )
+        return {
+            "name": product.get("name"),
+            "brand": _name_of(product.get("brand")),
+            "description": product.get("description"),
+            "price": _to_float(offer.get("price")) if isinstance(offer, dict) else None,
+            "currency": offer.get("priceCurrency") if isinstance(offer, dict) else None,
+            "image_url": image_url or (image[0] if image else None),
+            "category": _name_of(product.get("category")),
+            "color": _name_of(product.get("color")),
+            "material": _name_of(product.get("material")),
+            "sku": product.get("sku"),
+            "url": product.get("url"),
+        }
+    return {}
+
+
+def _parse_open_graph(doc) -> Dict[str, Any]:
+    meta: Dict[str, str] = {}
+    for tag in doc.xpath("//meta[@property or @name]"):
+        key = tag.get("property") or tag.get("name")
+        if key and key not in meta and tag.get("content"):
+            meta[key] = tag.get("content").strip()
+    title = doc.xpath("string(//title)").strip() or None
+    return {
+        "name": meta.get("og:title") or title,
+        "brand": meta.get("product:brand") or meta.get("og:site_name"),
+        "description": meta.get("og:description") or meta.get("description"),
+        "price": _to_float(
+            meta.get("product:price:amount") or meta.get("og:price:amount")
+        ),
+        "currency": meta.get("product:price:currency") or meta.get("og:price:currency"),
+        "image_url": meta.get("og:image"),
+        "category": meta.get("product:category"),
+        "color": meta.get("product:color"),
+        "url": meta.get("og:url"),
+    }
+
+
+def parse_product_page(body: str, url: str) -> Dict[str, Any]:
+    """Product fields from a page: JSON-LD first, OpenGraph/title to fill gaps"""
+    from lxml import html as lxml_html
+
+    return parse_product_doc(lxml_html.fromstring(body), url)
+
+
+def parse_product_doc(doc, url: str) -> Dict[str, Any]:
+    """parse_product_page on an already parsed lxml document"""
+    json_ld = _parse_json_ld(doc)
+    og = _parse_open_graph(doc)
+    info = {k: json_ld.get(k) or og.get(k) for k in set(json_ld) | set(og)}
+    canonical = doc.xpath('string(//link[@rel="canonical"]/@href)').strip()
+    info["canonical_url"] = canonical_url(
+        urljoin(url, canonical or info.get("url") or url)
+    )
+    if info.get("image_url"):
+        info["image_url"] = urljoin(url, info["image_url"])
+    info["category"] = normalize_category(info.get("category"), info.get("name"))
+    info.pop("url", None)
+    return info
+
+
+def _product_to_info(product) -> Dict[str, Any]:
+    metadata = product.product_metadata or {}
+    return {
+        "link": product.link,
+        "canonical_url": product.link,
+        "name": product.name,
+        "brand": product.brand,
+        "description": product.description,
+        "price": product.price,
+        "category": product.category,
+        "image_url": product.image_url,
+        "color": (product.colors or [None])[0],
+        "currency": metadata.get("currency"),
+        "material": metadata.get("material"),
+        "sku": metadata.get("sku"),
+        "product_id": product.id,
+    }
+
+
+class LinkExtractor:
+    """Fetch + parse product links with caching and per-host limits"""
+
+    def __init__(
+        self,
+        session_factory=None,
+        timeout: float = LINK_FETCH_TIMEOUT,
+        per_host_limit: int = LINK_PER_HOST_LIMIT,
+        max_connections: int = LINK_MAX_CONNECTIONS,
+        cache_ttl: int = LINK_CACHE_TTL,
+        transport: Optional["httpx.AsyncBaseTransport"] = None,
+        max_bytes: int = LINK_MAX_BYTES,
+        max_redirects: int = LINK_MAX_REDIRECTS,
+        allow_private_hosts: bool = LINK_ALLOW_PRIVATE_HOSTS,
+    ):
+        self.session_factory = session_factory
+        self.timeout = timeout
+        self.per_host_limit = per_host_limit
+        self.max_connections = max_connections
+        self.transport = transport
+        self.max_bytes = max_bytes
+        self.max_redirects = max_redirects
+        self.allow_private_hosts = allow_private_hosts
+        self.cache = TTLCache(cache_ttl)
+        self.fetches = 0
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self) -> None:
+        """Client, semaphores and futures belong to one event loop; start fresh
+        if called from another (e.g. a new test client or worker loop)"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._client = None
+            self._host_limits = {}
+            self._inflight = {}
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        if self._client is None or self._client.is_closed:
+            import httpx
+
+            try:
+                import h2  # noqa: F401
+
+                http2 = True
+            except ImportError:
+                http2 = False
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 3.0)),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections // 2,
+                ),
+                # Redirects are followed in fetch() so every hop is checked
+                follow_redirects=False,
+                headers={"User-Agent": USER_AGENT, "Accept": "text/html,*/*;q=0.8"},
+                transport=self.transport,
+            )
+        return self._client
+
+    def _host_limit(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self, url: str) -> Tuple[str, str]:
+        """GET a page under the per-host limit; returns (final url, body).
+        Raises UnsafeURLError for non-public targets and ResponseTooLarge
+        past max_bytes"""
+        client = self._get_client()
+        for _ in range(self.max_redirects + 1):
+            address = await self._check_url(url)
+            host = urlsplit(url).netloc.lower()
+            async with self._host_limit(host):
+                self.fetches += 1
+                response = await client.send(
+                    self._build_request(client, url, address), stream=True
+                )
+                try:
+                    if response.is_redirect:
+                        url = urljoin(url, response.headers["location"])
+                        continue
+                    response.raise_for_status()
+                    body = await self._read_body(response)
+                finally:
+                    await response.aclose()
+            return url, body.decode(
+                response.charset_encoding or "utf-8", errors="replace"
+            )
+        raise UnsafeURLError(f"More than {self.max_redirects} redirects")
+
+    async def _check_url(self, url: str) -> Optional[str]:
+        """Validate one hop; returns the resolved public address to connect to
+        (None when private hosts are allowed)"""
+        parts = urlsplit(url)
+        if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+            raise UnsafeURLError(f"Only http(s) links can be fetched: {url}")
+        if self.allow_private_hosts:
+            return None
+        try:
+            port = parts.port or (443 if parts.scheme.lower() == "https" else 80)
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                parts.hostname, port, type=socket.SOCK_STREAM
+            )
+        except (OSError, ValueError) as e:
+            raise UnsafeURLError(f"Cannot resolve {parts.hostname}: {e}") from e
+        addresses = [info[4][0] for info in infos]
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split("%")[0])
+            mapped = getattr(ip, "ipv4_mapped", None)
+            if mapped is not None:
+                ip = mapped
+            # is_global excludes private, loopback, link-local (incl. the
+            # 169.254.169.254 metadata service), shared and reserved ranges
+            if not ip.is_global or ip.is_multicast:
+                raise UnsafeURLError(
+                    f"{parts.hostname} resolves to non-public address {address}"
+                )
+        if not addresses:
+            raise UnsafeURLError(f"Cannot resolve {parts.hostname}")
+        return addresses[0]
+
+    def _build_request(
+        self, client: "httpx.AsyncClient", url: str, address: Optional[str]
+    ) -> "httpx.Request":
+        """GET request; with an address, connect to it (no second DNS lookup
+        that could rebind) while keeping the Host header and TLS name"""
+        if address is None:
+            return client.build_request("GET", url)
+        parts = urlsplit(url)
+        port = f":{parts.port}" if parts.port else ""
+        host = f"[{parts.hostname}]" if ":" in parts.hostname else parts.hostname
+        ip = f"[{address}]" if ":" in address else address
+        pinned = urlunsplit(parts._replace(netloc=ip + port))
+        return client.build_request(
+            "GET",
+            pinned,
+            headers={"Host": host + port},
+            extensions={"sni_hostname": parts.hostname},
+        )
+
+    async def _read_body(self, response: "httpx.Response") -> bytes:
+        """Stream the body, giving up as soon as it passes max_bytes"""
+        declared = response.headers.get("content-length", "")
+        if declared.isdigit() and int(declared) > self.max_bytes:
+            raise ResponseTooLarge(f"{declared} bytes > {self.max_bytes}")
+        chunks: List[bytes] = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise ResponseTooLarge(f"Body exceeds {self.max_bytes} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def extract(self, link: str) -> Dict[str, Any]:
+        """Product info for a link: cache, then stored Product, then fetch"""
+        key = canonical_url(link)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        self._bind_loop()
+
+        # Share one fetch between concurrent scans of the same link
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            info = await self._load(link, key)
+            future.set_result(info)
+            return info
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else awaited it
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def extract_many(self, links: List[str]) -> List[Dict[str, Any]]:
+        return await asyncio.gather(*(self.extract(link) for link in links))
+
+    async def _load(self, link: str, key: str) -> Dict[str, Any]:
+        stored = await asyncio.to_thread(self._find_stored, key)
+        if stored is None:
+            final_url, body = await self.fetch(link)
+            info = parse_product_page(body, final_url)
+            logger.info(f"Parsed product page {final_url}: {info.get('name')!r}")
+            info["link"] = link
+            # Like the crawler, only priced pages become catalog products
+            if self.session_factory is not None and info.get("price") is not None:
+                info["product_id"] = await asyncio.to_thread(self._store, key, info)
+            stored = info
+        self.cache.set(key, stored)
+        if stored.get("canonical_url") and stored["canonical_url"] != key:
+            self.cache.set(stored["canonical_url"], stored)
+        return stored
+
+    def _find_stored(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.session_factory is None:
+            return None
+        from app.database import Product
+
+        db = self.session_factory()
+        try:
+            product = db.query(Product).filter(Product.link == key).first()
+            return _product_to_info(product) if product else None
+        finally:
+            db.close()
+
+    def _store(self, key: str, info: Dict[str, Any]) -> int:
+        """Upsert the parsed page as a Product keyed by canonical URL"""
+        from app.database import Product
+
+        db = self.session_factory()
+        try:
+            product = db.query(Product).filter(Product.link == key).first()
+            if product is None:
+                product = Product(link=key)
+                db.add(product)
+            product.brand = info.get("brand") or product.brand
+            product.name = info.get("name") or product.name
+            product.category = info.get("category") or product.category
+            product.price = info.get("price") or product.price
+            product.description = info.get("description") or product.description
+            product.image_url = info.get("image_url") or product.image_url
+            if info.get("color"):
+                product.colors = [info["color"].lower()]
+            product.product_metadata = {
+                "source": "link",
+                "currency": info.get("currency"),
+                "material": info.get("material"),
+                "sku": info.get("sku"),
+            }
+            db.commit()
+            return product.id
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+def _default_extractor() -> LinkExtractor:
+    from app.database import SessionLocal
+
+    return LinkExtractor(session_factory=SessionLocal)
+
+
+# Global extractor (client is created lazily on first fetch)
+link_extractor = _default_extractor()
@@ -0,0 +1,489 @@
+"""
+LLM-backed generation for capsules and item analysis.
+
+LLM_PROVIDER selects the backend: "openai" (chat completions in JSON mode),
+"stub" (deterministic offline responses for tests and benchmarks), or empty
+to disable LLM generation entirely (the heuristic pipeline is used).
+
+Every completion is cached on disk (SQLite) under a content hash of
+provider + model + prompt + parameters, with a TTL, and concurrent identical
+calls share one request; cache reads and writes run on a worker thread so
+sqlite never blocks the event loop. Structured output is validated into the API models
+(CapsuleResponse / AnalyzeItemResponse); invalid output raises LLMError so
+callers fall back to the heuristic result. Validation runs before a response
+is cached, so a reply that fails it is never stored or served again.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+
+from app.models import AnalyzeItemResponse, CapsuleItem, CapsuleResponse, Verdict
+from app.prompts import (
+    CAPSULE_GENERATION_PROMPT,
+    ITEM_ANALYSIS_PROMPT,
+    PROS_CONS_PROMPT,
+)
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache.sqlite")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "604800"))  # 7 days
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+
+SYSTEM_PROMPT = "You are a precise assistant. Respond with a single JSON object."
+
+
+class LLMError(Exception):
+    """Provider failure, timeout, or output that doesn't match the schema"""
+
+
+class LLMProvider(ABC):
+    """Backend interface: prompt in, raw JSON text out"""
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @abstractmethod
+    async def complete(
+        self, prompt: str, kind: str, temperature: float, max_tokens: int
+    ) -> str:
+        """Raw completion text for the prompt"""
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions with JSON response format"""
+
+    name = "openai"
+
+    def __init__(self, model: str = LLM_MODEL, api_key: Optional[str] = None):
+        super().__init__(model)
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=self.api_key, timeout=LLM_TIMEOUT)
+        return self._client
+
+    async def complete(
+        self, prompt: str, kind: str, temperature: float, max_tokens: int
+    ) -> str:
+        response = await self._get_client().chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            response_format={"type": "json_object"},
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content or ""
+
+
+# Stub vocabulary (plausible, schema-valid output)
+_STUB_ITEMS = [
+    ("Outerwear", "Trench Coat"),
+    ("Outerwear", "Wool Blazer"),
+    ("Top", "Crew Neck Tee"),
+    ("Top", "Merino Sweater"),
+    ("Top", "Oxford Shirt"),
+    ("Bottom", "Straight Jeans"),
+    ("Bottom", "Wide Leg Trousers"),
+    ("Bottom", "Midi Skirt"),
+    ("Shoes", "Leather Loafers"),
+    ("Shoes", "White Sneakers"),
+    ("Dress", "Slip Dress"),
+    ("Accessory", "Leather Tote"),
+]
+_STUB_BRANDS = ["Everlane", "Uniqlo", "COS", "Aritzia", "Madewell", "J.Crew"]
+_STUB_COLORS = ["black", "navy", "white", "camel", "gray", "olive", "cream"]
+
+
+class StubProvider(LLMProvider):
+    """Deterministic offline provider: the same prompt always yields the same
+    JSON. LLM_STUB_LATENCY_MS simulates provider latency for benchmarks."""
+
+    name = "stub"
+
+    def __init__(self, model: str = "stub", latency_ms: float = LLM_STUB_LATENCY_MS):
+        super().__init__(model)
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    async def complete(
+        self, prompt: str, kind: str, temperature: float, max_tokens: int
+    ) -> str:
+        self.calls += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000.0)
+        rng = random.Random(hashlib.sha256(prompt.encode()).hexdigest())
+        builder = {
+            "capsule": self._capsule,
+            "item_analysis": self._analysis,
+            "pros_cons": self._pros_cons,
+        }[kind]
+        return json.dumps(builder(rng, prompt))
+
+    def _capsule(self, rng: random.Random, prompt: str) -> Dict[str, Any]:
+        budget_match = re.search(r"Budget: \$([\d.]+)", prompt)
+        per_item = float(budget_match.group(1)) / 12 if budget_match else 80.0
+        items = []
+        for category, name in _STUB_ITEMS:
+            value_brand, quality_brand = rng.sample(_STUB_BRANDS, 2)
+            items.append(
+                {
+                    "category": category,
+                    "item_name": name,
+                    "best_value": {
+                        "brand": value_brand,
+                        "name": name,
+                        "price": round(per_item * rng.uniform(0.5, 0.9), 2),
+                        "reason": "Good price for everyday wear",
+                    },
+                    "best_quality": {
+                        "brand": quality_brand,
+                        "name": f"Premium {name}",
+                        "price": round(per_item * rng.uniform(1.1, 1.8), 2),
+                        "reason": "Better fabric and construction",
+                    },
+                    "palette_colors": rng.sample(_STUB_COLORS, 2),
+                }
+            )
+        formulas = [
+            " + ".join(n for _, n in rng.sample(_STUB_ITEMS, 3)) for _ in range(4)
+        ]
+        return {"items": items, "outfit_formulas": formulas}
+
+    def _analysis(self, rng: random.Random, prompt: str) -> Dict[str, Any]:
+        confidence = round(rng.uniform(0.3, 0.95), 2)
+        verdict = "buy" if confidence > 0.7 else "wait" if confidence > 0.45 else "skip"
+        return {
+            "verdict": verdict,
+            "confidence": confidence,
+            "pros": ["Versatile with the rest of the capsule"],
+            "cons": ["Check the fabric content before buying"],
+            "closet_overlap_warning": None,
+            "reasoning": "Stub analysis",
+        }
+
+    def _pros_cons(self, rng: random.Random, prompt: str) -> Dict[str, Any]:
+        pros = [
+            "Works with most of your palette",
+            "Easy to dress up or down",
+            "Reviewers praise the fit",
+            "Fair price for the quality",
+        ]
+        cons = [
+            "Limited color options",
+            "May need tailoring",
+            "Delicate care instructions",
+            "Similar styles are common",
+        ]
+        return {"pros": rng.sample(pros, 3), "cons": rng.sample(cons, 3)}
+
+
+class ResponseCache:
+    """Content-hash -> response text with expiry, in a single SQLite file"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, response TEXT, expires_at REAL)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, response: str, ttl: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, response, time.time() + ttl),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE expires_at < ?", (time.time(),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+
+class LLMClient:
+    """Cached, deduplicated JSON completions over a provider"""
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        cache: Optional[ResponseCache] = None,
+        ttl: float = LLM_CACHE_TTL,
+        timeout: float = LLM_TIMEOUT,
+    ):
+        self.provider = provider
+        self.cache = cache
+        self.ttl = ttl
+        self.timeout = timeout
+        self.stats = {"calls": 0, "cache_hits": 0, "errors": 0}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def identity(self) -> str:
+        return f"{self.provider.name}:{self.provider.model}"
+
+    def request_key(self, kind: str, prompt: str, **params) -> str:
+        payload = json.dumps(
+            {"model": self.identity, "kind": kind, "prompt": prompt, **params},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def complete_json(
+        self,
+        kind: str,
+        prompt: str,
+        temperature: float = 0.2,
+        max_tokens: int = 1500,
+        validate: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    ) -> Any:
+        """Parsed JSON object for the prompt (cache first, then provider), or
+        validate(object) when given; validate raises LLMError to reject the
+        reply, which is then not cached"""
+        key = self.request_key(
+            kind, prompt, temperature=temperature, max_tokens=max_tokens
+        )
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                return self._parse(cached, validate)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return self._parse(await asyncio.shield(inflight), validate)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text = await self._call(kind, prompt, temperature, max_tokens)
+            result = self._parse(text, validate)
+            # Stored before waiters are released, so no later call misses it
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.set, key, text, self.ttl)
+            future.set_result(text)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # avoid "never retrieved" when nobody else waits
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        return result
+
+    def _parse(
+        self, text: str, validate: Optional[Callable[[Dict[str, Any]], Any]]
+    ) -> Any:
+        data = json.loads(text)
+        if validate is None:
+            return data
+        try:
+            return validate(data)
+        except LLMError:
+            self.stats["errors"] += 1
+            raise
+
+    async def _call(
+        self, kind: str, prompt: str, temperature: float, max_tokens: int
+    ) -> str:
+        self.stats["calls"] += 1
+        try:
+            text = await asyncio.wait_for(
+                self.provider.complete(prompt, kind, temperature, max_tokens),
+                self.timeout,
+            )
+            data = json.loads(text)
+        except asyncio.TimeoutError:
+            self.stats["errors"] += 1
+            raise LLMError(f"{self.identity} timed out after {self.timeout}s")
+        except ValueError as e:
+            self.stats["errors"] += 1
+            raise LLMError(f"{self.identity} returned invalid JSON: {e}")
+        except Exception as e:
+            self.stats["errors"] += 1
+            raise LLMError(f"{self.identity} request failed: {e}") from e
+        if not isinstance(data, dict):
+            self.stats["errors"] += 1
+            raise LLMError(
+                f"{self.identity} returned {type(data).__name__}, not object"
+            )
+        return text
+
+
+async def generate_capsule_content(
+    client: LLMClient,
+    quarter: str,
+    climate: str,
+    style_descriptors: List[str],
+    budget: float,
+    shopping_preferences: List[str],
+    palette: List[str],
+) -> Tuple[List[CapsuleItem], List[str]]:
+    """Capsule items and outfit formulas from the LLM, validated by CapsuleResponse"""
+    prompt = CAPSULE_GENERATION_PROMPT.format(
+        quarter=quarter,
+        climate=climate,
+        style_keywords=", ".join(style_descriptors),
+        budget=budget,
+        shopping_preferences=", ".join(shopping_preferences) or "none",
+        palette=", ".join(palette),
+    )
+
+    def validate(data: Dict[str, Any]) -> CapsuleResponse:
+        try:
+            capsule = CapsuleResponse.model_validate(
+                {
+                    "quarter": quarter,
+                    "palette": palette,
+                    "do_not_buy": [],
+                    "items": data.get("items"),
+                    "outfit_formulas": data.get("outfit_formulas") or [],
+                }
+            )
+        except ValidationError as e:
+            raise LLMError(
+                f"Capsule output failed validation: {e.error_count()} errors"
+            )
+        if not capsule.items:
+            raise LLMError("Capsule output has no items")
+        return capsule
+
+    capsule = await client.complete_json(
+        "capsule", prompt, max_tokens=4000, validate=validate
+    )
+    return capsule.items, capsule.outfit_formulas
+
+
+class AnalysisFields(BaseModel):
+    """The AnalyzeItemResponse fields an analysis or pros/cons reply may set
+    (missing ones keep the heuristic value)"""
+
+    verdict: Optional[Verdict] = None
+    confidence: Optional[float] = None
+    pros: Optional[List[str]] = None
+    cons: Optional[List[str]] = None
+    closet_overlap_warning: Optional[str] = None
+
+
+def _validate_analysis(data: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        AnalysisFields.model_validate(data)
+    except ValidationError as e:
+        raise LLMError(f"Analysis output failed validation: {e.error_count()} errors")
+    return data
+
+
+async def analyze_item_content(
+    client: LLMClient,
+    product_info: Dict[str, Any],
+    review_insights: Optional[Dict[str, Any]],
+    score_result: Dict[str, Any],
+    closet_summary: str = "not provided",
+) -> Dict[str, Any]:
+    """Verdict, confidence, pros/cons and closet warning from the analysis and
+    pros/cons prompts, issued concurrently"""
+    description = product_info.get("description") or product_info.get("name") or ""
+    insights = json.dumps(review_insights or {}, sort_keys=True, default=str)
+    analysis_prompt = ITEM_ANALYSIS_PROMPT.format(
+        product_description=description,
+        price=product_info.get("price"),
+        brand=product_info.get("brand"),
+        review_insights=insights,
+        closet_summary=closet_summary,
+    )
+    pros_cons_prompt = PROS_CONS_PROMPT.format(
+        product_name=product_info.get("name") or description,
+        price=product_info.get("price"),
+        review_insights=insights,
+        score_breakdown=json.dumps(score_result, sort_keys=True, default=str),
+    )
+    analysis, pros_cons = await asyncio.gather(
+        client.complete_json(
+            "item_analysis", analysis_prompt, validate=_validate_analysis
+        ),
+        client.complete_json(
+            "pros_cons", pros_cons_prompt, validate=_validate_analysis
+        ),
+    )
+    return {
+        "verdict": analysis.get("verdict"),
+        "confidence": analysis.get("confidence"),
+        "pros": (pros_cons.get("pros") or analysis.get("pros") or [])[:5],
+        "cons": (pros_cons.get("cons") or analysis.get("cons") or [])[:5],
+        "closet_overlap_warning": analysis.get("closet_overlap_warning"),
+    }
+
+
+def merge_analysis(
+    base: AnalyzeItemResponse, llm_fields: Dict[str, Any]
+) -> AnalyzeItemResponse:
+    """Overlay LLM fields on the heuristic response, validated as a whole"""
+    merged = base.model_dump()
+    merged.update({k: v for k, v in llm_fields.items() if v is not None})
+    try:
+        return AnalyzeItemResponse.model_validate(merged)
+    except ValidationError as e:
+        raise LLMError(f"Analysis output failed validation: {e.error_count()} errors")
+
+
+def create_client(provider_name: str = LLM_PROVIDER) -> Optional[LLMClient]:
+    if not provider_name:
+        return None
+    if provider_name == "openai":
+        provider: LLMProvider = OpenAIProvider()
+    elif provider_name == "stub":
+        provider = StubProvider()
+    else:
+        logger.warning(f"Unknown LLM_PROVIDER {provider_name!r}; LLM generation off")
+        return None
+    logger.info(f"LLM generation enabled: {provider.name}:{provider.model}")
+    return LLMClient(provider, ResponseCache())
+
+
+_client: Optional[LLMClient] = None
+_client_loaded = False
+
+
+def get_llm_client() -> Optional[LLMClient]:
+    """Process-wide client (None when LLM_PROVIDER is unset)"""
+    global _client, _client_loaded
+    if not _client_loaded:
+        _client_loaded = True
+        _client = create_client()
+    return _client
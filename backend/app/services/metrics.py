@@ -0,0 +1,301 @@
+"""
+Lightweight in-process metrics (request latency, DB queries, cache hit ratios)
+exported in Prometheus text format.
+
+Counters and histogram buckets are plain preallocated lists updated without
+locks. Under the GIL a concurrent increment can very occasionally be lost,
+which is an acceptable trade for monitoring data on the request hot path.
+"""
+
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# Seconds; upper bounds of the latency buckets (+Inf is implicit)
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# Queries per request
+QUERY_COUNT_BUCKETS: Tuple[float, ...] = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Fixed-bucket histogram with preallocated counts"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> Iterable[str]:
+        """Prometheus exposition lines (cumulative buckets)"""
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            yield f'{name}_bucket{{{labels}{sep}le="{bound:g}"}} {cumulative}'
+        cumulative += self.counts[-1]
+        yield f'{name}_bucket{{{labels}{sep}le="+Inf"}} {cumulative}'
+        suffix = f"{{{labels}}}" if labels else ""
+        yield f"{name}_sum{suffix} {self.sum:.6f}"
+        yield f"{name}_count{suffix} {self.count}"
+
+
+class RouteStats:
+    """All series for one (method, route) pair"""
+
+    __slots__ = ("latency", "db_queries", "db_time", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.db_queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.statuses: Dict[int, int] = {}
+
+
+class RequestStats:
+    """Per-request accumulator for DB activity (bound via a ContextVar)"""
+
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "capsuleos_request_stats", default=None
+)
+
+
+class MetricsRegistry:
+    """Process-wide metrics registry"""
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.query_latency = Histogram(LATENCY_BUCKETS)
+        self.caches: Dict[str, object] = {}
+        # (pipeline, tier) -> latency of decisions answered by that tier
+        self.tiers: Dict[Tuple[str, str], Histogram] = {}
+        # (reader, source) -> reads, e.g. capsule slots served by snapshot vs SQL
+        self.read_sources: Dict[Tuple[str, str], int] = {}
+        # name -> (help, value) for gauges set by services
+        self.gauges: Dict[str, Tuple[str, float]] = {}
+
+    def route(self, method: str, route: str) -> RouteStats:
+        key = (method, route)
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes.setdefault(key, RouteStats())
+        return stats
+
+    def start_request(self) -> Tuple[RequestStats, object]:
+        """Bind a fresh DB accumulator to the current context"""
+        stats = RequestStats()
+        return stats, _current_request.set(stats)
+
+    def finish_request(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        elapsed: float,
+        request_stats: RequestStats,
+        token: object,
+    ) -> None:
+        _current_request.reset(token)
+        stats = self.route(method, route)
+        stats.latency.observe(elapsed)
+        stats.db_queries.observe(request_stats.queries)
+        stats.db_time.observe(request_stats.db_time)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def record_query(self, elapsed: float) -> None:
+        self.query_latency.observe(elapsed)
+        stats = _current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+    def record_tier(self, pipeline: str, tier: str, elapsed: float) -> None:
+        """Count a decision answered by a tier (e.g. heuristic vs llm)"""
+        key = (pipeline, tier)
+        hist = self.tiers.get(key)
+        if hist is None:
+            hist = self.tiers.setdefault(key, Histogram(LATENCY_BUCKETS))
+        hist.observe(elapsed)
+
+    def escalation_ratio(self, pipeline: str) -> float:
+        """Fraction of decisions not answered by the heuristic tier"""
+        total = escalated = 0
+        for (name, tier), hist in list(self.tiers.items()):
+            if name == pipeline:
+                total += hist.count
+                if tier != "heuristic":
+                    escalated += hist.count
+        return escalated / total if total else 0.0
+
+    def record_read_source(self, reader: str, source: str) -> None:
+        """Count a read answered by a data source (e.g. snapshot vs sql)"""
+        key = (reader, source)
+        self.read_sources[key] = self.read_sources.get(key, 0) + 1
+
+    def set_gauge(self, name: str, value: float, help_text: str) -> None:
+        self.gauges[name] = (help_text, value)
+
+    def register_cache(self, name: str, cache) -> None:
+        """Expose hits/misses/size of a TTLCache-like object"""
+        self.caches[name] = cache
+
+    def instrument_engine(self, engine) -> None:
+        """Time every cursor execution on the given SQLAlchemy engine"""
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("capsuleos_query_start", []).append(perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get("capsuleos_query_start")
+            if starts:
+                self.record_query(perf_counter() - starts.pop())
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines: List[str] = []
+        routes = sorted(self.routes.items())
+
+        lines.append(
+            "# HELP capsuleos_request_duration_seconds Request latency by route"
+        )
+        lines.append("# TYPE capsuleos_request_duration_seconds histogram")
+        for (method, route), stats in routes:
+            lines.extend(
+                stats.latency.render(
+                    "capsuleos_request_duration_seconds",
+                    f'method="{method}",route="{route}"',
+                )
+            )
+
+        lines.append("# HELP capsuleos_requests_total Requests by route and status")
+        lines.append("# TYPE capsuleos_requests_total counter")
+        for (method, route), stats in routes:
+            for status, n in sorted(stats.statuses.items()):
+                lines.append(
+                    f'capsuleos_requests_total{{method="{method}",route="{route}",'
+                    f'status="{status}"}} {n}'
+                )
+
+        lines.append("# HELP capsuleos_request_db_queries DB queries per request")
+        lines.append("# TYPE capsuleos_request_db_queries histogram")
+        for (method, route), stats in routes:
+            lines.extend(
+                stats.db_queries.render(
+                    "capsuleos_request_db_queries",
+                    f'method="{method}",route="{route}"',
+                )
+            )
+
+        lines.append(
+            "# HELP capsuleos_request_db_seconds Time spent in DB queries per request"
+        )
+        lines.append("# TYPE capsuleos_request_db_seconds histogram")
+        for (method, route), stats in routes:
+            lines.extend(
+                stats.db_time.render(
+                    "capsuleos_request_db_seconds",
+                    f'method="{method}",route="{route}"',
+                )
+            )
+
+        lines.append("# HELP capsuleos_db_query_duration_seconds Single query latency")
+        lines.append("# TYPE capsuleos_db_query_duration_seconds histogram")
+        lines.extend(
+            self.query_latency.render("capsuleos_db_query_duration_seconds", "")
+        )
+
+        lines.append("# HELP capsuleos_cache_hits_total Cache hits")
+        lines.append("# TYPE capsuleos_cache_hits_total counter")
+        for name, cache in sorted(self.caches.items()):
+            lines.append(f'capsuleos_cache_hits_total{{cache="{name}"}} {cache.hits}')
+        lines.append("# HELP capsuleos_cache_misses_total Cache misses")
+        lines.append("# TYPE capsuleos_cache_misses_total counter")
+        for name, cache in sorted(self.caches.items()):
+            lines.append(
+                f'capsuleos_cache_misses_total{{cache="{name}"}} {cache.misses}'
+            )
+        lines.append("# HELP capsuleos_cache_hit_ratio Hits / (hits + misses)")
+        lines.append("# TYPE capsuleos_cache_hit_ratio gauge")
+        for name, cache in sorted(self.caches.items()):
+            lookups = cache.hits + cache.misses
+            ratio = cache.hits / lookups if lookups else 0.0
+            lines.append(f'capsuleos_cache_hit_ratio{{cache="{name}"}} {ratio:.6f}')
+        lines.append("# HELP capsuleos_cache_entries Current number of entries")
+        lines.append("# TYPE capsuleos_cache_entries gauge")
+        for name, cache in sorted(self.caches.items()):
+            lines.append(f'capsuleos_cache_entries{{cache="{name}"}} {cache.size()}')
+
+        tiers = sorted(self.tiers.items())
+        lines.append(
+            "# HELP capsuleos_decision_duration_seconds Decision latency by tier"
+        )
+        lines.append("# TYPE capsuleos_decision_duration_seconds histogram")
+        for (pipeline, tier), hist in tiers:
+            lines.extend(
+                hist.render(
+                    "capsuleos_decision_duration_seconds",
+                    f'pipeline="{pipeline}",tier="{tier}"',
+                )
+            )
+        lines.append(
+            "# HELP capsuleos_decision_escalation_ratio Decisions escalated past "
+            "the heuristic tier"
+        )
+        lines.append("# TYPE capsuleos_decision_escalation_ratio gauge")
+        for pipeline in sorted({pipeline for pipeline, _ in self.tiers}):
+            lines.append(
+                f'capsuleos_decision_escalation_ratio{{pipeline="{pipeline}"}} '
+                f"{self.escalation_ratio(pipeline):.6f}"
+            )
+
+        lines.append(
+            "# HELP capsuleos_read_source_total Reads by reader and data source"
+        )
+        lines.append("# TYPE capsuleos_read_source_total counter")
+        for (reader, source), n in sorted(self.read_sources.items()):
+            lines.append(
+                f'capsuleos_read_source_total{{reader="{reader}",source="{source}"}} {n}'
+            )
+        for name, (help_text, value) in sorted(self.gauges.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Global registry
+metrics = MetricsRegistry()
@@ -0,0 +1,251 @@
+"""
+Per-category price statistics (p10 / p50 / p90)
+
+The category_price_stats table holds, per category_id, the price quantiles plus
+the streaming sketch they were read from. The sketch is a log-bucketed
+histogram (DDSketch-style): every quantile is within PRICE_SKETCH_ACCURACY
+relative error, it holds a few hundred buckets whatever the catalog size, and
+it supports removal, so updates and deletes stay exact under incremental
+maintenance.
+
+Maintenance:
+  - ORM product writes: app.database's before_flush hook collects price deltas
+    (+1 new price, -1 old price) and apply_deltas() folds them into the affected
+    rows in the same transaction
+  - bulk Core writes (crawler upsert, seeding): refresh_categories() /
+    rebuild() recompute from the products table with a streaming scan
+  - init_db: rebuild() when the table is empty but products exist
+
+Readers (ItemScorer._score_price, capsule slot targets) call
+price_stats.quantiles(category_id): an in-memory dict lookup. The map reloads
+after local commits that touched it, and every PRICE_STATS_REFRESH_SECONDS to
+pick up writes from other workers.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import os
+import threading
+import time
+
+from loguru import logger
+from sqlalchemy import bindparam, text
+
+PRICE_SKETCH_ACCURACY = float(os.getenv("PRICE_SKETCH_ACCURACY", "0.01"))
+PRICE_STATS_REFRESH_SECONDS = float(os.getenv("PRICE_STATS_REFRESH_SECONDS", "30"))
+QUANTILES = (0.1, 0.5, 0.9)
+
+# Session.info key for categories whose stats changed in the open transaction
+PENDING_KEY = "price_stats_dirty"
+
+
+class PriceSketch:
+    """Mergeable log-bucket quantile sketch over positive prices"""
+
+    __slots__ = ("counts", "zero", "n", "_gamma_log")
+
+    def __init__(self, accuracy: float = PRICE_SKETCH_ACCURACY):
+        gamma = (1 + accuracy) / (1 - accuracy)
+        self._gamma_log = math.log(gamma)
+        self.counts: Dict[int, int] = {}
+        self.zero = 0  # prices <= 0
+        self.n = 0
+
+    def _bucket(self, price: float) -> int:
+        return math.ceil(math.log(price) / self._gamma_log)
+
+    def _value(self, bucket: int) -> float:
+        # Midpoint (in relative terms) of (gamma^(b-1), gamma^b]
+        gamma = math.exp(self._gamma_log)
+        return 2 * gamma**bucket / (gamma + 1)
+
+    def add(self, price: Optional[float], count: int = 1) -> None:
+        """Add (count > 0) or remove (count < 0) a price"""
+        if price is None or price != price:
+            return
+        self.n += count
+        if price <= 0:
+            self.zero += count
+            return
+        bucket = self._bucket(price)
+        total = self.counts.get(bucket, 0) + count
+        if total > 0:
+            self.counts[bucket] = total
+        else:
+            self.counts.pop(bucket, None)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.n <= 0:
+            return None
+        rank = q * (self.n - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if rank < seen:
+                return self._value(bucket)
+        return self._value(max(self.counts)) if self.counts else 0.0
+
+    def to_json(self) -> str:
+        return json.dumps({"z": self.zero, "b": self.counts})
+
+    @classmethod
+    def from_json(cls, data: Optional[str]) -> "PriceSketch":
+        sketch = cls()
+        if data:
+            state = json.loads(data)
+            sketch.zero = state["z"]
+            sketch.counts = {int(k): v for k, v in state["b"].items()}
+            sketch.n = sketch.zero + sum(sketch.counts.values())
+        return sketch
+
+
+def _save(connection, category_id: int, sketch: PriceSketch) -> None:
+    if sketch.n <= 0:
+        connection.execute(
+            text("DELETE FROM category_price_stats WHERE category_id = :c"),
+            {"c": category_id},
+        )
+        return
+    p10, p50, p90 = (round(sketch.quantile(q), 2) for q in QUANTILES)
+    params = {
+        "c": category_id,
+        "n": sketch.n,
+        "p10": p10,
+        "p50": p50,
+        "p90": p90,
+        "sketch": sketch.to_json(),
+        "now": datetime.utcnow(),
+    }
+    updated = connection.execute(
+        text(
+            "UPDATE category_price_stats SET n = :n, p10 = :p10, p50 = :p50, "
+            "p90 = :p90, sketch = :sketch, updated_at = :now WHERE category_id = :c"
+        ),
+        params,
+    )
+    if not updated.rowcount:
+        connection.execute(
+            text(
+                "INSERT INTO category_price_stats "
+                "(category_id, n, p10, p50, p90, sketch, updated_at) "
+                "VALUES (:c, :n, :p10, :p50, :p90, :sketch, :now)"
+            ),
+            params,
+        )
+
+
+def apply_deltas(connection, deltas: Dict[int, List[Tuple[float, int]]]) -> None:
+    """Fold (price, +1/-1) deltas per category_id into the stored sketches"""
+    for category_id, changes in deltas.items():
+        row = connection.execute(
+            text("SELECT sketch FROM category_price_stats WHERE category_id = :c"),
+            {"c": category_id},
+        ).first()
+        sketch = PriceSketch.from_json(row[0] if row else None)
+        for price, count in changes:
+            sketch.add(price, count)
+        _save(connection, category_id, sketch)
+
+
+def refresh_categories(connection, category_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute sketches from the products table (all categories when None),
+    streaming prices; returns the number of categories written"""
+    query = text(
+        "SELECT category_id, price FROM products WHERE category_id IS NOT NULL"
+    )
+    params = {}
+    wanted = None
+    if category_ids is not None:
+        wanted = {c for c in category_ids if c is not None}
+        if not wanted:
+            return 0
+        query = text(
+            "SELECT category_id, price FROM products WHERE category_id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True))
+        params["ids"] = sorted(wanted)
+    # Categories that lost all their products still get their row removed
+    sketches: Dict[int, PriceSketch] = {c: PriceSketch() for c in wanted or ()}
+    result = connection.execution_options(yield_per=10_000).execute(query, params)
+    for category_id, price in result:
+        sketch = sketches.get(category_id)
+        if sketch is None:
+            sketch = sketches[category_id] = PriceSketch()
+        sketch.add(price)
+    if wanted is None:
+        connection.execute(text("DELETE FROM category_price_stats"))
+    for category_id, sketch in sketches.items():
+        _save(connection, category_id, sketch)
+    return len(sketches)
+
+
+def rebuild(connection) -> int:
+    """Recompute every category's stats"""
+    count = refresh_categories(connection, None)
+    logger.info(f"Rebuilt price stats for {count} categories")
+    return count
+
+
+class CategoryPriceStats:
+    """In-memory category_id -> (p10, p50, p90) map"""
+
+    def __init__(self, refresh_seconds: float = PRICE_STATS_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.version = 0  # bumped on every reload that changed the map
+        self._quantiles: Dict[int, Tuple[float, float, float]] = {}
+        self._loaded_at: Optional[float] = None
+        self._engine = None
+        self._lock = threading.Lock()
+
+    def bind(self, engine) -> None:
+        self._engine = engine
+
+    def load(self, connection) -> None:
+        rows = connection.execute(
+            text("SELECT category_id, p10, p50, p90 FROM category_price_stats")
+        ).all()
+        quantiles = {int(c): (p10, p50, p90) for c, p10, p50, p90 in rows}
+        with self._lock:
+            if quantiles != self._quantiles:
+                self._quantiles = quantiles
+                self.version += 1
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Reload on next read (after a local commit changed the table)"""
+        self._loaded_at = None
+
+    def _maybe_reload(self) -> None:
+        loaded_at = self._loaded_at
+        if loaded_at is not None and (
+            time.monotonic() - loaded_at < self.refresh_seconds
+        ):
+            return
+        if self._engine is None:
+            return
+        try:
+            with self._engine.connect() as conn:
+                self.load(conn)
+        except Exception as e:
+            logger.debug(f"Price stats not loaded: {e}")
+            self._loaded_at = time.monotonic()
+
+    def current_version(self) -> int:
+        """Version after picking up any due reload (cache key for derived data)"""
+        self._maybe_reload()
+        return self.version
+
+    def quantiles(self, category_id: Optional[int]) -> Optional[Tuple[float, ...]]:
+        """(p10, p50, p90) for a category, None when unknown"""
+        self._maybe_reload()
+        return self._quantiles.get(category_id)
+
+    def median(self, category_id: Optional[int]) -> Optional[float]:
+        stats = self.quantiles(category_id)
+        return stats[1] if stats else None
+
+
+price_stats = CategoryPriceStats()
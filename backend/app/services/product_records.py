@@ -0,0 +1,86 @@
+"""
+Lightweight product read model
+
+Capsule slot resolution and scanner alternatives only read a handful of product
+fields, so they load ProductRecord objects (__slots__, column-only SELECT)
+instead of ORM Product instances: no identity map, no instance state, roughly a
+fifth of the memory per row, and cheap to pickle for process workers.
+"""
+
+from typing import Any, List, Optional
+
+from app.database import Product
+
+# Columns loaded per record, in ProductRecord.__slots__ order
+RECORD_COLUMNS = (
+    Product.id,
+    Product.brand,
+    Product.brand_id,
+    Product.name,
+    Product.category,
+    Product.category_id,
+    Product.price,
+    Product.colors,
+    Product.image_url,
+    Product.link,
+)
+
+
+class ProductRecord:
+    """Read-only product fields used by the recommendation hot paths"""
+
+    __slots__ = (
+        "id",
+        "brand",
+        "brand_id",
+        "name",
+        "category",
+        "category_id",
+        "price",
+        "colors",
+        "image_url",
+        "link",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        brand: Optional[str],
+        brand_id: Optional[int],
+        name: Optional[str],
+        category: Optional[str],
+        category_id: Optional[int],
+        price: Optional[float],
+        colors: Optional[List[str]],
+        image_url: Optional[str] = None,
+        link: Optional[str] = None,
+    ):
+        self.id = id
+        self.brand = brand
+        self.brand_id = brand_id
+        self.name = name
+        self.category = category
+        self.category_id = category_id
+        self.price = price
+        self.colors = colors
+        self.image_url = image_url
+        self.link = link
+
+    def __reduce__(self):
+        # Pickle as a plain tuple of field values
+        return ProductRecord, tuple(getattr(self, f) for f in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"ProductRecord({self.id}, {self.brand!r}, {self.name!r}, {self.price})"
+
+
+def query_records(db, *criteria: Any, order_by=None, limit: Optional[int] = None):
+    """ProductRecords matching the filter criteria (column-only query)"""
+    query = db.query(*RECORD_COLUMNS)
+    if criteria:
+        query = query.filter(*criteria)
+    if order_by is not None:
+        query = query.order_by(order_by)
+    if limit is not None:
+        query = query.limit(limit)
+    return [ProductRecord(*row) for row in query]
@@ -0,0 +1,314 @@
+"""
+Opt-in sampling profiler for hot endpoints.
+
+A fraction of requests to selected routes (PROFILE_SAMPLE_RATE, PROFILE_ROUTES)
+register while they run, each under its own token. A single daemon thread
+samples the registered threads' stacks every PROFILE_INTERVAL_MS via
+sys._current_frames() and aggregates them into collapsed stacks ("a;b;c
+count"), written per route to PROFILE_OUTPUT_DIR/<route>.folded -- the input
+format of flamegraph.pl, speedscope and inferno. Settings can be changed at
+runtime through /api/admin/profiler without restarting the worker.
+
+Concurrent async requests share the event loop thread, so a loop sample is
+credited to the request owning the task the loop is running at that moment:
+the request's token lives in a contextvar, and tasks created while it is set
+are tagged with it (task factory), so gather()ed subtasks count too. Samples
+taken while the loop runs other work or sits idle are dropped. Worker threads
+join the request whose context they run in via `with profiler.attach():`
+(capsule slot resolution does, so its ORM work on the slot executor is
+sampled).
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import asyncio
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+import weakref
+
+from loguru import logger
+
+DEFAULT_ROUTES = "/api/generate-capsule,/api/analyze-item"
+# Cap on frames per collapsed stack
+_MAX_DEPTH = 128
+
+
+# Task each event loop is running (read from the sampler thread)
+_current_tasks = getattr(asyncio.tasks, "_current_tasks", {})
+
+# Token of the profiled request the current context belongs to
+_request_token: ContextVar[Optional[int]] = ContextVar(
+    "profiler_request_token", default=None
+)
+
+
+def _parse_routes(value: str) -> List[str]:
+    return [r.strip() for r in value.split(",") if r.strip()]
+
+
+def _route_slug(route: str) -> str:
+    return (
+        route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    )
+
+
+def collapse_stack(frame) -> str:
+    """Render a frame chain root-first as 'file:function;file:function;...'"""
+    parts = []
+    depth = 0
+    while frame is not None and depth < _MAX_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+        depth += 1
+    parts.reverse()
+    return ";".join(parts)
+
+
+class SamplingProfiler:
+    """Stack sampler shared by all profiled requests in this worker"""
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        routes: Optional[List[str]] = None,
+        interval_ms: float = 5.0,
+        output_dir: str = "profiles",
+        flush_interval_s: float = 10.0,
+    ):
+        self.sample_rate = sample_rate
+        self.routes = set(routes or [])
+        self.interval_ms = interval_ms
+        self.output_dir = output_dir
+        self.flush_interval_s = flush_interval_s
+        self.stacks: Dict[str, Counter] = {}
+        self.profiled_requests: Dict[str, int] = {}
+        self._requests: Dict[int, str] = {}  # token -> route
+        # thread id -> (event loop or None, tokens registered on the thread)
+        self._threads: Dict[int, tuple] = {}
+        self._task_tokens = weakref.WeakKeyDictionary()  # asyncio task -> token
+        self._loops = weakref.WeakSet()  # loops with the tagging task factory
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._dirty = False
+        self._last_flush = time.monotonic()
+
+    def configure(
+        self,
+        sample_rate: Optional[float] = None,
+        routes: Optional[List[str]] = None,
+        interval_ms: Optional[float] = None,
+    ) -> None:
+        """Change settings at runtime (admin endpoint)"""
+        if sample_rate is not None:
+            self.sample_rate = max(0.0, min(1.0, sample_rate))
+        if routes is not None:
+            self.routes = set(routes)
+        if interval_ms is not None:
+            self.interval_ms = max(1.0, interval_ms)
+        logger.info(
+            f"Profiler configured: rate={self.sample_rate}, routes={sorted(self.routes)}, "
+            f"interval={self.interval_ms}ms"
+        )
+
+    def should_profile(self, path: str) -> bool:
+        return (
+            self.sample_rate > 0
+            and path in self.routes
+            and random.random() < self.sample_rate
+        )
+
+    def start(self, route: str) -> int:
+        """Register a profiled request (and the calling thread); returns a token
+        for stop()"""
+        token = next(self._tokens)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            self._tag_tasks(loop)
+            task = asyncio.current_task(loop)
+            if task is not None:
+                self._task_tokens[task] = token
+        _request_token.set(token)
+        with self._lock:
+            self._requests[token] = route
+            self.profiled_requests[route] = self.profiled_requests.get(route, 0) + 1
+            self._register_thread(token, loop)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="sampling-profiler", daemon=True
+                )
+                self._thread.start()
+        self._wakeup.set()
+        return token
+
+    def stop(self, token: int) -> None:
+        with self._lock:
+            self._requests.pop(token, None)
+            self._unregister_thread(token)
+        if _request_token.get() == token:
+            _request_token.set(None)
+
+    @contextmanager
+    def attach(self):
+        """Sample the calling (worker) thread for the profiled request whose
+        context it runs in; no-op outside profiled requests"""
+        token = _request_token.get()
+        with self._lock:
+            active = token is not None and token in self._requests
+            if active:
+                self._register_thread(token, None)
+        try:
+            yield
+        finally:
+            if active:
+                with self._lock:
+                    self._unregister_thread(token)
+
+    def _register_thread(self, token: int, loop) -> None:
+        tid = threading.get_ident()
+        _, tokens = self._threads.get(tid, (None, []))
+        self._threads[tid] = (loop, tokens + [token])
+
+    def _unregister_thread(self, token: int) -> None:
+        tid = threading.get_ident()
+        loop, tokens = self._threads.get(tid, (None, []))
+        tokens = [t for t in tokens if t != token]
+        if tokens:
+            self._threads[tid] = (loop, tokens)
+        else:
+            self._threads.pop(tid, None)
+
+    def _tag_tasks(self, loop) -> None:
+        """Install a task factory tagging tasks created inside profiled requests"""
+        if loop in self._loops:
+            return
+        previous = loop.get_task_factory()
+        task_tokens = self._task_tokens
+
+        def factory(loop, coro, **kwargs):
+            if previous is not None:
+                task = previous(loop, coro, **kwargs)
+            else:
+                task = asyncio.Task(coro, loop=loop, **kwargs)
+            # The new task runs in (a copy of) this context unless given one
+            context = kwargs.get("context")
+            if context is not None:
+                token = context.get(_request_token)
+            else:
+                token = _request_token.get()
+            if token is not None:
+                task_tokens[task] = token
+            return task
+
+        loop.set_task_factory(factory)
+        self._loops.add(loop)
+
+    def status(self) -> Dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "routes": sorted(self.routes),
+            "interval_ms": self.interval_ms,
+            "output_dir": os.path.abspath(self.output_dir),
+            "profiled_requests": dict(self.profiled_requests),
+            "samples": {
+                route: sum(c.values()) for route, c in list(self.stacks.items())
+            },
+        }
+
+    def _owner(self, loop, tokens: List[int]) -> Optional[int]:
+        """Token the thread is working for right now (None: unattributable)"""
+        if loop is None:
+            # Plain threads run one request at a time: the latest registration
+            return tokens[-1]
+        task = _current_tasks.get(loop)
+        if task is None:
+            return None  # loop idle or between callbacks
+        return self._task_tokens.get(task)
+
+    def _sample_once(self) -> None:
+        me = threading.get_ident()
+        with self._lock:
+            threads = [
+                (tid, loop, list(tokens))
+                for tid, (loop, tokens) in self._threads.items()
+            ]
+            requests = dict(self._requests)
+        if not threads:
+            return
+        frames = sys._current_frames()
+        samples = []
+        for tid, loop, tokens in threads:
+            frame = frames.get(tid)
+            if frame is None or tid == me:
+                continue
+            route = requests.get(self._owner(loop, tokens))
+            if route is None:
+                continue
+            samples.append((route, collapse_stack(frame)))
+        del frames
+        with self._lock:
+            for route, stack in samples:
+                self.stacks.setdefault(route, Counter())[stack] += 1
+                self._dirty = True
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                idle = not self._threads
+            if idle:
+                if self._dirty and time.monotonic() - self._last_flush >= 1.0:
+                    self.flush()
+                self._wakeup.wait(timeout=self.flush_interval_s)
+                self._wakeup.clear()
+                continue
+            self._sample_once()
+            if (
+                self._dirty
+                and time.monotonic() - self._last_flush >= self.flush_interval_s
+            ):
+                self.flush()
+            time.sleep(self.interval_ms / 1000.0)
+
+    def flush(self) -> List[str]:
+        """Write aggregated collapsed stacks (cumulative) to one file per route"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            snapshot = {route: Counter(c) for route, c in self.stacks.items()}
+        written = []
+        for route, counter in snapshot.items():
+            path = os.path.join(self.output_dir, f"{_route_slug(route)}.folded")
+            tmp = path + ".tmp"
+            with open(tmp, "w") as f:
+                for stack, count in counter.most_common():
+                    f.write(f"{stack} {count}\n")
+            os.replace(tmp, path)
+            written.append(path)
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        return written
+
+    def reset(self) -> None:
+        """Drop aggregated samples (files on disk are left untouched)"""
+        with self._lock:
+            self.stacks.clear()
+            self.profiled_requests.clear()
+
+
+# Global profiler (off unless PROFILE_SAMPLE_RATE > 0 or enabled via admin endpoint)
+profiler = SamplingProfiler(
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    routes=_parse_routes(os.getenv("PROFILE_ROUTES", DEFAULT_ROUTES)),
+    interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "5")),
+    output_dir=os.getenv("PROFILE_OUTPUT_DIR", "profiles"),
+)
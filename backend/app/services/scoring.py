@@ -3,11 +3,21 @@ Scoring services for capsule coherence and item evaluation
 """
 
 from typing import Dict, Any, List, Optional
+from app.services.dimensions import categories
+from app.services.price_stats import price_stats
+from app.services.wear_model import get_wear_model
+from app.services.tracing import tracer
+
+VERSATILE_CATEGORIES = ["tee", "jeans", "blazer", "trench"]
 
 
 class CapsuleScorer:
     """Score capsule wardrobe coherence"""
 
+    def __init__(self):
+        # category id -> versatile flag, computed once per known category
+        self._versatile: Dict[int, bool] = {}
+
     def score_capsule(
         self,
         items: List[Dict[str, Any]],
@@ -17,9 +27,10 @@ class CapsuleScorer:
         """
         Compute capsule coherence scores
         """
-        palette_score = self._score_palette_match(items, palette)
-        versatility_score = self._score_versatility(items)
-        overlap_score = self._score_closet_overlap(items, closet_items)
+        with tracer.span("scorer.score_capsule", items=len(items)):
+            palette_score = self._score_palette_match(items, palette)
+            versatility_score = self._score_versatility(items)
+            overlap_score = self._score_closet_overlap(items, closet_items)
 
         return {
             "palette_score": palette_score,
@@ -43,14 +54,16 @@ class CapsuleScorer:
         """Score how versatile items are (how many pairs)"""
         # MVP: Estimate based on categories
         # TODO: Use actual pairing logic
-        versatile_categories = ["tee", "jeans", "blazer", "trench"]
-        versatile_count = sum(
-            1
-            for item in items
-            if any(
-                cat in item.get("category", "").lower() for cat in versatile_categories
-            )
-        )
+        versatile_count = 0
+        for item in items:
+            category_id = categories.lookup(item.get("category"))
+            versatile = self._versatile.get(category_id)
+            if versatile is None:
+                key = categories.key(item.get("category"))
+                versatile = any(cat in key for cat in VERSATILE_CATEGORIES)
+                if category_id is not None:
+                    self._versatile[category_id] = versatile
+            versatile_count += versatile
         return versatile_count / len(items) if items else 0.0
 
     def _score_closet_overlap(self, items: List[Dict], closet: List[Dict]) -> float:
@@ -58,8 +71,9 @@ class CapsuleScorer:
         if not closet:
             return 1.0  # No overlap is good
 
-        closet_categories = {item.get("category", "").lower() for item in closet}
-        new_categories = {item.get("category", "").lower() for item in items}
+        # Normalized names: closet categories needn't exist in the catalog
+        closet_categories = {categories.key(item.get("category")) for item in closet}
+        new_categories = {categories.key(item.get("category")) for item in items}
 
         overlap = len(closet_categories & new_categories)
         return 1.0 - (overlap / len(new_categories)) if new_categories else 1.0
@@ -81,13 +95,18 @@ class ItemScorer:
         Score an item across multiple dimensions
         """
         # Score components
-        price_score = self._score_price(product_info.get("price"))
+        price_score = self._score_price(
+            product_info.get("price"), product_info.get("category")
+        )
         review_score = self._score_reviews(review_insights) if review_insights else 0.5
         quality_score = self._score_quality(review_insights) if review_insights else 0.5
 
         # Compute cost-per-wear estimate
         cost_per_wear = self._estimate_cost_per_wear(
-            product_info.get("price"), review_insights
+            product_info.get("price"),
+            review_insights,
+            category=product_info.get("category"),
+            material=product_info.get("material"),
         )
 
         total_score = (price_score + review_score + quality_score) / 3
@@ -101,11 +120,24 @@ class ItemScorer:
             "palette_score": 0.7,  # TODO: Compute from user preferences
         }
 
-    def _score_price(self, price: Optional[float]) -> float:
+    def _score_price(
+        self, price: Optional[float], category: Optional[str] = None
+    ) -> float:
         """Score price (lower is better, normalized)"""
         if not price:
             return 0.5
 
+        # Relative to the category's price distribution: p10 -> 1.0, p50 -> 0.5,
+        # p90 -> 0.0 (piecewise linear, clamped)
+        stats = price_stats.quantiles(categories.lookup(category)) if category else None
+        if stats:
+            p10, p50, p90 = stats
+            if price < p50:
+                position = 0.5 - 0.5 * (p50 - price) / max(p50 - p10, 0.01)
+            else:
+                position = 0.5 + 0.5 * (price - p50) / max(p90 - p50, 0.01)
+            return 1.0 - min(max(position, 0.0), 1.0)
+
         # Normalize to 0-1 (assuming $0-$500 range)
         normalized = 1.0 - min(price / 500.0, 1.0)
         return normalized
@@ -121,23 +153,16 @@ class ItemScorer:
         return quality_map.get(quality_str, 0.5)
 
     def _estimate_cost_per_wear(
-        self, price: Optional[float], review_insights: Optional[Dict[str, Any]]
+        self,
+        price: Optional[float],
+        review_insights: Optional[Dict[str, Any]],
+        category: Optional[str] = None,
+        material: Optional[str] = None,
+        climate=None,
     ) -> Optional[float]:
-        """Estimate cost-per-wear"""
-        if not price:
-            return None
-
-        # MVP: Simple heuristic
-        # TODO: Use ML model based on category, quality, etc.
-        base_wears = 30  # Assume 30 wears per year
-        quality_multiplier = {"excellent": 1.5, "good": 1.0, "mixed": 0.7, "poor": 0.5}
-
-        if review_insights:
-            multiplier = quality_multiplier.get(
-                review_insights.get("quality", "good"), 1.0
-            )
-            estimated_wears = base_wears * multiplier
-        else:
-            estimated_wears = base_wears
-
-        return price / estimated_wears
+        """Estimate cost-per-wear from the (category, quality, fabric, climate)
+        wear grid (see app.services.wear_model)"""
+        quality = review_insights.get("quality") if review_insights else None
+        return get_wear_model().cost_per_wear(
+            price, category, quality, material, climate
+        )
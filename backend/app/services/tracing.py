@@ -0,0 +1,346 @@
+"""
+Lightweight span tracing with OpenTelemetry-compatible (OTLP/JSON) export.
+
+Traces are sampled at the root span (TRACE_SAMPLE_RATE, default 0 = off).
+Unsampled traces cost one ContextVar set/reset at the root and a ContextVar
+lookup per nested span. Finished traces are exported as one OTLP/JSON
+"resourceSpans" document per line to TRACE_EXPORT_PATH, and/or POSTed to an
+OTLP/HTTP collector at TRACE_EXPORT_ENDPOINT. Both run on one background
+export thread, so request handlers never wait on disk or the network.
+"""
+
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from loguru import logger
+
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "capsuleos-api")
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """A single timed operation within a trace"""
+
+    __slots__ = (
+        "trace",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "status",
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict):
+        self.name = name
+        self.span_id = random.getrandbits(64)
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.end_ns = 0
+        if parent is None:
+            self.trace_id = random.getrandbits(128)
+            self.parent_id = 0
+            self.trace: List["Span"] = []
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.trace = parent.trace
+        self.start_ns = time.time_ns()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": f"{self.trace_id:032x}",
+            "spanId": f"{self.span_id:016x}",
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = f"{self.parent_id:016x}"
+        return span
+
+
+class _NoopSpan:
+    """Stand-in returned for unsampled traces; every method is a no-op"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+# Marks "inside a trace that was not sampled" so nested spans don't start new roots
+_UNSAMPLED = object()
+_current_span: ContextVar[Any] = ContextVar("capsuleos_current_span", default=None)
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    if isinstance(value, (list, tuple)):
+        return {
+            "key": key,
+            "value": {
+                "arrayValue": {"values": [{"stringValue": str(v)} for v in value]}
+            },
+        }
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def to_otlp_json(spans: List[Span]) -> Dict[str, Any]:
+    """Wrap finished spans in an OTLP/JSON ExportTraceServiceRequest"""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [_otlp_attribute("service.name", SERVICE_NAME)]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "capsuleos.tracing"},
+                        "spans": [s.to_otlp() for s in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class ExportWorker:
+    """Daemon thread running queued exports in order (started on first use).
+    When the queue is full, traces are dropped rather than blocking callers."""
+
+    def __init__(self, max_queue: int = 1000):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, export, spans: List[Span]) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="trace-exporter", daemon=True
+                    )
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((export, spans))
+        except queue.Full:
+            logger.debug("Trace export queue full, dropping trace")
+
+    def _run(self) -> None:
+        while True:
+            export, spans = self._queue.get()
+            try:
+                export(spans)
+            except Exception as e:
+                logger.debug(f"Trace export failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until queued exports have run (tests / shutdown)"""
+        self._queue.join()
+
+
+# Shared by the file and HTTP exporters
+export_worker = ExportWorker()
+
+
+class FileSpanExporter:
+    """Append one OTLP/JSON document per trace to a local JSONL file (written
+    on the export thread)"""
+
+    def __init__(self, path: str, worker: Optional[ExportWorker] = None):
+        self.path = path
+        self.worker = worker or export_worker
+
+    def export(self, spans: List[Span]) -> None:
+        self.worker.submit(self._write, spans)
+
+    def _write(self, spans: List[Span]) -> None:
+        line = json.dumps(to_otlp_json(spans), separators=(",", ":"))
+        with open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class HttpSpanExporter:
+    """POST traces to an OTLP/HTTP JSON endpoint (e.g. http://localhost:4318/v1/traces)
+    from the export thread, so request handlers never wait on the network."""
+
+    def __init__(self, endpoint: str, worker: Optional[ExportWorker] = None):
+        self.endpoint = endpoint
+        self.worker = worker or export_worker
+        self._client = None  # only used on the export thread
+
+    def export(self, spans: List[Span]) -> None:
+        self.worker.submit(self._post, spans)
+
+    def _post(self, spans: List[Span]) -> None:
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.Client(timeout=2.0)
+        self._client.post(self.endpoint, json=to_otlp_json(spans))
+
+
+class InMemorySpanExporter:
+    """Collect exported traces in memory (tests / benchmarks)"""
+
+    def __init__(self):
+        self.traces: List[List[Span]] = []
+
+    def export(self, spans: List[Span]) -> None:
+        self.traces.append(spans)
+
+
+class _SpanContext:
+    """Context manager that starts/ends a recording span"""
+
+    __slots__ = ("tracer", "name", "attributes", "span", "token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> Span:
+        parent = _current_span.get()
+        self.span = Span(self.name, parent, self.attributes)
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.end_ns = time.time_ns()
+        if exc_type is not None:
+            span.status = STATUS_ERROR
+            span.attributes["exception.type"] = exc_type.__name__
+        _current_span.reset(self.token)
+        span.trace.append(span)
+        if span.parent_id == 0:
+            self.tracer._export(span.trace)
+        return False
+
+
+class _UnsampledRoot:
+    """Root of an unsampled trace: only marks the context so children stay no-ops"""
+
+    __slots__ = ("token",)
+
+    def __enter__(self):
+        self.token = _current_span.set(_UNSAMPLED)
+        return _NOOP
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self.token)
+        return False
+
+
+class Tracer:
+    """Creates spans and hands finished, sampled traces to exporters"""
+
+    def __init__(self, sample_rate: float = 0.0, exporters: Optional[List] = None):
+        self.sample_rate = sample_rate
+        self.exporters = exporters or []
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 and bool(self.exporters)
+
+    def span(self, name: str, **attributes):
+        """
+        Context manager for a span. Usage:
+            with tracer.span("capsule.palette", items=12) as span:
+                ...
+        """
+        current = _current_span.get()
+        if current is _UNSAMPLED:
+            return _NOOP
+        if current is None:
+            # Root span: take the sampling decision for the whole trace
+            if not self.enabled:
+                return _NOOP
+            if random.random() >= self.sample_rate:
+                return _UnsampledRoot()
+        return _SpanContext(self, name, attributes)
+
+    def traced(self, name: Optional[str] = None):
+        """Decorator form of span() for sync and async functions"""
+
+        def decorator(fn):
+            span_name = name or fn.__qualname__
+
+            if asyncio.iscoroutinefunction(fn):
+
+                @wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name):
+                        return await fn(*args, **kwargs)
+
+                return async_wrapper
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def _export(self, spans: List[Span]) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception as e:
+                logger.warning(f"Trace export failed: {e}")
+
+
+def _exporters_from_env() -> List:
+    exporters: List = []
+    path = os.getenv("TRACE_EXPORT_PATH")
+    if path:
+        exporters.append(FileSpanExporter(path))
+    endpoint = os.getenv("TRACE_EXPORT_ENDPOINT")
+    if endpoint:
+        exporters.append(HttpSpanExporter(endpoint))
+    return exporters
+
+
+# Global tracer
+tracer = Tracer(
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0")),
+    exporters=_exporters_from_env(),
+)
@@ -0,0 +1,161 @@
+"""
+Background capsule cache warm-up for the common preset space
+
+After startup, generates quarter x climate x top style sets capsules (with the
+default budget) so the first users after a deploy are served from the cache.
+Runs as a background task: readiness never waits for it, concurrency is capped,
+and it stops once its CPU-time budget is spent.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.models import Climate, Quarter
+from app.services.cache import capsule_cache
+from app.services.style_refiner import STYLE_EXPANSION, refine_style_words
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# Budget used for preset capsules (the capsule form's default)
+WARMUP_BUDGET = float(os.getenv("WARMUP_BUDGET", "1000"))
+# Style sets: ";"-separated "three words" strings; default is the first
+# WARMUP_TOP_STYLES STYLE_EXPANSION terms, one set each
+WARMUP_STYLE_WORDS = os.getenv("WARMUP_STYLE_WORDS", "")
+WARMUP_TOP_STYLES = int(os.getenv("WARMUP_TOP_STYLES", "5"))
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "2"))
+# Process CPU seconds the warm-up may consume (includes traffic served meanwhile,
+# so a busy worker stops warming early)
+WARMUP_CPU_SECONDS = float(os.getenv("WARMUP_CPU_SECONDS", "20"))
+
+
+def preset_styles(
+    style_words: str = WARMUP_STYLE_WORDS, top: int = WARMUP_TOP_STYLES
+) -> List[List[str]]:
+    """Style descriptor sets to warm, refined exactly as the capsule router does"""
+    if style_words.strip():
+        words = [w for w in style_words.split(";") if w.strip()]
+    else:
+        words = list(STYLE_EXPANSION)[:top]
+    return [refine_style_words(w) for w in words]
+
+
+def preset_space(
+    quarters: List[str], styles: List[List[str]]
+) -> List[Tuple[Quarter, Climate, List[str]]]:
+    """Every (quarter, climate, style set) combination, quarter-major"""
+    valid = {q.value for q in Quarter}
+    return [
+        (Quarter(q), climate, descriptors)
+        for q in sorted(quarters)
+        if q in valid
+        for climate in Climate
+        for descriptors in styles
+    ]
+
+
+class CapsuleWarmup:
+    """Populate the capsule cache with preset capsules in the background"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._reset("idle", 0)
+
+    def _reset(self, state: str, total: int):
+        self.state = state
+        self.total = total
+        self.generated = 0
+        self.already_cached = 0
+        self.skipped = 0
+        self.failed = 0
+        self.cpu_seconds = 0.0
+        self.elapsed = 0.0
+
+    def start(self, get_generator, **kwargs) -> Optional[asyncio.Task]:
+        """Schedule warm-up on the running loop; returns immediately. The
+        generator is obtained (and so constructed) inside the background task."""
+        if not WARMUP_ENABLED:
+            self.state = "disabled"
+            return None
+
+        async def run_lazily():
+            return await self.run(get_generator(), **kwargs)
+
+        self._task = asyncio.get_running_loop().create_task(run_lazily())
+        return self._task
+
+    async def stop(self):
+        """Cancel an in-progress warm-up (on shutdown)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(
+        self,
+        generator,
+        presets: Optional[List[Tuple[Quarter, Climate, List[str]]]] = None,
+        budget: float = WARMUP_BUDGET,
+        concurrency: int = WARMUP_CONCURRENCY,
+        cpu_seconds: float = WARMUP_CPU_SECONDS,
+    ) -> Dict[str, Any]:
+        """Generate every preset not already cached, within the CPU budget"""
+        if presets is None:
+            presets = preset_space(list(generator.templates), preset_styles())
+        self._reset("running", len(presets))
+        cpu_start = time.process_time()
+        wall_start = time.monotonic()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def warm(quarter, climate, descriptors):
+            async with slots:
+                if time.process_time() - cpu_start >= cpu_seconds:
+                    self.skipped += 1
+                    return
+                key = generator.cache_key(quarter, climate, descriptors, budget, [])
+                if capsule_cache.get_encoded(key) is not None:
+                    self.already_cached += 1
+                    return
+                try:
+                    await generator.generate_encoded(
+                        quarter, climate, descriptors, budget, [], []
+                    )
+                    self.generated += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning(f"Warm-up failed for {quarter}/{climate}: {e}")
+
+        logger.info(f"Warming capsule cache: {len(presets)} presets")
+        try:
+            await asyncio.gather(*(warm(*preset) for preset in presets))
+        finally:
+            self.cpu_seconds = time.process_time() - cpu_start
+            self.elapsed = time.monotonic() - wall_start
+        self.state = "budget_exhausted" if self.skipped else "done"
+        logger.info(
+            f"Capsule warm-up {self.state}: {self.generated} generated, "
+            f"{self.already_cached} cached, {self.skipped} skipped, "
+            f"{self.failed} failed in {self.elapsed:.1f}s "
+            f"({self.cpu_seconds:.1f}s CPU)"
+        )
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        """Progress counters (exposed on the admin API)"""
+        return {
+            "state": self.state,
+            "total": self.total,
+            "generated": self.generated,
+            "already_cached": self.already_cached,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "elapsed_s": round(self.elapsed, 3),
+        }
+
+
+capsule_warmup = CapsuleWarmup()
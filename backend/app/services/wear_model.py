@@ -0,0 +1,369 @@
+"""
+Wear-count model for cost-per-wear estimates
+
+Expected wears (per year of ownership) are a dense float32 grid over
+category x quality tier x fabric x climate, so an estimate is one index
+operation and a batch of candidates is one fancy-indexing call:
+
+    model = get_wear_model()
+    model.cost_per_wear(120.0, "Outerwear", "good", "wool", "cold")
+    model.cost_per_wear_batch(prices, categories, qualities, materials, climate)
+
+The grid starts from hand-set priors (category base wears times quality,
+fabric and climate factors). scripts/fit_wear_model.py calibrates it offline
+from reviews and product_metadata: each product's reviews give a durability
+signal (mentions of lasting vs wearing out) and a quality tier (average
+rating); per (category, tier, fabric) cell the mean signal, shrunk toward the
+prior by WEAR_PRIOR_WEIGHT pseudo-products, scales the prior wears. Reviews
+carry no climate, so the climate axis stays prior-only.
+
+The fitted grid is saved to WEAR_MODEL_PATH (.npz with the axis labels);
+without it the prior grid is used.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+import os
+
+import numpy as np
+from loguru import logger
+
+from app.services.dimensions import Dimension
+
+WEAR_MODEL_PATH = os.getenv("WEAR_MODEL_PATH", "./wear_model.npz")
+WEAR_PRIOR_WEIGHT = float(os.getenv("WEAR_PRIOR_WEIGHT", "5"))
+
+# Axes; the last category/fabric entry and "any" climate catch unknown values
+CATEGORY_AXIS = ("top", "bottom", "dress", "outerwear", "shoes", "accessory", "other")
+QUALITY_AXIS = ("poor", "mixed", "good", "excellent")
+FABRIC_AXIS = (
+    "cotton",
+    "linen",
+    "wool",
+    "silk",
+    "denim",
+    "leather",
+    "synthetic",
+    "other",
+)
+CLIMATE_AXIS = ("cold", "moderate", "warm", "hot", "any")
+DEFAULT_QUALITY = "good"
+
+# Priors
+CATEGORY_WEARS = {
+    "top": 30,
+    "bottom": 45,
+    "dress": 20,
+    "outerwear": 60,
+    "shoes": 70,
+    "accessory": 60,
+    "other": 30,
+}
+QUALITY_FACTORS = {"excellent": 1.5, "good": 1.0, "mixed": 0.7, "poor": 0.5}
+FABRIC_FACTORS = {
+    "cotton": 1.0,
+    "linen": 0.9,
+    "wool": 1.2,
+    "silk": 0.7,
+    "denim": 1.3,
+    "leather": 1.4,
+    "synthetic": 0.85,
+    "other": 1.0,
+}
+# How much a category / fabric gets worn in a climate (1.0 when not listed)
+CATEGORY_CLIMATE_FACTORS = {
+    "cold": {"outerwear": 1.4, "dress": 0.7},
+    "warm": {"outerwear": 0.6, "dress": 1.2},
+    "hot": {"outerwear": 0.3, "bottom": 0.9, "dress": 1.3},
+}
+FABRIC_CLIMATE_FACTORS = {
+    "cold": {"linen": 0.5, "silk": 0.8, "wool": 1.3},
+    "warm": {"wool": 0.7, "linen": 1.2},
+    "hot": {"wool": 0.4, "leather": 0.7, "linen": 1.3},
+}
+
+# Material tokens (product_metadata["material"], e.g. "organic_cotton"); the
+# first token that maps decides, so "polyester_wool" is synthetic
+FABRIC_TOKENS = {
+    "cotton": "cotton",
+    "linen": "linen",
+    "wool": "wool",
+    "merino": "wool",
+    "cashmere": "wool",
+    "alpaca": "wool",
+    "silk": "silk",
+    "denim": "denim",
+    "leather": "leather",
+    "suede": "leather",
+    "polyester": "synthetic",
+    "nylon": "synthetic",
+    "acrylic": "synthetic",
+    "synthetic": "synthetic",
+    "viscose": "synthetic",
+    "rayon": "synthetic",
+}
+
+# Review phrases for the fit's durability signal
+DURABLE_PHRASES = ("durable", "lasts", "lasted", "holds up", "well-made", "well made")
+WEAR_OUT_PHRASES = ("pilling", "pills", "shrunk", "shrinks", "fell apart", "holes")
+
+_CATEGORY_INDEX = {name: i for i, name in enumerate(CATEGORY_AXIS)}
+_QUALITY_INDEX = {name: i for i, name in enumerate(QUALITY_AXIS)}
+_FABRIC_INDEX = {name: i for i, name in enumerate(FABRIC_AXIS)}
+_CLIMATE_INDEX = {name: i for i, name in enumerate(CLIMATE_AXIS)}
+
+
+def category_index(category: Optional[str]) -> int:
+    return _CATEGORY_INDEX.get(Dimension.key(category), _CATEGORY_INDEX["other"])
+
+
+def quality_index(quality: Optional[str]) -> int:
+    return _QUALITY_INDEX.get(Dimension.key(quality), _QUALITY_INDEX[DEFAULT_QUALITY])
+
+
+def fabric_of(material: Optional[str]) -> str:
+    """Fabric group for a material string"""
+    for token in Dimension.key(material).replace("-", "_").replace(" ", "_").split("_"):
+        fabric = FABRIC_TOKENS.get(token)
+        if fabric:
+            return fabric
+    return "other"
+
+
+def fabric_index(material: Optional[str]) -> int:
+    return _FABRIC_INDEX[fabric_of(material)]
+
+
+def climate_index(climate) -> int:
+    value = getattr(climate, "value", climate)
+    return _CLIMATE_INDEX.get(Dimension.key(value), _CLIMATE_INDEX["any"])
+
+
+def prior_grid() -> np.ndarray:
+    """Prior expected wears, shape (category, quality, fabric, climate)"""
+    grid = np.empty(
+        (len(CATEGORY_AXIS), len(QUALITY_AXIS), len(FABRIC_AXIS), len(CLIMATE_AXIS)),
+        dtype=np.float32,
+    )
+    for c, category in enumerate(CATEGORY_AXIS):
+        for q, quality in enumerate(QUALITY_AXIS):
+            for f, fabric in enumerate(FABRIC_AXIS):
+                for k, climate in enumerate(CLIMATE_AXIS):
+                    grid[c, q, f, k] = (
+                        CATEGORY_WEARS[category]
+                        * QUALITY_FACTORS[quality]
+                        * FABRIC_FACTORS[fabric]
+                        * CATEGORY_CLIMATE_FACTORS.get(climate, {}).get(category, 1.0)
+                        * FABRIC_CLIMATE_FACTORS.get(climate, {}).get(fabric, 1.0)
+                    )
+    return grid
+
+
+Labels = Union[None, str, Sequence[Optional[str]]]
+
+
+class WearModel:
+    """Compiled wear grid plus its lookup / batch APIs"""
+
+    def __init__(self, grid: np.ndarray, fitted_at: Optional[str] = None):
+        self.grid = grid
+        self.fitted_at = fitted_at
+
+    def wears(
+        self,
+        category: Optional[str] = None,
+        quality: Optional[str] = None,
+        material: Optional[str] = None,
+        climate=None,
+    ) -> float:
+        return float(
+            self.grid[
+                category_index(category),
+                quality_index(quality),
+                fabric_index(material),
+                climate_index(climate),
+            ]
+        )
+
+    def cost_per_wear(
+        self,
+        price: Optional[float],
+        category: Optional[str] = None,
+        quality: Optional[str] = None,
+        material: Optional[str] = None,
+        climate=None,
+    ) -> Optional[float]:
+        if not price:
+            return None
+        return price / self.wears(category, quality, material, climate)
+
+    def cost_per_wear_batch(
+        self,
+        prices: Iterable[Optional[float]],
+        categories: Labels = None,
+        qualities: Labels = None,
+        materials: Labels = None,
+        climates=None,
+    ) -> np.ndarray:
+        """Cost-per-wear for many candidates (NaN where the price is missing).
+        Each label argument is a sequence aligned with prices, one value for
+        all, or None for the axis default."""
+        prices = np.asarray(
+            [np.nan if p is None else p for p in prices], dtype=np.float64
+        )
+        n = len(prices)
+        index = (
+            _encode(categories, category_index, n),
+            _encode(qualities, quality_index, n),
+            _encode(materials, fabric_index, n),
+            _encode(climates, climate_index, n),
+        )
+        with np.errstate(invalid="ignore"):
+            return np.where(prices > 0, prices / self.grid[index], np.nan)
+
+    def save(self, path: str = WEAR_MODEL_PATH) -> None:
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                grid=self.grid,
+                categories=np.array(CATEGORY_AXIS),
+                qualities=np.array(QUALITY_AXIS),
+                fabrics=np.array(FABRIC_AXIS),
+                climates=np.array(CLIMATE_AXIS),
+                fitted_at=np.array(self.fitted_at or ""),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = WEAR_MODEL_PATH) -> "WearModel":
+        """Fitted model from path; the prior grid when missing or stale"""
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    axes = tuple(
+                        tuple(data[name].tolist())
+                        for name in ("categories", "qualities", "fabrics", "climates")
+                    )
+                    if axes == (CATEGORY_AXIS, QUALITY_AXIS, FABRIC_AXIS, CLIMATE_AXIS):
+                        return cls(data["grid"], str(data["fitted_at"]) or None)
+                logger.warning(f"Wear model {path} has different axes; using priors")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Could not load wear model {path}: {e}")
+        return cls(prior_grid())
+
+
+def _encode(values, index_of, n: int) -> np.ndarray:
+    """Axis indices for a label argument (see cost_per_wear_batch)"""
+    if values is None or isinstance(values, str) or not hasattr(values, "__len__"):
+        return np.full(n, index_of(values), dtype=np.intp)
+    # Few distinct labels: look each up once
+    lookup: Dict = {}
+    return np.fromiter(
+        (
+            lookup[v] if v in lookup else lookup.setdefault(v, index_of(v))
+            for v in values
+        ),
+        dtype=np.intp,
+        count=n,
+    )
+
+
+def durability_signal(texts: Iterable[str]) -> Optional[float]:
+    """1.0 +/- half the net share of reviews saying the item lasts vs wears out"""
+    durable = worn = total = 0
+    for text in texts:
+        text = (text or "").lower()
+        total += 1
+        durable += any(p in text for p in DURABLE_PHRASES)
+        worn += any(p in text for p in WEAR_OUT_PHRASES)
+    if not total:
+        return None
+    return 1.0 + 0.5 * (durable - worn) / total
+
+
+def quality_tier(average_rating: float) -> str:
+    if average_rating >= 4.5:
+        return "excellent"
+    if average_rating >= 3.5:
+        return "good"
+    if average_rating >= 2.5:
+        return "mixed"
+    return "poor"
+
+
+def fit(
+    observations: Iterable[Tuple[Optional[str], Optional[str], float, Sequence[str]]],
+    prior_weight: float = WEAR_PRIOR_WEIGHT,
+) -> WearModel:
+    """
+    Fit the grid from (category, material, average rating, review texts) per
+    product.
+    """
+    sums = np.zeros((len(CATEGORY_AXIS), len(QUALITY_AXIS), len(FABRIC_AXIS)))
+    counts = np.zeros_like(sums)
+    products = 0
+    for category, material, rating, texts in observations:
+        signal = durability_signal(texts)
+        if signal is None:
+            continue
+        cell = (
+            category_index(category),
+            _QUALITY_INDEX[quality_tier(rating)],
+            fabric_index(material),
+        )
+        sums[cell] += signal
+        counts[cell] += 1
+        products += 1
+    # Shrink each cell's mean signal toward 1.0 (the prior)
+    factors = (sums + prior_weight) / (counts + prior_weight)
+    grid = (prior_grid() * factors[..., np.newaxis]).astype(np.float32)
+    logger.info(
+        f"Fit wear model on {products} products "
+        f"({int((counts > 0).sum())} cells with data)"
+    )
+    return WearModel(grid, datetime.utcnow().isoformat(timespec="seconds"))
+
+
+def fit_from_db(db, prior_weight: float = WEAR_PRIOR_WEIGHT) -> WearModel:
+    """Fit from products with reviews"""
+    from sqlalchemy import select
+
+    from app.database import Product, Review
+
+    def observations():
+        statement = (
+            select(
+                Product.id,
+                Product.category,
+                Product.product_metadata,
+                Review.rating,
+                Review.text,
+            )
+            .join(Review, Review.product_id == Product.id)
+            .order_by(Product.id)
+            .execution_options(yield_per=10_000)
+        )
+        current, ratings, texts = None, [], []
+        for product_id, category, metadata, rating, text in db.execute(statement):
+            if current is not None and product_id != current[0]:
+                yield current[1], current[2], sum(ratings) / len(ratings), texts
+                ratings, texts = [], []
+            current = (product_id, category, (metadata or {}).get("material"))
+            ratings.append(rating or 0)
+            texts.append(text)
+        if current is not None:
+            yield current[1], current[2], sum(ratings) / len(ratings), texts
+
+    return fit(observations(), prior_weight)
+
+
+_model: Optional[WearModel] = None
+
+
+def get_wear_model() -> WearModel:
+    """Process-wide model (loaded on first use)"""
+    global _model
+    if _model is None:
+        _model = WearModel.load()
+    return _model
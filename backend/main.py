@@ -3,15 +3,22 @@ CapsuleOS Backend API
 FastAPI application for capsule wardrobe planning and purchase decision assistance
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
 from loguru import logger
 import os
 from dotenv import load_dotenv
+from sqlalchemy import text
 
-from app.routers import capsule, analyze, closet, products
-from app.database import init_db
+from app.routers import capsule, analyze, closet, products, admin
+from app.database import init_db, engine
+from app.dependencies import get_capsule_generator
+from app.middleware import TimingMiddleware, ProfilingMiddleware
+from app.services.cache import capsule_cache
+from app.services.link_extractor import link_extractor
+from app.services.metrics import metrics
+from app.services.warmup import capsule_warmup
 
 load_dotenv()
 
@@ -19,6 +26,7 @@ app = FastAPI(
     title="CapsuleOS API",
     description="Quarterly capsule wardrobe planner and purchase decision assistant",
     version="0.1.0",
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware
@@ -30,11 +38,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request timing / DB usage instrumentation (exported at /api/metrics)
+app.add_middleware(TimingMiddleware)
+# Opt-in stack sampling for hot routes (PROFILE_SAMPLE_RATE or /api/admin/profiler)
+app.add_middleware(ProfilingMiddleware)
+metrics.instrument_engine(engine)
+metrics.register_cache("capsule", capsule_cache)
+metrics.register_cache("link", link_extractor.cache)
+
 # Include routers
 app.include_router(capsule.router, prefix="/api", tags=["capsule"])
 app.include_router(analyze.router, prefix="/api", tags=["analyze"])
 app.include_router(closet.router, prefix="/api/closet", tags=["closet"])
 app.include_router(products.router, prefix="/api", tags=["products"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+
+
+# Set once startup has finished; reported by /api/ready
+app.state.ready = False
 
 
 @app.on_event("startup")
@@ -43,6 +64,21 @@ async def startup_event():
     logger.info("Initializing database...")
     init_db()
     logger.info("Database initialized")
+    # Similar-product index for scanner alternatives (skipped if not built);
+    # imported here so numpy isn't paid for when main is merely imported
+    from app.services.ann_index import load_ann_index
+
+    load_ann_index()
+    # Preset capsules are generated in the background; startup doesn't wait
+    capsule_warmup.start(get_capsule_generator)
+    app.state.ready = True
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background warm-up and close pooled outbound connections"""
+    await capsule_warmup.stop()
+    await link_extractor.aclose()
 
 
 @app.get("/")
@@ -52,9 +88,49 @@ async def root():
 
 
 @app.get("/api/health")
-async def health():
+def health():
     """Detailed health check"""
-    return {"status": "healthy", "version": "0.1.0", "database": "connected"}
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        database = "connected"
+    except Exception as e:
+        logger.error(f"Health check DB error: {str(e)}")
+        database = "unavailable"
+    status = "healthy" if database == "connected" else "degraded"
+    return {"status": status, "version": "0.1.0", "database": database}
+
+
+@app.get("/api/ready")
+def ready(response: Response):
+    """
+    Readiness probe: 503 until startup has finished and the database answers.
+    Unlike /api/health (liveness), route traffic only once this returns 200.
+    Cache warm-up and lazily built services never hold readiness back.
+    """
+    database = "connected"
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.error(f"Readiness DB error: {str(e)}")
+        database = "unavailable"
+    is_ready = app.state.ready and database == "connected"
+    if not is_ready:
+        response.status_code = 503
+    return {
+        "status": "ready" if is_ready else "starting",
+        "database": database,
+        "warmup": capsule_warmup.state,
+    }
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Request latency, DB and cache metrics in Prometheus text format"""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 if __name__ == "__main__":
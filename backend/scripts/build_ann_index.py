@@ -0,0 +1,94 @@
+"""
+Build the ANN (IVF) index used for scanner alternatives.
+
+Reuses vectors from the product embedding index (scripts/build_embeddings.py)
+when it was built with the same model, otherwise encodes name + description +
+product_metadata directly. Run after seeding:
+python scripts/build_ann_index.py [--nlist 4000] [--dtype float32]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal, Product, init_db
+from app.services.ann_index import ANN_INDEX_DIR, IVFIndex
+from app.services.embedding_service import get_embedding_service
+from app.services.embeddings import (
+    EMBEDDING_MODEL,
+    ProductEmbeddingIndex,
+    product_text,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build product ANN index")
+    parser.add_argument("--index-dir", default=ANN_INDEX_DIR)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(
+                Product.id,
+                Product.name,
+                Product.description,
+                Product.product_metadata,
+                Product.category,
+                Product.price,
+            )
+            .order_by(Product.id)
+            .all()
+        )
+    finally:
+        db.close()
+    if not rows:
+        print("No products to index; run scripts/seed_db.py first")
+        sys.exit(1)
+    ids = [r.id for r in rows]
+
+    vectors = None
+    existing = ProductEmbeddingIndex.load()
+    if existing is not None and existing.model_name == args.model:
+        if all(pid in existing.row_of for pid in ids):
+            print("Reusing vectors from the product embedding index")
+            rows_idx = np.fromiter((existing.row_of[pid] for pid in ids), np.int64)
+            vectors = np.asarray(existing.matrix[rows_idx], dtype=np.float32)
+
+    if vectors is None:
+        encoder = get_embedding_service(args.model)
+        if encoder is None:
+            print(
+                "sentence-transformers is required (pip install -r requirements.txt), "
+                "or set EMBEDDING_MODEL=hashing-stub"
+            )
+            sys.exit(1)
+        texts = [product_text(r.name, r.description, r.product_metadata) for r in rows]
+        vectors = np.asarray(encoder.encode(texts, batch_size=256), dtype=np.float32)
+
+    index = IVFIndex.build(
+        ids,
+        vectors,
+        [r.category for r in rows],
+        [r.price for r in rows],
+        nlist=args.nlist,
+        dtype=args.dtype,
+        model_name=args.model,
+    )
+    index.save(args.index_dir)
+    print(
+        f"Indexed {len(ids)} products in {len(index.centroids)} lists -> {args.index_dir}"
+    )
+
+
+if __name__ == "__main__":
+    main()
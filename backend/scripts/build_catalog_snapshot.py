@@ -0,0 +1,66 @@
+"""
+Build the memory-mapped catalog snapshot shared by API workers.
+
+Writes the products table as columnar arrays plus a string table and atomically
+replaces the previous snapshot; running workers map the new file within
+CATALOG_SNAPSHOT_CHECK_SECONDS. Run after seeding (and after every reseed):
+python scripts/build_catalog_snapshot.py [--output ./catalog.snap]
+or from a Parquet export (scripts/export_parquet.py), skipping SQL entirely:
+python scripts/build_catalog_snapshot.py --from-parquet ./export
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal, Product, get_catalog_version, init_db
+from app.services.catalog_snapshot import CATALOG_SNAPSHOT_PATH, write_snapshot
+from app.services.product_records import query_records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build catalog snapshot")
+    parser.add_argument("--output", default=CATALOG_SNAPSHOT_PATH)
+    parser.add_argument("--from-parquet", metavar="EXPORT_DIR")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.from_parquet:
+        from app.services.catalog_export import snapshot_from_export
+
+        header = snapshot_from_export(args.from_parquet, args.output)
+        print(
+            f"Wrote {header['rows']} products from {args.from_parquet} at catalog "
+            f"v{header['catalog_version']} -> {args.output} "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        return
+
+    init_db()
+    db = SessionLocal()
+    try:
+        # Version first: a write during the export leaves the snapshot stale, not wrong
+        version, _ = get_catalog_version(db)
+        records = query_records(db, order_by=Product.id)
+    finally:
+        db.close()
+    if not records:
+        print("No products to snapshot; run scripts/seed_db.py first")
+        sys.exit(1)
+
+    header = write_snapshot(args.output, records, version)
+    size_mb = os.path.getsize(args.output) / 1e6
+    print(
+        f"Wrote {header['rows']} products ({header['strings']} strings, "
+        f"{size_mb:.1f} MB) at catalog v{version} -> {args.output} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
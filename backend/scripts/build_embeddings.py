@@ -0,0 +1,67 @@
+"""
+Build the product embedding index used for style-aware capsule selection.
+
+Encodes name + description + product_metadata for every product into a
+memory-mapped matrix under EMBEDDING_INDEX_DIR, plus the STYLE_EXPANSION
+descriptor vocabulary so common descriptors never need the model at runtime.
+Run after seeding: python scripts/build_embeddings.py [--dtype float32]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal, Product, get_catalog_version, init_db
+from app.services.embedding_service import get_embedding_service
+from app.services.embeddings import (
+    EMBEDDING_INDEX_DIR,
+    EMBEDDING_MODEL,
+    ProductEmbeddingIndex,
+)
+from app.services.style_refiner import STYLE_EXPANSION
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build product embedding index")
+    parser.add_argument("--index-dir", default=EMBEDDING_INDEX_DIR)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    args = parser.parse_args()
+
+    encoder = get_embedding_service(args.model)
+    if encoder is None:
+        print(
+            "sentence-transformers is required (pip install -r requirements.txt), "
+            "or set EMBEDDING_MODEL=hashing-stub"
+        )
+        sys.exit(1)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        # Read the version first: a concurrent write then makes the index stale
+        catalog_version, _ = get_catalog_version(db)
+        products = db.query(Product).order_by(Product.id).all()
+        descriptors = {d for values in STYLE_EXPANSION.values() for d in values}
+        descriptors.update(STYLE_EXPANSION.keys())
+        count = ProductEmbeddingIndex.build(
+            products,
+            encoder,
+            index_dir=args.index_dir,
+            model_name=args.model,
+            dtype=args.dtype,
+            descriptors=sorted(descriptors),
+            catalog_version=catalog_version,
+        )
+        print(
+            f"Embedded {count} products (catalog v{catalog_version}) -> {args.index_dir}"
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Crawl retailer sites into the products table.
+
+Seeds can be category/listing pages or sitemap.xml URLs; only links on the
+seeds' hosts are followed. State is kept in --state so an interrupted crawl
+resumes where it stopped (re-run the same command).
+Example: python scripts/crawl_catalog.py https://shop.example/sitemap.xml
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal, init_db
+from app.services.crawler import CRAWL_STATE_PATH, CatalogCrawler, CrawlState
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl retailer catalogs")
+    parser.add_argument("seeds", nargs="+", help="Listing or sitemap URLs")
+    parser.add_argument("--state", default=CRAWL_STATE_PATH)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-pages", type=int, default=None)
+    args = parser.parse_args()
+
+    init_db()
+    state = CrawlState(args.state)
+    crawler = CatalogCrawler(
+        state,
+        SessionLocal,
+        fetch_concurrency=args.concurrency,
+        parse_workers=args.parse_workers,
+        batch_size=args.batch_size,
+        max_pages=args.max_pages,
+    )
+    try:
+        summary = asyncio.run(crawler.run(args.seeds))
+    finally:
+        state.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Export products, reviews and review_insights to partitioned Parquet.
+
+Streams each table in batches into hive-partitioned datasets (products by
+category, reviews by product bucket) plus a manifest with the catalog version,
+for merchandising analyses and SQL-free snapshot rebuilds
+(scripts/build_catalog_snapshot.py --from-parquet). Run from backend/:
+python scripts/export_parquet.py [--out ./export] [--tables products,reviews]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal, init_db
+from app.services.catalog_export import EXPORT_BATCH_ROWS, TABLES, export_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export catalog to Parquet")
+    parser.add_argument("--out", default="./export")
+    parser.add_argument("--tables", default=",".join(TABLES))
+    parser.add_argument("--batch-rows", type=int, default=EXPORT_BATCH_ROWS)
+    args = parser.parse_args()
+
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()]
+    unknown = [t for t in tables if t not in TABLES]
+    if unknown:
+        parser.error(f"unknown tables {unknown}; choose from {list(TABLES)}")
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("pyarrow is required (pip install -r requirements.txt)")
+        sys.exit(1)
+
+    init_db()
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        manifest = export_catalog(db, args.out, tables, args.batch_rows)
+    finally:
+        db.close()
+    counts = ", ".join(f"{n} {t}" for t, n in manifest["tables"].items())
+    print(
+        f"Exported {counts} at catalog v{manifest['catalog_version']} -> {args.out} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Fit the cost-per-wear grid from reviews and product metadata.
+
+Calibrates the prior wear grid (app.services.wear_model) with each product's
+review durability signal and saves it to WEAR_MODEL_PATH; API workers load it
+on first use (restart them to pick up a refit). Run after seeding or crawling:
+python scripts/fit_wear_model.py [--output ./wear_model.npz] [--prior-weight 5]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal, init_db
+from app.services.wear_model import WEAR_MODEL_PATH, WEAR_PRIOR_WEIGHT, fit_from_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit cost-per-wear model")
+    parser.add_argument("--output", default=WEAR_MODEL_PATH)
+    parser.add_argument("--prior-weight", type=float, default=WEAR_PRIOR_WEIGHT)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    init_db()
+    db = SessionLocal()
+    try:
+        model = fit_from_db(db, args.prior_weight)
+    finally:
+        db.close()
+    model.save(args.output)
+    print(
+        f"Wrote wear grid {model.grid.shape} -> {args.output} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
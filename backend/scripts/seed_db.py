@@ -10,7 +10,14 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.database import SessionLocal, Product, Review, init_db
+from app.database import (
+    SessionLocal,
+    Product,
+    Review,
+    init_db,
+    bump_catalog_version,
+)
+from app.services import price_stats
 from sqlalchemy import delete
 from sqlalchemy.orm import Session
 
@@ -66,6 +73,11 @@ def main():
         print("Clearing existing products and reviews...")
         db.execute(delete(Review))
         db.execute(delete(Product))
+        # Bulk deletes bypass ORM flush events; invalidate catalog ETags and
+        # price stats explicitly
+        bump_catalog_version(db.connection())
+        price_stats.rebuild(db.connection())
+        db.info[price_stats.PENDING_KEY] = True
         db.commit()
 
         # Get data directory
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Minimal OTLP/HTTP (JSON) collector stand-in for local trace inspection.
+
+Accepts POST /v1/traces and appends each request body as one line to a JSONL
+file, and prints a one-line summary per trace.
+
+Usage (from backend/):
+    python scripts/trace_collector.py --port 4318 --out traces.jsonl
+    TRACE_SAMPLE_RATE=1 TRACE_EXPORT_ENDPOINT=http://localhost:4318/v1/traces uvicorn main:app
+"""
+
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(out_path: str):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/traces":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                doc = json.loads(body)
+            except ValueError:
+                self.send_response(400)
+                self.end_headers()
+                return
+            with open(out_path, "a") as f:
+                f.write(json.dumps(doc, separators=(",", ":")) + "\n")
+
+            for resource_spans in doc.get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    spans = scope_spans.get("spans", [])
+                    roots = [s for s in spans if not s.get("parentSpanId")]
+                    for root in roots:
+                        ms = (
+                            int(root["endTimeUnixNano"])
+                            - int(root["startTimeUnixNano"])
+                        ) / 1e6
+                        print(f"{root['name']}: {ms:.2f} ms, {len(spans)} spans")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--out", default="traces.jsonl")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.out))
+    print(f"Collecting traces on http://{args.host}:{args.port}/v1/traces -> {args.out}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Tests for the IVF ANN index
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+from app.services import ann_index
+from app.services.ann_index import IVFIndex
+from app.services.item_analyzer import ItemAnalyzer
+
+
+def _catalog(n=2000, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    categories = [["Top", "Bottom", "Shoes"][i % 3] for i in range(n)]
+    prices = rng.uniform(10, 200, size=n).tolist()
+    return list(range(1, n + 1)), vectors, categories, prices
+
+
+class TestIVFIndex:
+    """Test recall, filters, persistence and incremental adds"""
+
+    def test_exact_match_found(self):
+        """Test a stored vector is its own nearest neighbour"""
+        ids, vectors, categories, prices = _catalog()
+        index = IVFIndex.build(ids, vectors, categories, prices, dtype="float32")
+        hits = index.search(vectors[41], k=1, nprobe=4)
+        assert hits[0][0] == 42
+        assert hits[0][1] > 0.99
+
+    def test_filters_applied(self):
+        """Test category and price window restrict results"""
+        ids, vectors, categories, prices = _catalog()
+        index = IVFIndex.build(ids, vectors, categories, prices)
+        hits = index.search(vectors[0], k=10, category="Shoes", price_range=(50, 80))
+        assert len(hits) == 10
+        for pid, _ in hits:
+            assert categories[pid - 1] == "Shoes"
+            assert 50 <= prices[pid - 1] <= 80
+        assert index.search(vectors[0], k=5, category="Outerwear") == []
+
+    def test_save_load_roundtrip(self, tmp_path):
+        """Test the saved index is memory-mapped and returns the same results"""
+        ids, vectors, categories, prices = _catalog()
+        index = IVFIndex.build(ids, vectors, categories, prices)
+        index.save(str(tmp_path))
+        loaded = IVFIndex.load(str(tmp_path))
+        assert isinstance(loaded.vectors, np.memmap)
+        assert loaded.search(vectors[7], k=5) == index.search(vectors[7], k=5)
+
+    def test_incremental_add_replaces(self):
+        """Test added products are searchable and supersede indexed copies"""
+        ids, vectors, categories, prices = _catalog()
+        index = IVFIndex.build(ids, vectors, categories, prices)
+        new_vec = np.ones(16, dtype=np.float32)
+        index.add([5001], [new_vec], ["Dress"], [99.0])
+        assert index.search(new_vec, k=1, category="Dress")[0][0] == 5001
+
+        # Re-adding an existing id moves it out of its old list
+        index.add([3], [new_vec], ["Dress"], [99.0])
+        hits = index.search(vectors[2], k=3)
+        assert 3 not in [pid for pid, _ in hits]
+        assert index.max_id == 5001
+
+
+class _ThreadRecordingEncoder:
+    def __init__(self, vector):
+        self.vector = vector
+        self.threads = []
+
+    def encode(self, texts):
+        self.threads.append(threading.get_ident())
+        return [self.vector]
+
+
+class TestSimilarAlternatives:
+    """Test the analyzer's similarity lookup stays off the event loop"""
+
+    def test_query_encoded_in_worker_thread(self, monkeypatch):
+        """Test the query embedding is computed outside the event loop thread"""
+        ids, vectors, categories, prices = _catalog()
+        encoder = _ThreadRecordingEncoder(vectors[0])
+        monkeypatch.setattr(
+            ann_index, "_index", IVFIndex.build(ids, vectors, categories, prices)
+        )
+        monkeypatch.setattr(ann_index, "_encoder", encoder)
+
+        async def alternatives():
+            loop_thread = threading.get_ident()
+            await ItemAnalyzer()._get_alternatives({"name": "Linen shirt"})
+            return loop_thread
+
+        loop_thread = asyncio.run(alternatives())
+        assert encoder.threads and loop_thread not in encoder.threads
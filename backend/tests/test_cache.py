@@ -59,3 +59,18 @@ class TestTTLCache:
         """Test global cache instance exists"""
         assert capsule_cache is not None
         assert isinstance(capsule_cache, TTLCache)
+
+    def test_cache_encoded_body(self):
+        """Test pre-serialized body is stored and returned alongside the value"""
+        cache = TTLCache(ttl_seconds=3600)
+        cache.set("key1", {"a": 1}, encoded=b'{"a":1}')
+        assert cache.get_encoded("key1") == b'{"a":1}'
+        assert cache.get("key1") == {"a": 1}
+
+    def test_cache_encoded_missing(self):
+        """Test values set without a body have no encoded form"""
+        cache = TTLCache(ttl_seconds=3600)
+        cache.set("key1", "value1")
+        assert cache.get_encoded("key1") is None
+        assert cache.get_encoded("nonexistent") is None
+        assert (cache.hits, cache.misses) == (0, 2)
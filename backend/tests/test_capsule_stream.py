@@ -0,0 +1,104 @@
+"""
+Tests for the streamed (SSE) capsule generation
+"""
+
+import asyncio
+import threading
+import time
+
+from app.models import Climate, Quarter
+from app.responses import sse_event
+from app.services import embeddings
+from app.services.cache import capsule_cache
+from app.services.capsule_generator import CapsuleGenerator
+
+
+def _slow_generator(monkeypatch):
+    """Generator whose slots resolve in reverse order (earlier slots are slower)"""
+    generator = CapsuleGenerator()
+
+    def resolve_slot(slot, template, budget, preferences, style_query=None):
+        index = template.slots.index(slot)
+        time.sleep(0.02 * (12 - index))
+        return generator._create_placeholder_item(slot, budget, preferences)
+
+    monkeypatch.setattr(generator, "_resolve_slot", resolve_slot)
+    return generator
+
+
+def _collect(generator, budget):
+    async def run():
+        return [
+            event
+            async for event in generator.stream(
+                Quarter.Q3, Climate.WARM, [], budget, [], []
+            )
+        ]
+
+    return asyncio.run(run())
+
+
+class TestCapsuleStream:
+    """Test event order, slot concurrency and cached replay"""
+
+    def test_sse_event_frame(self):
+        """Test events are framed as `event:` + JSON `data:` lines"""
+        frame = sse_event("item", {"index": 0})
+        assert frame == b'event: item\ndata: {"index":0}\n\n'
+
+    def test_items_stream_as_slots_resolve(self, monkeypatch):
+        """Test palette comes first and slots are resolved concurrently"""
+        generator = _slow_generator(monkeypatch)
+        start = time.monotonic()
+        events = _collect(generator, 1234.0)
+        elapsed = time.monotonic() - start
+
+        names = [name for name, _ in events]
+        slots = events[0][1]["slots"]
+        assert names == ["palette"] + ["item"] * slots + [
+            "outfit_formulas",
+            "coherence_scores",
+            "done",
+        ]
+        assert events[0][1]["cached"] is False
+        indexes = [data["index"] for name, data in events if name == "item"]
+        assert sorted(indexes) == list(range(slots))
+        assert indexes[0] == slots - 1  # fastest slot arrives first
+        # Sequential resolution would take the sum of all slot delays
+        assert elapsed < 0.02 * sum(range(1, 13)) / 2
+
+    def test_cached_capsule_replays(self, monkeypatch):
+        """Test a cached capsule replays the same events in slot order"""
+        generator = _slow_generator(monkeypatch)
+        first = _collect(generator, 1235.0)
+        capsule_id = first[-1][1]["capsule_id"]
+        assert capsule_cache.get_encoded(capsule_id) is not None
+
+        replay = _collect(generator, 1235.0)
+        assert replay[0][1]["cached"] is True
+        assert [name for name, _ in replay] == [name for name, _ in first]
+        assert replay[-3:] == first[-3:]
+        items = [data for name, data in replay if name == "item"]
+        assert [data["index"] for data in items] == list(range(len(items)))
+
+    def test_style_vector_off_event_loop(self, monkeypatch):
+        """Test the style query (which may call the encoder) runs on the slot pool"""
+        generator = _slow_generator(monkeypatch)
+        threads = []
+
+        class StyleIndex:
+            def style_vector(self, descriptors):
+                threads.append(threading.get_ident())
+                return None
+
+        monkeypatch.setattr(embeddings, "get_style_index", lambda: StyleIndex())
+
+        async def run():
+            async for _ in generator.stream(
+                Quarter.Q3, Climate.WARM, ["relaxed"], 1236.0, [], []
+            ):
+                pass
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+        assert threads and loop_thread not in threads
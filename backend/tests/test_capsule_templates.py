@@ -0,0 +1,57 @@
+"""
+Tests for the compiled (quarter, climate) capsule template table
+"""
+
+import pytest
+
+from app.models import Climate, Quarter
+from app.services.capsule_generator import CapsuleGenerator
+from app.services.capsule_templates import compile_template, compile_templates
+
+TEMPLATE = {
+    "palette": ["black", "navy", "cream"],
+    "climate": "cold",
+    "items": ["wool_coat", "sweater", "jeans", "boots", "scarf", "linen_shirt"],
+}
+
+
+class TestCapsuleTemplates:
+    """Test climate substitution, category resolution and price targets"""
+
+    def test_native_climate_is_unchanged(self):
+        """Test a template compiled for its own climate keeps every slot"""
+        compiled = compile_template(TEMPLATE, "Q1", "cold")
+        assert [slot.key for slot in compiled.slots] == TEMPLATE["items"]
+        assert compiled.substitutions == {}
+        assert compiled.slots[0].label == "Wool Coat"
+        assert compiled.slots[1].categories == ("Top", "Sweater")
+
+    def test_hot_climate_substitutes_without_duplicates(self):
+        """Test cold-weather slots are swapped and substitutes stay unique"""
+        compiled = compile_template(TEMPLATE, "Q1", "hot")
+        keys = [slot.key for slot in compiled.slots]
+        assert "wool_coat" not in keys and "boots" not in keys
+        assert compiled.substitutions["boots"] == "sandals"
+        # linen_shirt is already in the template, so the coat takes its fallback
+        assert compiled.substitutions["wool_coat"] == "kimono"
+        assert len(set(keys)) == len(keys)
+
+    def test_price_shares_sum_to_budget(self):
+        """Test per-slot shares cover the budget, weighted to outerwear"""
+        compiled = compile_template(TEMPLATE, "Q1", "cold")
+        shares = {slot.key: slot.price_share for slot in compiled.slots}
+        assert sum(shares.values()) == pytest.approx(1.0)
+        assert shares["wool_coat"] > shares["sweater"] > shares["scarf"]
+
+    def test_table_covers_every_quarter_and_climate(self):
+        """Test the generator compiles every (quarter, climate) pair"""
+        generator = CapsuleGenerator()
+        table = compile_templates(generator.templates)
+        assert set(table) == {
+            (quarter, climate.value)
+            for quarter in generator.templates
+            for climate in Climate
+        }
+        summer_cold = generator._get_template(Quarter.Q3, Climate.COLD)
+        assert "bikini" not in [slot.key for slot in summer_cold.slots]
+        assert generator._get_template(Quarter.Q3, Climate.WARM).substitutions == {}
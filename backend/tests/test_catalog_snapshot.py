@@ -0,0 +1,143 @@
+"""
+Tests for the memory-mapped catalog snapshot
+"""
+
+import os
+import time
+
+import pytest
+
+from app.services import catalog_snapshot
+from app.services.catalog_snapshot import (
+    CatalogSnapshot,
+    SnapshotFormatError,
+    SnapshotHolder,
+    write_snapshot,
+)
+from app.services.metrics import metrics
+from app.services.product_records import ProductRecord
+
+RECORDS = [
+    ProductRecord(3, "COS", 2, "Wool Coat", "Outerwear", 5, 190.0, ["black"]),
+    ProductRecord(1, "Everlane", 1, "Tee", "Top", 4, 30.0, ["white", "black"]),
+    ProductRecord(2, "Uniqlo", 3, "Tank", "Top", 4, None, [], None, "https://x/2"),
+]
+
+
+def _fields(record):
+    return [getattr(record, f) for f in ProductRecord.__slots__]
+
+
+class TestCatalogSnapshot:
+    """Test the file format, category ranges and atomic reload"""
+
+    def test_roundtrip(self, tmp_path):
+        """Test records read back identically, grouped by category"""
+        path = str(tmp_path / "catalog.snap")
+        header = write_snapshot(path, RECORDS, catalog_version=7)
+        assert header["rows"] == 3
+
+        snapshot = CatalogSnapshot(path)
+        assert snapshot.catalog_version == 7
+        tops = snapshot.records_in_categories([4])
+        assert [_fields(r) for r in tops] == [_fields(RECORDS[1]), _fields(RECORDS[2])]
+        both = snapshot.records_in_categories([5, 4, 99])
+        assert [r.id for r in both] == [3, 1, 2]
+
+    def test_slot_selection_matches_records(self, tmp_path):
+        """Test column-based slot picks equal the record-based ones"""
+        from app.services.capsule_generator import CapsuleGenerator
+
+        records = [
+            ProductRecord(i, "COS", 0, f"Item {i}", "Top", 4, p, [])
+            for i, p in enumerate([80.0, 25.0, 60.0, 140.0, 60.0, 35.0], start=1)
+        ]
+        path = str(tmp_path / "catalog.snap")
+        write_snapshot(path, records, catalog_version=1)
+        snapshot = CatalogSnapshot(path)
+        rows = snapshot.category_rows([4, 99])
+        assert rows.tolist() == list(range(6))
+        assert len(snapshot.category_rows([99])) == 0
+
+        generator = CapsuleGenerator()
+        for target in (10.0, 50.0, 100.0):
+            from_rows = generator._select_from_snapshot(snapshot, rows, target, [])
+            expected = generator._select_from_records(records, target, [])
+            assert [r.id for r in from_rows] == [r.id for r in expected]
+
+    def test_sql_slot_skips_unpriced_products(self, tmp_path, monkeypatch):
+        """Test an unpriced catalog row doesn't break the SQL slot path"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        from app.database import Base, Product
+        from app.services.capsule_generator import CapsuleGenerator
+        from app.services.dimensions import categories
+        from app.services.tracing import tracer
+
+        engine = create_engine(f"sqlite:///{tmp_path}/catalog.db")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        db.add(Product(brand="Shop", name="Scanned Tee", category="Top", category_id=4))
+        db.add(
+            Product(brand="COS", name="Tee", category="Top", category_id=4, price=40)
+        )
+        db.commit()
+
+        monkeypatch.setattr(catalog_snapshot, "get_catalog_snapshot", lambda: None)
+        monkeypatch.setattr(categories, "ids", lambda names: [4])
+        generator = CapsuleGenerator()
+        template = generator.template_table[("Q1", "cold")]
+        try:
+            with tracer.span("test") as span:
+                item = generator._generate_slot(
+                    db, span, template.slots[0], template, 1000.0, []
+                )
+        finally:
+            db.close()
+        assert item.best_value.name == item.best_quality.name == "Tee"
+
+    def test_holder_bounds_stale_age(self, tmp_path, monkeypatch):
+        """Test a lagging snapshot stops being served after max_stale_seconds"""
+        path = str(tmp_path / "catalog.snap")
+        write_snapshot(path, RECORDS, catalog_version=1)
+        monkeypatch.setattr(catalog_snapshot, "_database_catalog_version", lambda: 2)
+        holder = SnapshotHolder(path, check_seconds=0, max_stale_seconds=0.05)
+        assert holder.get() is not None
+        time.sleep(0.06)
+        assert holder.get() is None
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test files without the snapshot magic are refused"""
+        path = tmp_path / "catalog.snap"
+        path.write_bytes(b"not a snapshot" * 4)
+        with pytest.raises(SnapshotFormatError):
+            CatalogSnapshot(str(path))
+
+    def test_holder_swaps_and_checks_version(self, tmp_path, monkeypatch):
+        """Test a rebuilt file is picked up and stale snapshots are bounded"""
+        path = str(tmp_path / "catalog.snap")
+        db_version = {"value": 1}
+        monkeypatch.setattr(
+            catalog_snapshot, "_database_catalog_version", lambda: db_version["value"]
+        )
+        holder = SnapshotHolder(path, check_seconds=0, max_lag=1)
+        assert holder.get() is None  # no file yet
+
+        write_snapshot(path, RECORDS[:1], catalog_version=1)
+        first = holder.get()
+        assert first.rows == 1
+
+        db_version["value"] = 2
+        assert holder.get() is first  # one write behind: still served
+        assert metrics.gauges["capsuleos_catalog_snapshot_lag_versions"][1] == 1
+        db_version["value"] = 3
+        assert holder.get() is None  # too far behind the database
+
+        db_version["value"] = 2
+        write_snapshot(path, RECORDS, catalog_version=2)
+        second = holder.get()
+        assert second is not first and second.rows == 3
+        # The old mapping stays readable for requests still holding it
+        assert first.records_in_categories([5])[0].name == "Wool Coat"
+        assert not [f for f in os.listdir(tmp_path) if ".tmp-" in f]
@@ -0,0 +1,205 @@
+"""
+End-to-end tests for the catalog crawler against a static-file "retailer"
+"""
+
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import json
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, CatalogMeta, Product
+from app.services import ann_index
+from app.services.ann_index import IncrementalUpdater, IVFIndex
+from app.services.crawler import (
+    CatalogCrawler,
+    CrawlState,
+    parse_page,
+    upsert_products,
+)
+from app.services.link_extractor import LinkExtractor
+
+ITEMS = [
+    ("linen-shirt", "Linen Shirt", "Shirts", 58),
+    ("wide-trouser", "Wide Leg Trouser", "Pants", 98),
+    ("wool-coat", "Wool Coat", "Coats & Jackets", 248),
+    ("ankle-boot", "Leather Ankle Boot", "Footwear", 180),
+    ("slip-dress", "Silk Slip Dress", "Dresses", 120),
+    ("gift-card", "Gift Card", "Gifts", 50),  # no catalog category
+]
+
+
+def _product_page(slug, name, category, price):
+    data = {
+        "@type": "Product",
+        "name": name,
+        "brand": {"name": "Static Co"},
+        "category": category,
+        "offers": {"price": str(price), "priceCurrency": "USD"},
+    }
+    return (
+        f'<html><head><script type="application/ld+json">{json.dumps(data)}'
+        f'</script></head><body><a href="/index.html">Home</a></body></html>'
+    )
+
+
+@pytest.fixture
+def retailer(tmp_path):
+    site = tmp_path / "site"
+    (site / "p").mkdir(parents=True)
+    links = [f'<a href="/p/{slug}.html">{slug}</a>' for slug, *_ in ITEMS]
+    (site / "index.html").write_text(
+        f'<html><body>{"".join(links[:3])}<a href="/page2.html">Next</a></body></html>'
+    )
+    (site / "page2.html").write_text(f'<html><body>{"".join(links)}</body></html>')
+    for item in ITEMS:
+        (site / "p" / f"{item[0]}.html").write_text(_product_page(*item))
+
+    handler = partial(SimpleHTTPRequestHandler, directory=str(site))
+    handler.log_message = lambda *args: None
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add(CatalogMeta(id=1, version=1))
+    db.commit()
+    db.close()
+    return factory
+
+
+def _crawl(state_path, session_factory, seed, **kwargs):
+    state = CrawlState(str(state_path))
+    crawler = CatalogCrawler(
+        state,
+        session_factory,
+        fetch_concurrency=4,
+        parse_workers=2,
+        batch_size=2,
+        flush_interval_s=0.2,
+        # The fixture server is on loopback
+        extractor=LinkExtractor(allow_private_hosts=True),
+        **kwargs,
+    )
+    try:
+        return asyncio.run(crawler.run([seed]))
+    finally:
+        state.close()
+
+
+class TestCatalogCrawler:
+    """Test parsing, ingestion and resume"""
+
+    def test_parse_sitemap(self):
+        """Test sitemap <loc> entries become links"""
+        body = (
+            '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/'
+            'sitemap/0.9"><url><loc>https://shop.example/p/1</loc></url></urlset>'
+        )
+        result = parse_page(body, "https://shop.example/sitemap.xml")
+        assert result == {"product": None, "links": ["https://shop.example/p/1"]}
+
+    def test_crawl_ingests_products(self, tmp_path, retailer, session_factory):
+        """Test listing pages are followed and product pages upserted"""
+        summary = _crawl(tmp_path / "state.sqlite", session_factory, retailer + "/")
+        assert summary["inserted"] == 5
+        assert summary["skipped"] == 1
+        assert summary["frontier"] == {"done": 9}
+
+        db = session_factory()
+        categories = {p.name: p.category for p in db.query(Product).all()}
+        assert categories == {
+            "Linen Shirt": "Top",
+            "Wide Leg Trouser": "Bottom",
+            "Wool Coat": "Outerwear",
+            "Leather Ankle Boot": "Shoes",
+            "Silk Slip Dress": "Dress",
+        }
+        assert db.get(CatalogMeta, 1).version > 1
+        db.close()
+
+    def test_resume_after_interruption(self, tmp_path, retailer, session_factory):
+        """Test a stopped crawl continues without refetching or duplicating"""
+        state_path = tmp_path / "state.sqlite"
+        first = _crawl(state_path, session_factory, retailer + "/", max_pages=3)
+        assert first["fetched"] == 3
+
+        second = _crawl(state_path, session_factory, retailer + "/")
+        assert first["fetched"] + second["fetched"] == 9
+        assert second["frontier"] == {"done": 9}
+
+        db = session_factory()
+        assert db.query(Product).count() == 5
+        db.close()
+
+    def test_upsert_feeds_ann_index(self, monkeypatch, session_factory):
+        """Test bulk-upserted products reach the ANN delta segment"""
+        words = ["linen", "wool", "leather", "silk"]
+
+        class WordEncoder:
+            def encode(self, texts):
+                return [[float(w in t.lower()) for w in words] for t in texts]
+
+        index = IVFIndex.build(
+            [1000], np.eye(4, dtype=np.float32)[:1], ["Top"], [10.0], nlist=1
+        )
+        updater = IncrementalUpdater(index, WordEncoder())
+        monkeypatch.setattr(ann_index, "_updater", updater)
+
+        row = {
+            "brand": "Shop",
+            "name": "Silk Slip Dress",
+            "category": "Dress",
+            "price": 120.0,
+            "link": "https://shop.example/p/silk",
+        }
+        upsert_products(session_factory, [row])
+        upsert_products(session_factory, [{**row, "price": 90.0}])
+        updater.join()
+
+        db = session_factory()
+        (product,) = db.query(Product).all()
+        db.close()
+        hits = index.search([0, 0, 0, 1], k=1, category="Dress")
+        assert hits[0][0] == product.id
+        assert index.search([0, 0, 0, 1], k=1, price_range=(80, 100)) == hits
+
+
+class TestCrawlState:
+    """Test the frontier commits in groups"""
+
+    def test_updates_committed_in_groups(self, tmp_path):
+        """Test writes are visible to other readers only after a group commit"""
+        path = str(tmp_path / "state.sqlite")
+        state = CrawlState(path, commit_every=3, commit_seconds=3600)
+        reader = sqlite3.connect(path)
+
+        def committed():
+            return dict(
+                reader.execute("SELECT status, COUNT(*) FROM urls GROUP BY status")
+            )
+
+        assert state.add(["https://a/1", "https://a/2"]) == 2
+        assert committed() == {}
+        assert state.counts() == {"pending": 2}  # own connection sees them
+        state.add(["https://a/3", "https://a/1"])
+        assert committed() == {"pending": 3}
+
+        state.mark_done(["https://a/1"])
+        assert committed() == {"pending": 3}
+        state.close()
+        assert committed() == {"pending": 2, "done": 1}
+        reader.close()
@@ -0,0 +1,83 @@
+"""
+Tests for the category / brand dimension maps
+"""
+
+from sqlalchemy import create_engine, text
+
+from app.database import Base
+from app.services.dimensions import Dimension, backfill
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/dimensions.db")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+class TestDimensions:
+    """Test interning, get-or-create, pending publication and backfill"""
+
+    def test_names_are_normalized(self):
+        """Test case and whitespace variants share one id"""
+        dimension = Dimension("categories")
+        assert dimension.id("Wool Coat") == dimension.id("  wool   COAT ")
+        assert dimension.id("Wool Coat") < 0  # not in the table: local id
+        assert dimension.id(None) == dimension.id("") == 0
+        assert dimension.key_of(dimension.id("Tee")) == "tee"
+
+    def test_pending_ids_publish_on_commit(self, tmp_path):
+        """Test created ids stay pending until published, then replace local ids"""
+        engine = _engine(tmp_path)
+        dimension = Dimension("brands")
+        local = dimension.id("Everlane")
+        pending = {}
+        with engine.begin() as conn:
+            created = dimension.resolve(conn, "Everlane", pending)
+            assert dimension.resolve(conn, "everlane", pending) == created
+        assert created > 0 and dimension.id("Everlane") == local
+        dimension.publish(pending)
+        assert dimension.id("EVERLANE") == created
+
+        fresh = Dimension("brands")
+        with engine.connect() as conn:
+            assert fresh.load(conn) == 1
+        assert fresh.id("everlane") == created
+
+    def test_backfill_sets_missing_ids(self, tmp_path):
+        """Test backfill interns existing strings and fills the id columns"""
+        engine = _engine(tmp_path)
+        with engine.begin() as conn:
+            for category in ("Top", "top ", "Shoes", None):
+                conn.execute(
+                    text("INSERT INTO products (category, price) VALUES (:c, 10)"),
+                    {"c": category},
+                )
+        dimension = Dimension("categories")
+        columns = (("products", "category", "category_id", dimension),)
+        with engine.begin() as conn:
+            assert backfill(conn, {}, columns) == 3
+            rows = conn.execute(
+                text("SELECT category, category_id FROM products ORDER BY id")
+            ).all()
+            assert backfill(conn, {}, columns) == 0
+        ids = [category_id for _, category_id in rows]
+        assert ids[0] == ids[1] != ids[2]
+        assert ids[3] is None
+
+    def test_lookup_sees_other_writers_and_never_grows(self, tmp_path):
+        """Test lookup() picks up rows added elsewhere and ignores junk names"""
+        engine = _engine(tmp_path)
+        dimension = Dimension("categories", refresh_seconds=0)
+        dimension.bind(engine)
+        assert dimension.lookup("Top") is None
+        with engine.begin() as conn:
+            # Another process seeds the catalog
+            created = Dimension("categories").resolve(conn, "Top")
+            conn.execute(text("INSERT INTO catalog_meta (id, version) VALUES (1, 2)"))
+        assert dimension.lookup(" top ") == created
+        assert dimension.ids(["Top", "top", "Nope"]) == [created]
+
+        before = (len(dimension._ids), len(dimension._keys))
+        for i in range(100):
+            assert dimension.lookup(f"junk {i}") is None
+        assert (len(dimension._ids), len(dimension._keys)) == before
@@ -0,0 +1,74 @@
+"""
+Tests for the batched embedding service and content-hash store
+"""
+
+import threading
+import numpy as np
+from app.services.embedding_service import (
+    EmbeddingService,
+    HashingEncoder,
+    VectorStore,
+)
+
+
+class TestHashingEncoder:
+    """Test the offline stub model"""
+
+    def test_deterministic_and_lexical(self):
+        """Test identical texts match and shared words raise similarity"""
+        encoder = HashingEncoder(dim=64)
+        a, b, c = encoder.encode(["linen shirt", "linen shirt", "wool coat"])
+        assert np.array_equal(a, b)
+        d = encoder.encode(["relaxed linen shirt"])[0]
+        assert a @ d > a @ c
+
+
+class TestEmbeddingService:
+    """Test caching across restarts and micro-batching"""
+
+    def test_store_survives_restart(self, tmp_path):
+        """Test unchanged texts are never re-encoded by a new service"""
+        path = str(tmp_path / "vectors.sqlite")
+        encoder = HashingEncoder(dim=32)
+        first = EmbeddingService(encoder, "stub", VectorStore(path))
+        vectors = first.encode(["linen shirt", "wool coat", "linen shirt"])
+        assert vectors.shape == (3, 32)
+        assert first.stats["encoded"] == 2
+
+        calls = encoder.calls
+        second = EmbeddingService(encoder, "stub", VectorStore(path))
+        again = second.encode(["wool coat", "linen shirt"])
+        assert encoder.calls == calls
+        assert np.array_equal(again[1], vectors[0])
+        assert second.stats["hits"] == 2
+
+    def test_store_keyed_by_model(self, tmp_path):
+        """Test vectors from another model are not reused"""
+        store = VectorStore(str(tmp_path / "vectors.sqlite"))
+        EmbeddingService(HashingEncoder(dim=8), "a", store).encode(["tee"])
+        other = EmbeddingService(HashingEncoder(dim=8), "b", store)
+        other.encode(["tee"])
+        assert other.stats["misses"] == 1
+
+    def test_concurrent_requests_share_a_batch(self, tmp_path):
+        """Test requests arriving within the window are encoded together"""
+        service = EmbeddingService(
+            HashingEncoder(dim=16),
+            "stub",
+            VectorStore(str(tmp_path / "vectors.sqlite")),
+            batch_window_ms=200,
+        )
+        results = {}
+
+        def worker(i):
+            results[i] = service.encode([f"item {i}", "shared text"])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(results) == 8
+        assert service.stats["batches"] < 8
+        assert service.stats["encoded"] <= 9
@@ -0,0 +1,134 @@
+"""
+Tests for the product embedding index
+"""
+
+from types import SimpleNamespace
+import numpy as np
+from app.services import embeddings
+from app.services.embeddings import ProductEmbeddingIndex, product_text, top_k
+
+VOCAB = ["linen", "relaxed", "wool", "tailored", "leather", "bold"]
+
+
+class KeywordEncoder:
+    """One dimension per vocabulary word (stand-in for a sentence model)"""
+
+    def encode(self, texts, batch_size=32):
+        out = np.zeros((len(texts), len(VOCAB)), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for j, word in enumerate(VOCAB):
+                if word in text.lower():
+                    out[i, j] = 1.0
+        return out
+
+
+def _product(pid, name, description, metadata=None):
+    return SimpleNamespace(
+        id=pid, name=name, description=description, product_metadata=metadata or {}
+    )
+
+
+PRODUCTS = [
+    _product(1, "Linen Shirt", "Relaxed linen button-up"),
+    _product(2, "Wool Blazer", "Tailored wool blazer"),
+    _product(3, "Moto Jacket", "Bold jacket", {"material": "leather"}),
+]
+
+
+class TestProductEmbeddingIndex:
+    """Test build/load round trip and style ranking"""
+
+    def test_product_text_includes_metadata(self):
+        """Test metadata values are flattened into the embedded text"""
+        text = product_text("Tee", "Crew neck", {"material": "organic_cotton"})
+        assert "organic cotton" in text
+
+    def test_top_k_order(self):
+        """Test top_k returns best-first indices"""
+        scores = np.array([0.1, 0.9, 0.5, 0.7])
+        assert list(top_k(scores, 2)) == [1, 3]
+        assert list(top_k(scores, 10)) == [1, 3, 2, 0]
+
+    def test_build_load_and_rank(self, tmp_path):
+        """Test memory-mapped index ranks products by style similarity"""
+        encoder = KeywordEncoder()
+        count = ProductEmbeddingIndex.build(
+            PRODUCTS,
+            encoder,
+            index_dir=str(tmp_path),
+            model_name="keyword",
+            descriptors=["relaxed", "tailored"],
+        )
+        assert count == 3
+
+        index = ProductEmbeddingIndex.load(str(tmp_path))
+        assert isinstance(index.matrix, np.memmap)
+        assert index.matrix.dtype == np.float16
+
+        query = index.style_vector(["Relaxed"])
+        assert index.rank([1, 2, 3], query, 1) == [1]
+        assert index.rank([2, 3], index.style_vector(["tailored"]), 1) == [2]
+
+    def test_descriptor_cache_used_before_encoder(self, tmp_path):
+        """Test precomputed descriptors don't need a model at request time"""
+        ProductEmbeddingIndex.build(
+            PRODUCTS,
+            KeywordEncoder(),
+            index_dir=str(tmp_path),
+            descriptors=["bold"],
+        )
+        index = ProductEmbeddingIndex.load(str(tmp_path))
+        index._encoder = False  # no model available
+        assert index.style_vector(["bold"]) is not None
+        assert index.style_vector(["unknown-word"]) is None
+
+    def test_filter_by_style(self, tmp_path):
+        """Test candidate pool is narrowed to the closest products"""
+        ProductEmbeddingIndex.build(
+            PRODUCTS, KeywordEncoder(), index_dir=str(tmp_path), descriptors=["bold"]
+        )
+        index = ProductEmbeddingIndex.load(str(tmp_path))
+        kept = index.filter_by_style(PRODUCTS, index.style_vector(["bold"]), keep=1)
+        assert [p.id for p in kept] == [3]
+        # Small pools are returned untouched
+        assert index.filter_by_style(PRODUCTS[:1], np.ones(6), keep=5) == PRODUCTS[:1]
+
+    def test_stale_index_still_served(self, tmp_path, monkeypatch):
+        """Test an index behind the catalog is served and its lag exported"""
+        from app.services.metrics import metrics
+
+        ProductEmbeddingIndex.build(
+            PRODUCTS, KeywordEncoder(), index_dir=str(tmp_path), catalog_version=3
+        )
+        index = ProductEmbeddingIndex.load(str(tmp_path))
+        assert index.catalog_version == 3
+
+        database_version = [3]
+        monkeypatch.setattr(embeddings, "EMBEDDING_VERSION_CHECK_SECONDS", 0)
+        monkeypatch.setattr(embeddings, "_style_index", index)
+        monkeypatch.setattr(embeddings, "_style_index_loaded", True)
+        monkeypatch.setattr(embeddings, "_style_checked_at", None)
+        monkeypatch.setattr(embeddings, "_style_index_lag", 0)
+        monkeypatch.setattr(
+            embeddings, "_database_catalog_version", lambda: database_version[0]
+        )
+        assert embeddings.get_style_index() is index
+        database_version[0] = 5  # products changed after the build
+        assert embeddings.get_style_index() is index
+        assert metrics.gauges["capsuleos_style_index_lag_versions"][1] == 2
+        # Products the index doesn't know are skipped, not an error
+        index._encoder = KeywordEncoder()
+        assert index.rank([1, 99], index.style_vector(["relaxed"]), 2) == [1]
+
+    def test_descriptor_cache_is_bounded(self, tmp_path, monkeypatch):
+        """Test request-time descriptors live in an LRU, the vocabulary doesn't"""
+        ProductEmbeddingIndex.build(
+            PRODUCTS, KeywordEncoder(), index_dir=str(tmp_path), descriptors=["bold"]
+        )
+        index = ProductEmbeddingIndex.load(str(tmp_path))
+        index._encoder = KeywordEncoder()
+        monkeypatch.setattr(embeddings, "EMBEDDING_DESCRIPTOR_CACHE_SIZE", 2)
+        for word in ("linen", "wool", "leather", "silk weave", "relaxed"):
+            assert index.style_vector([word, "bold"]) is not None
+        assert list(index._descriptor_cache) == ["silk weave", "relaxed"]
+        assert "bold" in index._vocabulary
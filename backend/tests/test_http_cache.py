@@ -0,0 +1,89 @@
+"""
+Tests for ETag / conditional GET helpers
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.routers.capsule import get_capsule
+from app.services.cache import capsule_cache
+from app.services.http_cache import (
+    content_etag,
+    make_etag,
+    cache_headers,
+    http_date,
+    is_not_modified,
+)
+
+
+def _request(headers: dict) -> Request:
+    raw = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+
+class TestHttpCache:
+    """Test validator generation and 304 decisions"""
+
+    def test_etag_depends_on_version_and_params(self):
+        """Test ETag changes with catalog version and query params"""
+        base = make_etag("products", 1, None, 100, 0)
+        assert base == make_etag("products", 1, None, 100, 0)
+        assert base != make_etag("products", 2, None, 100, 0)
+        assert base != make_etag("products", 1, "Top", 100, 0)
+
+    def test_if_none_match(self):
+        """Test matching, weak and list-form If-None-Match headers"""
+        etag = make_etag("products", 1)
+        assert is_not_modified(_request({"If-None-Match": etag}), etag)
+        assert is_not_modified(_request({"If-None-Match": f"W/{etag}"}), etag)
+        assert is_not_modified(_request({"If-None-Match": f'"other", {etag}'}), etag)
+        assert is_not_modified(_request({"If-None-Match": "*"}), etag)
+        assert not is_not_modified(_request({"If-None-Match": '"other"'}), etag)
+        assert not is_not_modified(_request({}), etag)
+
+    def test_if_modified_since(self):
+        """Test If-Modified-Since against Last-Modified"""
+        modified = datetime(2026, 1, 1, 12, 0, 0)
+        etag = make_etag("products", 1)
+        later = http_date(modified + timedelta(minutes=5))
+        earlier = http_date(modified - timedelta(minutes=5))
+        assert is_not_modified(_request({"If-Modified-Since": later}), etag, modified)
+        assert not is_not_modified(
+            _request({"If-Modified-Since": earlier}), etag, modified
+        )
+        assert not is_not_modified(
+            _request({"If-Modified-Since": "garbage"}), etag, modified
+        )
+
+    def test_cache_headers(self):
+        """Test Cache-Control and Last-Modified headers"""
+        headers = cache_headers('"abc"', 300, last_modified=datetime(2026, 1, 1))
+        assert headers["ETag"] == '"abc"'
+        assert headers["Cache-Control"] == "public, max-age=300, must-revalidate"
+        assert headers["Last-Modified"] == "Thu, 01 Jan 2026 00:00:00 GMT"
+
+    def test_capsule_etag_follows_body(self):
+        """Test capsule ETags hash the body and missing capsules 404 first"""
+        with pytest.raises(HTTPException) as missing:
+            asyncio.run(
+                get_capsule("no-such-capsule", _request({"If-None-Match": "*"}))
+            )
+        assert missing.value.status_code == 404
+
+        capsule_cache.set("etag-test", {}, encoded=b'{"items": [1]}')
+        etag = content_etag(b'{"items": [1]}')
+        response = asyncio.run(
+            get_capsule("etag-test", _request({"If-None-Match": etag}))
+        )
+        assert response.status_code == 304
+
+        # Regenerated with different content: the old tag no longer matches
+        capsule_cache.set("etag-test", {}, encoded=b'{"items": [2]}')
+        response = asyncio.run(
+            get_capsule("etag-test", _request({"If-None-Match": etag}))
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] == content_etag(b'{"items": [2]}')
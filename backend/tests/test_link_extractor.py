@@ -0,0 +1,273 @@
+"""
+Tests for product link fetching and parsing (against a local fixture server)
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, Product
+from app.services.link_extractor import (
+    LinkExtractor,
+    ResponseTooLarge,
+    UnsafeURLError,
+    canonical_url,
+    normalize_category,
+    parse_product_page,
+)
+
+JSON_LD_PAGE = """<html><head>
+<link rel="canonical" href="/products/linen-shirt">
+<script type="application/ld+json">%s</script>
+</head><body>Linen shirt</body></html>""" % json.dumps(
+    {
+        "@context": "https://schema.org",
+        "@graph": [
+            {"@type": "BreadcrumbList"},
+            {
+                "@type": "Product",
+                "name": "Relaxed Linen Shirt",
+                "brand": {"@type": "Brand", "name": "Everlane"},
+                "description": "Breathable linen button-up",
+                "image": ["/img/linen.jpg"],
+                "color": "White",
+                "offers": {"@type": "Offer", "price": "78.00", "priceCurrency": "USD"},
+            },
+        ],
+    }
+)
+
+OG_PAGE = """<html><head><title>Fallback title</title>
+<meta property="og:title" content="Wool Trench Coat">
+<meta property="og:site_name" content="Aritzia">
+<meta property="product:price:amount" content="1,248.00">
+<meta property="og:image" content="https://cdn.example/trench.jpg">
+</head><body></body></html>"""
+
+
+UNPRICED_PAGE = """<html><head>
+<meta property="og:title" content="Cotton Tee (sold out)">
+</head><body></body></html>"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    pages = {
+        "/products/linen-shirt": JSON_LD_PAGE,
+        "/products/trench": OG_PAGE,
+        "/products/sold-out": UNPRICED_PAGE,
+    }
+    hits = []
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        body = self.pages.get(self.path.split("?")[0])
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.hits = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'products.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+class TestParsing:
+    """Test URL canonicalization and page parsing"""
+
+    def test_canonical_url(self):
+        """Test tracking params, fragments and case are normalized away"""
+        url = "HTTPS://Shop.Example/p/1/?utm_source=x&size=M&gclid=1#reviews"
+        assert canonical_url(url) == "https://shop.example/p/1?size=M"
+
+    def test_normalize_category(self):
+        """Test retailer categories map onto catalog categories"""
+        assert normalize_category("Women > Jackets & Coats") == "Outerwear"
+        assert normalize_category(None, "Slim Ankle Pant") == "Bottom"
+        assert normalize_category("Gift cards") is None
+
+    def test_json_ld_product(self):
+        """Test JSON-LD Product inside @graph is parsed"""
+        info = parse_product_page(JSON_LD_PAGE, "https://shop.example/p?id=1")
+        assert info["name"] == "Relaxed Linen Shirt"
+        assert info["brand"] == "Everlane"
+        assert info["price"] == 78.0
+        assert info["category"] == "Top"
+        assert info["image_url"] == "https://shop.example/img/linen.jpg"
+        assert info["canonical_url"] == "https://shop.example/products/linen-shirt"
+
+    def test_open_graph_fallback(self):
+        """Test OpenGraph tags are used when there is no JSON-LD"""
+        info = parse_product_page(OG_PAGE, "https://shop.example/trench")
+        assert info["name"] == "Wool Trench Coat"
+        assert info["brand"] == "Aritzia"
+        assert info["price"] == 1248.0
+        assert info["category"] == "Outerwear"
+
+
+class TestLinkExtractor:
+    """Test fetching, caching and Product storage"""
+
+    def test_fetch_cache_and_store(self, server, session_factory):
+        """Test repeat and concurrent scans of a link fetch it only once"""
+        extractor = LinkExtractor(
+            session_factory=session_factory, allow_private_hosts=True
+        )
+        link = f"{server}/products/linen-shirt?utm_campaign=spring"
+
+        async def scan():
+            first = await extractor.extract_many([link, link, link])
+            again = await extractor.extract(f"{server}/products/linen-shirt")
+            await extractor.aclose()
+            return first, again
+
+        first, again = asyncio.run(scan())
+        assert _Handler.hits == ["/products/linen-shirt?utm_campaign=spring"]
+        assert first[0]["brand"] == "Everlane"
+        assert again["name"] == "Relaxed Linen Shirt"
+
+        db = session_factory()
+        (product,) = db.query(Product).all()
+        assert product.link == canonical_url(link)
+        assert product.price == 78.0
+        assert product.category == "Top"
+        db.close()
+
+    def test_stored_product_survives_restart(self, server, session_factory):
+        """Test a new extractor (empty cache) serves the link from the DB"""
+        link = f"{server}/products/trench"
+        asyncio.run(
+            LinkExtractor(
+                session_factory=session_factory, allow_private_hosts=True
+            ).extract(link)
+        )
+        fresh = LinkExtractor(session_factory=session_factory, allow_private_hosts=True)
+        info = asyncio.run(fresh.extract(link))
+        assert info["name"] == "Wool Trench Coat"
+        assert _Handler.hits == ["/products/trench"]
+        assert fresh.fetches == 0
+
+    def test_unpriced_page_not_stored(self, server, session_factory):
+        """Test pages without a price are returned but never become products"""
+        extractor = LinkExtractor(
+            session_factory=session_factory, allow_private_hosts=True
+        )
+        info = asyncio.run(extractor.extract(f"{server}/products/sold-out"))
+        assert info["name"] == "Cotton Tee (sold out)" and info["price"] is None
+        assert "product_id" not in info
+        db = session_factory()
+        assert db.query(Product).count() == 0
+        db.close()
+
+    def test_http_error_raises(self, server):
+        """Test missing pages raise (the analyzer falls back to generic info)"""
+        extractor = LinkExtractor(allow_private_hosts=True)
+        with pytest.raises(Exception):
+            asyncio.run(extractor.extract(f"{server}/products/missing"))
+
+
+# A public address literal: resolves without DNS, never actually contacted
+PUBLIC = "http://93.184.216.34"
+
+
+def _mock(handler, **kwargs) -> LinkExtractor:
+    return LinkExtractor(transport=httpx.MockTransport(handler), **kwargs)
+
+
+class TestFetchSafety:
+    """Test only public http(s) targets are fetched, with a size cap"""
+
+    def test_rejects_non_public_targets(self, server):
+        """Test schemes, loopback, private and metadata addresses are refused"""
+        extractor = LinkExtractor()
+        for url in (
+            "file:///etc/passwd",
+            "ftp://93.184.216.34/p",
+            f"{server}/products/trench",
+            "http://localhost/admin",
+            "http://10.0.0.5/",
+            "http://169.254.169.254/latest/meta-data/",
+            "http://[::1]/",
+            "http://[::ffff:127.0.0.1]/",
+        ):
+            with pytest.raises(UnsafeURLError):
+                asyncio.run(extractor.fetch(url))
+        assert _Handler.hits == [] and extractor.fetches == 0
+
+    def test_every_redirect_hop_is_checked(self):
+        """Test redirects are followed manually and a private hop is refused"""
+        seen = []
+
+        def handler(request):
+            seen.append((str(request.url), request.headers["host"]))
+            if request.url.path == "/moved":
+                return httpx.Response(301, headers={"Location": "/products/tee"})
+            if request.url.path == "/products/tee":
+                return httpx.Response(200, text=OG_PAGE)
+            return httpx.Response(
+                302, headers={"Location": "http://169.254.169.254/latest/"}
+            )
+
+        extractor = _mock(handler)
+        final_url, body = asyncio.run(extractor.fetch(f"{PUBLIC}/moved"))
+        assert final_url == f"{PUBLIC}/products/tee"
+        assert "Wool Trench Coat" in body
+        with pytest.raises(UnsafeURLError):
+            asyncio.run(extractor.fetch(f"{PUBLIC}/bounce"))
+        assert [url for url, _ in seen] == [
+            f"{PUBLIC}/moved",
+            f"{PUBLIC}/products/tee",
+            f"{PUBLIC}/bounce",
+        ]
+
+        loop = _mock(lambda request: httpx.Response(302, headers={"Location": "/"}))
+        with pytest.raises(UnsafeURLError):
+            asyncio.run(loop.fetch(f"{PUBLIC}/"))
+        assert loop.fetches == loop.max_redirects + 1
+
+    def test_body_size_cap(self):
+        """Test bodies past max_bytes are refused, declared or streamed"""
+
+        async def chunks():
+            for _ in range(10):
+                yield b"x" * 64
+
+        def handler(request):
+            if request.url.path == "/declared":
+                return httpx.Response(200, content=b"x" * 1000)
+            return httpx.Response(200, content=chunks())
+
+        extractor = _mock(handler, max_bytes=256)
+        for path in ("/declared", "/streamed"):
+            with pytest.raises(ResponseTooLarge):
+                asyncio.run(extractor.fetch(PUBLIC + path))
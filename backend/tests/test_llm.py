@@ -0,0 +1,231 @@
+"""
+Tests for the LLM provider abstraction, response cache, validation and
+tiered escalation
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.models import AnalyzeItemResponse, Verdict
+from app.services import item_analyzer
+from app.services.item_analyzer import ItemAnalyzer
+from app.services.llm import (
+    LLMClient,
+    LLMError,
+    LLMProvider,
+    ResponseCache,
+    StubProvider,
+    analyze_item_content,
+    generate_capsule_content,
+    merge_analysis,
+)
+from app.services.metrics import MetricsRegistry
+
+
+class BrokenProvider(LLMProvider):
+    """Returns text that is not JSON"""
+
+    name = "broken"
+
+    async def complete(self, prompt, kind, temperature, max_tokens):
+        return "Sure! Here is your capsule:"
+
+
+class OffSchemaProvider(LLMProvider):
+    """Returns a JSON object that fails schema validation"""
+
+    name = "off-schema"
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.calls = 0
+
+    async def complete(self, prompt, kind, temperature, max_tokens):
+        self.calls += 1
+        return '{"verdict": "maybe", "items": [{"item_name": 1}]}'
+
+
+class ThreadRecordingCache(ResponseCache):
+    """Records the threads cache reads and writes run on"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, response, ttl):
+        self.threads.add(threading.get_ident())
+        super().set(key, response, ttl)
+
+
+def _capsule(client):
+    return generate_capsule_content(
+        client, "Q1", "cold", ["minimal"], 1200.0, [], ["black", "camel"]
+    )
+
+
+class TestLLMClient:
+    """Test caching, dedup and error handling"""
+
+    def test_disk_cache_survives_restart(self, tmp_path):
+        """Test a second client answers from the on-disk cache"""
+        path = str(tmp_path / "llm.sqlite")
+        first = LLMClient(StubProvider(), ResponseCache(path))
+        items, _ = asyncio.run(_capsule(first))
+
+        provider = StubProvider()
+        second = LLMClient(provider, ResponseCache(path))
+        again, _ = asyncio.run(_capsule(second))
+        assert provider.calls == 0
+        assert second.stats["cache_hits"] == 1
+        assert [i.item_name for i in again] == [i.item_name for i in items]
+
+    def test_cache_ttl(self, tmp_path):
+        """Test expired responses are not served"""
+        cache = ResponseCache(str(tmp_path / "llm.sqlite"))
+        cache.set("k", "{}", ttl=-1)
+        assert cache.get("k") is None
+        assert cache.purge_expired() == 1
+
+    def test_provider_must_implement_complete(self):
+        """Test the provider interface can't be instantiated without complete()"""
+        with pytest.raises(TypeError):
+            LLMProvider("x")
+
+    def test_cache_io_off_event_loop(self, tmp_path):
+        """Test cache lookups and stores run on worker threads"""
+        cache = ThreadRecordingCache(str(tmp_path / "llm.sqlite"))
+        client = LLMClient(StubProvider(), cache)
+
+        async def run():
+            await client.complete_json("pros_cons", "prompt")
+            await client.complete_json("pros_cons", "prompt")
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+        assert client.stats["cache_hits"] == 1
+        assert cache.threads and loop_thread not in cache.threads
+
+    def test_concurrent_identical_calls_share_request(self):
+        """Test identical in-flight prompts hit the provider once"""
+        provider = StubProvider(latency_ms=50)
+        client = LLMClient(provider)
+
+        async def run():
+            return await asyncio.gather(
+                *(client.complete_json("pros_cons", "same prompt") for _ in range(5))
+            )
+
+        results = asyncio.run(run())
+        assert provider.calls == 1
+        assert all(r == results[0] for r in results)
+
+    def test_invalid_json_raises_and_is_not_cached(self, tmp_path):
+        """Test unparseable output raises LLMError and isn't stored"""
+        cache = ResponseCache(str(tmp_path / "llm.sqlite"))
+        client = LLMClient(BrokenProvider("x"), cache)
+        with pytest.raises(LLMError):
+            asyncio.run(_capsule(client))
+        assert client.stats["errors"] == 1
+        assert cache.purge_expired() == 0
+
+    def test_invalid_schema_is_not_cached(self, tmp_path):
+        """Test replies failing validation raise and are asked for again"""
+        provider = OffSchemaProvider("x")
+        client = LLMClient(provider, ResponseCache(str(tmp_path / "llm.sqlite")))
+        for _ in range(2):
+            with pytest.raises(LLMError):
+                asyncio.run(_capsule(client))
+            with pytest.raises(LLMError):
+                asyncio.run(
+                    analyze_item_content(client, {"name": "Tee"}, None, {"total": 0.5})
+                )
+        assert provider.calls == 6
+        assert client.stats["cache_hits"] == 0
+
+
+class TestStructuredOutput:
+    """Test stub output validates into the API models"""
+
+    def test_capsule_content(self):
+        """Test stub capsule has 12 valid items within the budget scale"""
+        items, formulas = asyncio.run(_capsule(LLMClient(StubProvider())))
+        assert len(items) == 12
+        assert all(i.best_value.price < i.best_quality.price for i in items)
+        assert formulas
+
+    def test_analysis_prompts_fan_out(self):
+        """Test analysis and pros/cons prompts run concurrently"""
+        client = LLMClient(StubProvider(latency_ms=100))
+        start = time.monotonic()
+        fields = asyncio.run(
+            analyze_item_content(
+                client, {"name": "Linen Shirt", "price": 60}, None, {"total": 0.5}
+            )
+        )
+        assert time.monotonic() - start < 0.19
+        assert fields["verdict"] in {"buy", "wait", "skip"}
+        assert len(fields["pros"]) == 3
+
+    def test_merge_rejects_invalid_fields(self):
+        """Test a bad verdict from the LLM fails validation"""
+        base = AnalyzeItemResponse(
+            verdict=Verdict.WAIT, confidence=0.5, pros=[], cons=[], alternatives=[]
+        )
+        merged = merge_analysis(base, {"verdict": "buy", "pros": ["Great fit"]})
+        assert merged.verdict == Verdict.BUY
+        with pytest.raises(LLMError):
+            merge_analysis(base, {"verdict": "maybe"})
+
+
+class TestTieredAnalysis:
+    """Test escalation gating, timeout fallback and tier metrics"""
+
+    def test_only_borderline_scores_escalate(self):
+        """Test scores far from the 0.4/0.7 thresholds stay heuristic"""
+        analyzer = ItemAnalyzer()
+        assert analyzer._is_borderline(0.68)
+        assert analyzer._is_borderline(0.43)
+        assert not analyzer._is_borderline(0.9)
+        assert not analyzer._is_borderline(0.55)
+        assert not analyzer._is_borderline(0.1)
+
+    def test_escalation_timeout_falls_back(self, monkeypatch):
+        """Test a slow provider yields None (heuristic answer stands)"""
+        monkeypatch.setattr(item_analyzer, "LLM_ESCALATION_TIMEOUT", 0.05)
+        client = LLMClient(StubProvider(latency_ms=500))
+        result = asyncio.run(
+            ItemAnalyzer()._escalate(client, {"name": "Tee"}, None, {})
+        )
+        assert result is None
+
+    def test_escalation_returns_fields(self):
+        """Test a fast provider's fields are returned for merging"""
+        client = LLMClient(StubProvider())
+        fields = asyncio.run(
+            ItemAnalyzer()._escalate(client, {"name": "Tee"}, None, {})
+        )
+        assert fields["verdict"] in {"buy", "wait", "skip"}
+
+    def test_tier_metrics(self):
+        """Test escalation ratio and per-tier latency series"""
+        registry = MetricsRegistry()
+        registry.record_tier("analyze_item", "heuristic", 0.002)
+        registry.record_tier("analyze_item", "heuristic", 0.003)
+        registry.record_tier("analyze_item", "llm", 1.2)
+        registry.record_tier("analyze_item", "llm_fallback", 4.0)
+        assert registry.escalation_ratio("analyze_item") == 0.5
+        text = registry.render()
+        assert (
+            'capsuleos_decision_escalation_ratio{pipeline="analyze_item"} 0.5' in text
+        )
+        assert (
+            'capsuleos_decision_duration_seconds_count{pipeline="analyze_item",'
+            'tier="llm"} 1' in text
+        )
@@ -0,0 +1,80 @@
+"""
+Tests for in-process metrics and Prometheus rendering
+"""
+
+from app.services.cache import TTLCache
+from app.services.metrics import Histogram, MetricsRegistry
+
+
+class TestHistogram:
+    """Test fixed-bucket histogram"""
+
+    def test_observe_buckets(self):
+        """Test values land in the first bucket with bound >= value"""
+        hist = Histogram((0.1, 1.0))
+        hist.observe(0.05)
+        hist.observe(0.1)
+        hist.observe(0.5)
+        hist.observe(5.0)
+        assert hist.counts == [2, 1, 1]
+        assert hist.count == 4
+
+    def test_render_cumulative(self):
+        """Test rendered buckets are cumulative and end with +Inf"""
+        hist = Histogram((0.1, 1.0))
+        hist.observe(0.05)
+        hist.observe(0.5)
+        lines = list(hist.render("m", 'route="/x"'))
+        assert lines[0] == 'm_bucket{route="/x",le="0.1"} 1'
+        assert lines[1] == 'm_bucket{route="/x",le="1"} 2'
+        assert lines[2] == 'm_bucket{route="/x",le="+Inf"} 2'
+        assert lines[-1] == 'm_count{route="/x"} 2'
+
+
+class TestMetricsRegistry:
+    """Test registry bookkeeping"""
+
+    def test_request_db_accounting(self):
+        """Test queries recorded during a request are attributed to its route"""
+        registry = MetricsRegistry()
+        stats, token = registry.start_request()
+        registry.record_query(0.002)
+        registry.record_query(0.003)
+        registry.finish_request("GET", "/api/products", 200, 0.01, stats, token)
+
+        route = registry.route("GET", "/api/products")
+        assert route.db_queries.sum == 2
+        assert abs(route.db_time.sum - 0.005) < 1e-9
+        assert route.statuses == {200: 1}
+
+        # Queries outside a request only feed the global histogram
+        registry.record_query(0.001)
+        assert route.db_queries.sum == 2
+        assert registry.query_latency.count == 3
+
+    def test_cache_hit_ratio(self):
+        """Test cache hits/misses are exported"""
+        registry = MetricsRegistry()
+        cache = TTLCache()
+        registry.register_cache("capsule", cache)
+        cache.set("k", "v")
+        cache.get("k")
+        cache.get("missing")
+
+        text = registry.render()
+        assert 'capsuleos_cache_hits_total{cache="capsule"} 1' in text
+        assert 'capsuleos_cache_misses_total{cache="capsule"} 1' in text
+        assert 'capsuleos_cache_hit_ratio{cache="capsule"} 0.500000' in text
+
+    def test_read_sources_and_gauges(self):
+        """Test per-source read counts and service gauges are exported"""
+        registry = MetricsRegistry()
+        registry.record_read_source("capsule.slot", "sql")
+        registry.record_read_source("capsule.slot", "sql")
+        registry.set_gauge("capsuleos_lag", 3, "Lag")
+
+        text = registry.render()
+        assert (
+            'capsuleos_read_source_total{reader="capsule.slot",source="sql"} 2' in text
+        )
+        assert "# TYPE capsuleos_lag gauge\ncapsuleos_lag 3" in text
@@ -0,0 +1,104 @@
+"""
+Tests for the per-category price quantile sketch and stats table
+"""
+
+import random
+
+from sqlalchemy import create_engine, text
+
+from app.database import Base
+from app.services.price_stats import (
+    CategoryPriceStats,
+    PriceSketch,
+    apply_deltas,
+    refresh_categories,
+)
+from app.services.scoring import ItemScorer
+
+
+def _exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+class TestPriceSketch:
+    """Test quantile accuracy and exact removal"""
+
+    def test_quantiles_within_relative_error(self):
+        """Test quantiles stay within the sketch accuracy on skewed prices"""
+        rng = random.Random(7)
+        prices = [round(rng.lognormvariate(4, 0.8), 2) for _ in range(20000)]
+        sketch = PriceSketch(accuracy=0.01)
+        for price in prices:
+            sketch.add(price)
+        for q in (0.1, 0.5, 0.9):
+            exact = _exact(prices, q)
+            assert abs(sketch.quantile(q) - exact) / exact <= 0.011
+        assert len(sketch.counts) < 1000
+
+    def test_removal_and_json_roundtrip(self):
+        """Test removing prices restores the earlier state"""
+        sketch = PriceSketch()
+        for price in (10.0, 20.0, 30.0):
+            sketch.add(price)
+        before = sketch.to_json()
+        sketch.add(500.0)
+        sketch.add(500.0, -1)
+        restored = PriceSketch.from_json(sketch.to_json())
+        assert restored.to_json() == before and restored.n == 3
+        assert PriceSketch().quantile(0.5) is None
+
+
+class TestPriceStatsTable:
+    """Test incremental updates and rebuilds of category_price_stats"""
+
+    def _engine(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path}/stats.db")
+        Base.metadata.create_all(bind=engine)
+        return engine
+
+    def test_deltas_match_refresh(self, tmp_path):
+        """Test folding deltas gives the same row as a full recompute"""
+        engine = self._engine(tmp_path)
+        with engine.begin() as conn:
+            for i, (category_id, price) in enumerate(
+                [(1, 20.0), (1, 40.0), (1, 60.0), (2, 100.0)], start=1
+            ):
+                conn.execute(
+                    text(
+                        "INSERT INTO products (id, brand, name, category, "
+                        "category_id, price) VALUES (:i, 'B', 'N', 'C', :c, :p)"
+                    ),
+                    {"i": i, "c": category_id, "p": price},
+                )
+            apply_deltas(conn, {1: [(20.0, 1), (40.0, 1), (60.0, 1), (99.0, 1)]})
+            apply_deltas(conn, {1: [(99.0, -1)], 2: [(100.0, 1)]})
+            incremental = conn.execute(
+                text("SELECT category_id, n, p10, p50, p90 FROM category_price_stats")
+            ).all()
+            assert refresh_categories(conn) == 2
+            rebuilt = conn.execute(
+                text("SELECT category_id, n, p10, p50, p90 FROM category_price_stats")
+            ).all()
+            assert sorted(incremental) == sorted(rebuilt)
+
+            conn.execute(text("DELETE FROM products WHERE category_id = 2"))
+            refresh_categories(conn, [2])
+            stats = CategoryPriceStats()
+            stats.load(conn)
+        assert stats.quantiles(2) is None
+        p10, p50, p90 = stats.quantiles(1)
+        assert abs(p50 - 40.0) <= 0.4 and p10 < p50 <= p90
+
+    def test_score_price_relative_to_category(self, monkeypatch):
+        """Test price scores follow the category's quantiles when known"""
+        stats = CategoryPriceStats()
+        stats._quantiles = {}
+        monkeypatch.setattr("app.services.scoring.categories.lookup", lambda name: 7)
+        monkeypatch.setattr("app.services.scoring.price_stats", stats)
+        scorer = ItemScorer()
+        assert scorer._score_price(100.0, "Shoes") == 0.8  # $0-500 fallback
+        stats._quantiles = {7: (50.0, 100.0, 300.0)}
+        assert scorer._score_price(100.0, "Shoes") == 0.5
+        assert scorer._score_price(40.0, "Shoes") == 1.0
+        assert scorer._score_price(200.0, "Shoes") == 0.25
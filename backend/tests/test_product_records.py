@@ -0,0 +1,51 @@
+"""
+Tests for the ProductRecord read model
+"""
+
+import pickle
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, Product
+from app.services.product_records import ProductRecord, query_records
+
+
+class TestProductRecords:
+    """Test column-only loading and cheap pickling"""
+
+    def test_query_records(self, tmp_path):
+        """Test records carry the hot-path fields and honour filters/order/limit"""
+        engine = create_engine(f"sqlite:///{tmp_path}/records.db")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            for i, price in enumerate([30.0, 10.0, 20.0]):
+                db.add(
+                    Product(
+                        brand="Everlane",
+                        name=f"Tee {i}",
+                        category="Top",
+                        price=price,
+                        colors=["white"],
+                        description="not loaded",
+                    )
+                )
+            db.commit()
+            records = query_records(
+                db, Product.price > 15, order_by=Product.price, limit=5
+            )
+        finally:
+            db.close()
+        assert [r.price for r in records] == [20.0, 30.0]
+        assert records[0].colors == ["white"] and records[0].brand == "Everlane"
+        assert not hasattr(records[0], "__dict__")
+        assert not hasattr(records[0], "description")
+
+    def test_pickle_roundtrip(self):
+        """Test records pickle as plain tuples"""
+        record = ProductRecord(1, "COS", 2, "Coat", "Outerwear", 3, 190.0, ["black"])
+        restored = pickle.loads(pickle.dumps(record))
+        assert [getattr(restored, f) for f in ProductRecord.__slots__] == [
+            getattr(record, f) for f in ProductRecord.__slots__
+        ]
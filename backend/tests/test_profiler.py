@@ -0,0 +1,127 @@
+"""
+Tests for the opt-in sampling profiler
+"""
+
+import asyncio
+import contextvars
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.profiler import SamplingProfiler, collapse_stack
+
+
+def _spin(seconds: float):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        sum(range(1000))
+
+
+def _spin_capsule(seconds: float):
+    _spin(seconds)
+
+
+def _spin_analyze(seconds: float):
+    _spin(seconds)
+
+
+def _busy_handler(profiler: SamplingProfiler, seconds: float):
+    token = profiler.start("/api/generate-capsule")
+    try:
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            sum(range(1000))
+    finally:
+        profiler.stop(token)
+
+
+class TestSamplingProfiler:
+    """Test sampling, aggregation and collapsed-stack output"""
+
+    def test_collapse_stack_root_first(self):
+        """Test stacks are rendered outermost frame first"""
+        stack = collapse_stack(sys._getframe())
+        assert stack.endswith("test_profiler.py:test_collapse_stack_root_first")
+
+    def test_should_profile_respects_routes_and_rate(self):
+        """Test route filter and zero rate"""
+        profiler = SamplingProfiler(sample_rate=1.0, routes=["/api/analyze-item"])
+        assert profiler.should_profile("/api/analyze-item")
+        assert not profiler.should_profile("/api/products")
+        profiler.configure(sample_rate=0.0)
+        assert not profiler.should_profile("/api/analyze-item")
+
+    def test_samples_aggregated_and_flushed(self, tmp_path):
+        """Test a profiled thread's stacks end up in a .folded file"""
+        profiler = SamplingProfiler(
+            sample_rate=1.0,
+            routes=["/api/generate-capsule"],
+            interval_ms=1.0,
+            output_dir=str(tmp_path),
+        )
+        worker = threading.Thread(target=_busy_handler, args=(profiler, 0.2))
+        worker.start()
+        worker.join()
+
+        assert profiler.status()["samples"]["/api/generate-capsule"] > 0
+        (path,) = profiler.flush()
+        lines = open(path).read().splitlines()
+        assert any("test_profiler.py:_busy_handler" in line for line in lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) >= 1
+
+    def test_concurrent_async_requests_credited_separately(self):
+        """Test requests sharing the event loop keep their own routes"""
+        profiler = SamplingProfiler(sample_rate=1.0, interval_ms=1.0)
+
+        async def request(route, work, delay):
+            token = profiler.start(route)
+            try:
+                await asyncio.sleep(delay)
+                # Work in a gathered subtask still counts for this request
+                await asyncio.gather(asyncio.sleep(0), _run(work))
+            finally:
+                profiler.stop(token)
+
+        async def _run(work):
+            work(0.15)
+
+        async def main():
+            await asyncio.gather(
+                request("/api/generate-capsule", _spin_capsule, 0.0),
+                request("/api/analyze-item", _spin_analyze, 0.05),
+            )
+
+        asyncio.run(main())
+        capsule = profiler.stacks["/api/generate-capsule"]
+        analyze = profiler.stacks["/api/analyze-item"]
+        assert any("_spin_capsule" in stack for stack in capsule)
+        assert any("_spin_analyze" in stack for stack in analyze)
+        assert not any("_spin_analyze" in stack for stack in capsule)
+        assert not any("_spin_capsule" in stack for stack in analyze)
+
+    def test_worker_threads_attach_to_request(self):
+        """Test executor work inside the request's context is sampled"""
+        profiler = SamplingProfiler(sample_rate=1.0, interval_ms=1.0)
+        executor = ThreadPoolExecutor(max_workers=1)
+
+        def slot():
+            with profiler.attach():
+                _spin_capsule(0.15)
+
+        async def main():
+            token = profiler.start("/api/generate-capsule")
+            try:
+                context = contextvars.copy_context()
+                await asyncio.get_running_loop().run_in_executor(
+                    executor, context.run, slot
+                )
+            finally:
+                profiler.stop(token)
+
+        asyncio.run(main())
+        executor.submit(slot).result()  # outside a request: not sampled
+        stacks = profiler.stacks["/api/generate-capsule"]
+        assert any("_spin_capsule" in stack for stack in stacks)
+        assert not profiler._threads
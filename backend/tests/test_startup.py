@@ -0,0 +1,60 @@
+"""
+Tests for cold-start behaviour: lazy services, deferred imports, readiness
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import dependencies
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+DEFERRED = [
+    "numpy",
+    "httpx",
+    "lxml",
+    "openai",
+    "app.services.capsule_generator",
+    "app.services.item_analyzer",
+    "app.services.embeddings",
+    "app.services.ann_index",
+]
+
+
+class TestColdStart:
+    """Test importing main stays light and readiness is reported separately"""
+
+    def test_import_main_defers_heavy_modules(self, tmp_path):
+        """Test heavy libraries and services aren't imported with main"""
+        code = (
+            "import json, sys, main; "
+            f"print(json.dumps([m for m in {DEFERRED!r} if m in sys.modules]))"
+        )
+        proc = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=BACKEND,
+            env={"DATABASE_URL": f"sqlite:///{tmp_path / 'cold.db'}", "PATH": ""},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert json.loads(proc.stdout.strip().splitlines()[-1]) == []
+
+    def test_services_are_singletons(self):
+        """Test dependency providers build each service once"""
+        assert dependencies.get_capsule_generator() is (
+            dependencies.get_capsule_generator()
+        )
+        assert dependencies.get_item_analyzer() is dependencies.get_item_analyzer()
+
+    def test_ready_before_startup(self):
+        """Test readiness is 503 until the startup hooks have run"""
+        from main import app
+
+        response = TestClient(app).get("/api/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "starting"
@@ -0,0 +1,112 @@
+"""
+Tests for span tracing and OTLP/JSON export
+"""
+
+import json
+import threading
+
+import pytest
+from app.services.tracing import (
+    ExportWorker,
+    FileSpanExporter,
+    InMemorySpanExporter,
+    Tracer,
+    to_otlp_json,
+)
+
+
+class TestTracer:
+    """Test span nesting, sampling and export format"""
+
+    def test_nested_spans_exported_once_per_trace(self):
+        """Test child spans share the trace and export happens at the root"""
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(sample_rate=1.0, exporters=[exporter])
+
+        with tracer.span("root", quarter="Q1"):
+            with tracer.span("child") as child:
+                child.set_attribute("rows", 3)
+            assert exporter.traces == []
+
+        assert len(exporter.traces) == 1
+        spans = {s.name: s for s in exporter.traces[0]}
+        assert spans["child"].parent_id == spans["root"].span_id
+        assert spans["child"].trace_id == spans["root"].trace_id
+        assert spans["child"].attributes == {"rows": 3}
+
+    def test_unsampled_trace_records_nothing(self):
+        """Test children of an unsampled root don't start their own traces"""
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(sample_rate=1e-12, exporters=[exporter])
+
+        with tracer.span("root"):
+            with tracer.span("child") as child:
+                child.set_attribute("ignored", True)
+
+        assert exporter.traces == []
+
+    def test_disabled_without_exporters(self):
+        """Test tracer is a no-op when nothing would receive the spans"""
+        tracer = Tracer(sample_rate=1.0, exporters=[])
+        assert not tracer.enabled
+
+    def test_error_status(self):
+        """Test exceptions mark the span as errored"""
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(sample_rate=1.0, exporters=[exporter])
+
+        with pytest.raises(ValueError):
+            with tracer.span("root"):
+                raise ValueError("boom")
+
+        (span,) = exporter.traces[0]
+        assert span.status == 2
+        assert span.attributes["exception.type"] == "ValueError"
+
+    @pytest.mark.asyncio
+    async def test_traced_async(self):
+        """Test decorator works for coroutines"""
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(sample_rate=1.0, exporters=[exporter])
+
+        @tracer.traced("work")
+        async def work():
+            return 42
+
+        assert await work() == 42
+        assert exporter.traces[0][0].name == "work"
+
+    def test_otlp_json_shape(self):
+        """Test export document follows OTLP/JSON field names"""
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(sample_rate=1.0, exporters=[exporter])
+        with tracer.span("root", items=12, cache_hit=False):
+            pass
+
+        doc = to_otlp_json(exporter.traces[0])
+        span = doc["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+        assert len(span["traceId"]) == 32
+        assert len(span["spanId"]) == 16
+        assert "parentSpanId" not in span
+        assert int(span["endTimeUnixNano"]) >= int(span["startTimeUnixNano"])
+        assert {"key": "items", "value": {"intValue": "12"}} in span["attributes"]
+        assert {"key": "cache_hit", "value": {"boolValue": False}} in span["attributes"]
+
+    def test_file_export_off_request_path(self, tmp_path):
+        """Test the file exporter writes on the export thread, not the caller's"""
+        path = tmp_path / "traces.jsonl"
+        worker = ExportWorker()
+        gate = threading.Event()
+        worker.submit(lambda spans: gate.wait(5), [])  # keep the thread busy
+        tracer = Tracer(
+            sample_rate=1.0, exporters=[FileSpanExporter(str(path), worker)]
+        )
+
+        with tracer.span("root"):
+            pass
+        assert not path.exists()
+
+        gate.set()
+        worker.flush()
+        (line,) = path.read_text().splitlines()
+        assert json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
@@ -0,0 +1,77 @@
+"""
+Tests for the startup capsule cache warm-up
+"""
+
+import asyncio
+
+from app.models import Climate, Quarter
+from app.services.cache import capsule_cache
+from app.services.warmup import CapsuleWarmup, preset_space, preset_styles
+
+
+class RecordingGenerator:
+    """Generator stand-in that records calls and peak concurrency"""
+
+    templates = {"Q1": {}, "Q2": {}, "Q3": {}, "Q4": {}}
+
+    def __init__(self):
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+
+    def cache_key(self, quarter, climate, descriptors, budget, preferences):
+        return f"warmup-test:{quarter.value}:{climate.value}:{descriptors}:{budget}"
+
+    async def generate_encoded(self, quarter, climate, descriptors, budget, *rest):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.calls.append((quarter, climate))
+        key = self.cache_key(quarter, climate, descriptors, budget, [])
+        capsule_cache.set(key, {}, encoded=b"{}")
+        return b"{}"
+
+
+class TestCapsuleWarmup:
+    """Test preset enumeration, cache skipping and the CPU budget"""
+
+    def test_preset_space(self):
+        """Test every quarter x climate x style set is enumerated"""
+        styles = preset_styles(style_words="", top=3)
+        assert styles[1] == [
+            "minimal",
+            "clean",
+            "simple",
+            "understated",
+            "quiet luxury",
+        ]
+        presets = preset_space(["Q2", "Q1", "Q3", "Q4", "Q5"], styles)
+        assert len(presets) == 4 * len(Climate) * 3
+        assert presets[0][:2] == (Quarter.Q1, Climate.COLD)
+
+    def test_warms_once_with_capped_concurrency(self):
+        """Test presets are generated concurrently, then found in the cache"""
+        generator = RecordingGenerator()
+        presets = preset_space(["Q1", "Q2"], [["warm-test"]])
+        warmup = CapsuleWarmup()
+
+        first = asyncio.run(warmup.run(generator, presets, budget=901.0, concurrency=3))
+        assert first["state"] == "done"
+        assert first["generated"] == len(presets)
+        assert generator.peak == 3
+
+        again = asyncio.run(warmup.run(generator, presets, budget=901.0))
+        assert again["already_cached"] == len(presets)
+        assert len(generator.calls) == len(presets)
+
+    def test_cpu_budget_stops_warmup(self):
+        """Test an exhausted CPU budget skips the remaining presets"""
+        generator = RecordingGenerator()
+        presets = preset_space(["Q3"], [["budget-test"]])
+        status = asyncio.run(
+            CapsuleWarmup().run(generator, presets, budget=902.0, cpu_seconds=0)
+        )
+        assert status["state"] == "budget_exhausted"
+        assert status["skipped"] == len(presets)
+        assert generator.calls == []
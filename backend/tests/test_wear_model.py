@@ -0,0 +1,66 @@
+"""
+Tests for the cost-per-wear grid
+"""
+
+import numpy as np
+
+from app.models import Climate
+from app.services.wear_model import (
+    CATEGORY_AXIS,
+    WearModel,
+    fabric_of,
+    fit,
+    prior_grid,
+)
+
+
+class TestWearModel:
+    """Test grid lookups, the batch API, fitting and persistence"""
+
+    def test_lookup_axes(self):
+        """Test category, quality, fabric and climate all move the estimate"""
+        model = WearModel(prior_grid())
+        assert model.wears("Shoes") > model.wears("Top")
+        assert model.wears("Top", "excellent") > model.wears("Top", "poor")
+        assert model.wears("Outerwear", climate=Climate.COLD) > model.wears(
+            "Outerwear", climate="hot"
+        )
+        assert model.wears("Bottom", material="linen_viscose", climate="hot") > (
+            model.wears("Bottom", material="wool", climate="hot")
+        )
+        assert model.wears("Hat", "unknown", "mystery") == model.wears()
+        assert fabric_of("polyester_wool") == "synthetic"
+        assert fabric_of("Organic Cotton") == "cotton"
+
+    def test_batch_matches_scalar(self):
+        """Test the vectorized API agrees with per-item lookups"""
+        model = WearModel(prior_grid())
+        prices = [120.0, None, 45.0, 0.0, 80.0]
+        categories = ["Outerwear", "Top", "Top", "Shoes", "Dress"]
+        materials = ["wool", None, "organic_cotton", "leather", "silk"]
+        batch = model.cost_per_wear_batch(
+            prices, categories, "good", materials, Climate.WARM
+        )
+        expected = [
+            model.cost_per_wear(p, c, "good", m, "warm")
+            for p, c, m in zip(prices, categories, materials)
+        ]
+        assert np.isnan(batch[1]) and np.isnan(batch[3])
+        assert np.allclose(batch[[0, 2, 4]], [expected[i] for i in (0, 2, 4)])
+
+    def test_fit_and_save(self, tmp_path):
+        """Test durability reviews raise a cell, shrunk toward the prior"""
+        lasting = ["Holds up after many washes", "Very durable"]
+        model = fit([("Top", "cotton", 4.0, lasting)] * 3, prior_weight=3)
+        prior = prior_grid()
+        top = CATEGORY_AXIS.index("top")
+        ratio = model.grid[top, 2, 0] / prior[top, 2, 0]
+        assert np.allclose(ratio, 1.25)  # signal 1.5, 3 products vs 3 pseudo
+        assert np.allclose(model.grid[top, 3], prior[top, 3])
+
+        path = str(tmp_path / "wear_model.npz")
+        model.save(path)
+        loaded = WearModel.load(path)
+        assert np.array_equal(loaded.grid, model.grid)
+        assert loaded.fitted_at == model.fitted_at
+        assert np.array_equal(WearModel.load(str(tmp_path / "missing")).grid, prior)
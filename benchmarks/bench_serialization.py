@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: JSON response encoding for capsules and product pages.
+
+Compares FastAPI's default path (validate -> jsonable_encoder -> stdlib json)
+with the orjson response class and the pre-encoded bytes served on capsule
+cache hits.
+Run from repo root: python benchmarks/bench_serialization.py
+"""
+
+import json
+import sys
+import timeit
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND = REPO_ROOT / "backend"
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
+
+from fastapi.encoders import jsonable_encoder
+
+from app.models import CapsuleItem, CapsuleResponse, ItemOption
+from app.responses import ORJSONResponse, PreEncodedJSONResponse, dumps
+
+COLORS = ["black", "navy", "cream", "camel", "gray", "burgundy"]
+
+
+def make_capsule(n_items: int = 12) -> CapsuleResponse:
+    """Synthetic capsule shaped like a real /api/generate-capsule response"""
+    items = [
+        CapsuleItem(
+            category=f"Slot {i}",
+            item_name=f"Slot {i}",
+            best_value=ItemOption(
+                brand="Everlane",
+                name=f"Value item {i}",
+                price=40.0 + i,
+                link="https://www.everlane.com",
+                image_url=f"https://images.example.com/value-{i}.jpg",
+                reason="Great quality-to-price ratio",
+            ),
+            best_quality=ItemOption(
+                brand="Aritzia",
+                name=f"Quality item {i}",
+                price=120.0 + i,
+                link="https://www.aritzia.com",
+                image_url=f"https://images.example.com/quality-{i}.jpg",
+                reason="Premium materials and construction",
+            ),
+            palette_colors=COLORS[:3],
+        )
+        for i in range(n_items)
+    ]
+    return CapsuleResponse(
+        quarter="Q1",
+        palette=COLORS,
+        outfit_formulas=["Slot 0 + Slot 1 + Slot 2", "Slot 3 + Slot 4 + Slot 5"],
+        items=items,
+        do_not_buy=[],
+        coherence_scores={
+            "palette_score": 0.9,
+            "versatility_score": 0.4,
+            "overlap_score": 1.0,
+            "total_score": 0.77,
+        },
+    )
+
+
+def make_product_page(n_products: int = 500) -> dict:
+    """Synthetic /api/products page"""
+    return {
+        "products": [
+            {
+                "id": i,
+                "brand": "Everlane",
+                "name": f"Product {i}",
+                "category": "Top",
+                "price": 20.0 + i % 200,
+                "description": "Classic crew neck t-shirt in organic cotton",
+                "colors": COLORS[: 1 + i % 5],
+                "image_url": f"https://images.example.com/{i}.jpg",
+                "link": "https://www.everlane.com",
+            }
+            for i in range(n_products)
+        ],
+        "total": n_products,
+        "limit": n_products,
+        "offset": 0,
+    }
+
+
+def _stdlib_body(content) -> bytes:
+    # Mirrors starlette.responses.JSONResponse.render
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def bench(label: str, fn, number: int) -> dict:
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    per_call_us = best / number * 1e6
+    print(f"  {label:<48} {per_call_us:>10.1f} us/op")
+    return {"label": label, "us_per_op": per_call_us}
+
+
+def main():
+    capsule = make_capsule()
+    capsule_dict = capsule.model_dump()
+    capsule_body = dumps(capsule)
+    page = make_product_page()
+
+    print("Capsule (12 items)")
+    bench(
+        "default: validate + jsonable_encoder + json",
+        lambda: _stdlib_body(
+            jsonable_encoder(CapsuleResponse.model_validate(capsule_dict))
+        ),
+        2000,
+    )
+    bench(
+        "orjson: model_dump + orjson",
+        lambda: ORJSONResponse(capsule.model_dump()).body,
+        2000,
+    )
+    bench(
+        "cache hit: pre-encoded bytes",
+        lambda: PreEncodedJSONResponse(capsule_body).body,
+        2000,
+    )
+
+    print("\nProduct page (500 products)")
+    bench(
+        "default: jsonable_encoder + json",
+        lambda: _stdlib_body(jsonable_encoder(page)),
+        100,
+    )
+    bench("orjson response", lambda: ORJSONResponse(page).body, 100)
+
+
+if __name__ == "__main__":
+    main()
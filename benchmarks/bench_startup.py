@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: `import main` cost (python -X importtime) and time to ready.
+
+Each run is a fresh interpreter, so module caches don't hide import work. Prints
+the median import time, the slowest modules by cumulative time, and the time
+the startup hooks take (against a scratch SQLite database, warm-up disabled).
+Run from repo root: python benchmarks/bench_startup.py [--runs 5] [--max-ms 600]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND = REPO_ROOT / "backend"
+
+STARTUP_SNIPPET = """
+import asyncio, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+asyncio.run(main.app.router.startup())
+print(f"{(imported - start) * 1000:.1f} {(time.perf_counter() - imported) * 1000:.1f}")
+"""
+
+
+def _env(db_path: str) -> dict:
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=f"sqlite:///{db_path}",
+        WARMUP_ENABLED="false",
+        ANN_INDEX_DIR=str(Path(db_path).parent / "no_ann_index"),
+    )
+    return env
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Map module -> cumulative microseconds from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = int(cumulative_us)
+    return modules
+
+
+def measure_import(env: dict) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def measure_startup(env: dict) -> tuple:
+    proc = subprocess.run(
+        [sys.executable, "-c", STARTUP_SNIPPET],
+        cwd=BACKEND,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_ms, startup_ms = proc.stdout.strip().splitlines()[-1].split()
+    return float(import_ms), float(startup_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest modules shown")
+    parser.add_argument(
+        "--max-ms", type=float, default=None, help="fail if median import exceeds"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(os.path.join(tmp, "bench.db"))
+        imports, timings = [], []
+        for _ in range(args.runs):
+            imports.append(measure_import(env))
+            timings.append(measure_startup(env))
+
+    totals = [run["main"] / 1000 for run in imports]
+    median_import = statistics.median(totals)
+    print(f"import main (-X importtime), {args.runs} runs")
+    print(
+        f"  median {median_import:>8.1f} ms   min {min(totals):.1f}   max {max(totals):.1f}"
+    )
+
+    print(f"\nSlowest modules by cumulative time (last run, top {args.top})")
+    last = imports[-1]
+    top_level = {name: us for name, us in last.items() if "." not in name}
+    app_modules = {name: us for name, us in last.items() if name.startswith("app.")}
+    ranked = sorted({**top_level, **app_modules}.items(), key=lambda kv: -kv[1])
+    for name, us in ranked[: args.top]:
+        print(f"  {name:<40} {us / 1000:>8.1f} ms")
+
+    print("\nWall clock (fresh interpreter)")
+    print(f"  import main        {statistics.median(t[0] for t in timings):>8.1f} ms")
+    print(f"  startup hooks      {statistics.median(t[1] for t in timings):>8.1f} ms")
+
+    if args.max_ms is not None and median_import > args.max_ms:
+        print(f"\nFAIL: median import {median_import:.1f} ms > {args.max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
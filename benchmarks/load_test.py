@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Open-loop HTTP load test against a running (or spawned) uvicorn server.
+
+Replays a weighted mix of endpoints at a target request rate (Poisson arrivals,
+so a slow server builds a queue instead of slowing the client down):
+  capsule   POST /api/generate-capsule, keys drawn Zipf-distributed from a preset
+            pool, so a few popular capsules dominate as in real traffic
+  analyze   POST /api/analyze-item with synthetic descriptions/prices/brands
+  products  GET /api/products pages, revalidated with If-None-Match like a browser
+  closet    POST /api/closet/upload of 20-100 items for one of many users
+
+Reports p50/p95/p99 latency, throughput, error rate and cache hit rate per
+endpoint (capsule: server cache counters from /api/metrics; products: 304s),
+plus CPU and RSS of the server process tree sampled from /proc.
+
+Run from repo root:
+  python benchmarks/load_test.py --spawn --rps 50 --duration 30
+  python benchmarks/load_test.py --url http://127.0.0.1:8000 --pid <uvicorn pid>
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from synthetic import BRANDS, CATEGORIES, make_closet
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND = REPO_ROOT / "backend"
+
+DEFAULT_MIX = "capsule=4,analyze=3,products=4,closet=1"
+QUARTERS = ["Q1", "Q2", "Q3", "Q4"]
+CLIMATES = ["cold", "moderate", "warm", "hot"]
+STYLE_WORDS = [
+    "relaxed, minimal, French",
+    "classic elevated",
+    "effortless",
+    "cozy neutral",
+    "edgy bold",
+    "romantic",
+    "sporty casual",
+    "professional polished",
+    "coastal relaxed",
+    "streetwear",
+]
+BUDGETS = [500, 800, 1000, 1500, 2500]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class EndpointStats:
+    """Latencies and outcomes for one endpoint"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.hits = 0
+        self.status: Dict[int, int] = {}
+
+    def record(self, latency: float, status: Optional[int], hit: bool = False):
+        self.latencies.append(latency)
+        if status is not None:
+            self.status[status] = self.status.get(status, 0) + 1
+        if status is None or status >= 400:
+            self.errors += 1
+        if hit:
+            self.hits += 1
+
+    def summary(self, elapsed: float) -> dict:
+        values = sorted(self.latencies)
+        count = len(values)
+        return {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+            "status": {str(k): v for k, v in sorted(self.status.items())},
+        }
+
+
+class Workload:
+    """Request generators for each endpoint in the mix"""
+
+    def __init__(self, seed: int, capsule_keys: int, zipf_s: float, pages: int):
+        self.rng = random.Random(seed)
+        pool = [
+            {
+                "quarter": q,
+                "climate": c,
+                "style_three_words": s,
+                "budget": b,
+                "shopping_preferences": [],
+            }
+            for q in QUARTERS
+            for c in CLIMATES
+            for s in STYLE_WORDS
+            for b in BUDGETS
+        ]
+        self.rng.shuffle(pool)
+        self.capsules = pool[:capsule_keys]
+        weights = [1.0 / (rank**zipf_s) for rank in range(1, len(self.capsules) + 1)]
+        total = sum(weights)
+        self.capsule_cdf = []
+        acc = 0.0
+        for w in weights:
+            acc += w / total
+            self.capsule_cdf.append(acc)
+        self.pages = pages
+        self.etags: Dict[str, str] = {}
+
+    def _capsule_payload(self) -> dict:
+        u = self.rng.random()
+        lo, hi = 0, len(self.capsule_cdf) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.capsule_cdf[mid] < u:
+                lo = mid + 1
+            else:
+                hi = mid
+        return self.capsules[lo]
+
+    async def capsule(self, client: httpx.AsyncClient):
+        response = await client.post(
+            "/api/generate-capsule", json=self._capsule_payload()
+        )
+        return response.status_code, False
+
+    async def analyze(self, client: httpx.AsyncClient):
+        category, nouns, (low, high) = self.rng.choice(CATEGORIES)
+        payload = {
+            "product_description": f"{self.rng.choice(nouns)} ({category.lower()})",
+            "price": round(self.rng.uniform(low, high), 2),
+            "brand": self.rng.choice(BRANDS),
+        }
+        response = await client.post("/api/analyze-item", json=payload)
+        return response.status_code, False
+
+    async def products(self, client: httpx.AsyncClient):
+        page = min(int(self.rng.expovariate(1 / 3)), self.pages - 1)
+        category = self.rng.choice([None, None, *[c for c, _, _ in CATEGORIES]])
+        url = f"/api/products?limit=100&offset={page * 100}"
+        if category:
+            url += f"&category={category}"
+        headers = {}
+        if url in self.etags:
+            headers["If-None-Match"] = self.etags[url]
+        response = await client.get(url, headers=headers)
+        if "etag" in response.headers:
+            self.etags[url] = response.headers["etag"]
+        return response.status_code, response.status_code == 304
+
+    async def closet(self, client: httpx.AsyncClient):
+        items = make_closet(self.rng.randint(20, 100), seed=self.rng.randint(0, 1000))
+        user_id = self.rng.randint(1, 1000)
+        response = await client.post(
+            f"/api/closet/upload?user_id={user_id}", json=items
+        )
+        return response.status_code, False
+
+
+class ProcessSampler:
+    """CPU% and RSS of a process and its children, sampled from /proc"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[dict] = []
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _tree(self, pid: int) -> List[int]:
+        pids = [pid]
+        try:
+            children = Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+        except OSError:
+            return pids
+        for child in children:
+            pids.extend(self._tree(int(child)))
+        return pids
+
+    def _read(self):
+        cpu_ticks, rss = 0, 0
+        for pid in self._tree(self.pid):
+            try:
+                stat = Path(f"/proc/{pid}/stat").read_text()
+                fields = stat[stat.rindex(")") + 2 :].split()
+                cpu_ticks += int(fields[11]) + int(fields[12])  # utime + stime
+                rss += int(fields[21]) * self._page
+            except (OSError, ValueError, IndexError):
+                continue
+        return cpu_ticks / self._ticks, rss
+
+    async def run(self, stop: asyncio.Event):
+        if self.pid is None or not Path(f"/proc/{self.pid}").exists():
+            return
+        last_cpu, _ = self._read()
+        last_t = time.monotonic()
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            cpu, rss = self._read()
+            now = time.monotonic()
+            self.samples.append(
+                {"cpu_pct": 100 * (cpu - last_cpu) / (now - last_t), "rss": rss}
+            )
+            last_cpu, last_t = cpu, now
+
+    def summary(self) -> Optional[dict]:
+        if not self.samples:
+            return None
+        cpu = [s["cpu_pct"] for s in self.samples]
+        rss = [s["rss"] for s in self.samples]
+        return {
+            "pid": self.pid,
+            "cpu_pct_mean": round(sum(cpu) / len(cpu), 1),
+            "cpu_pct_max": round(max(cpu), 1),
+            "rss_mb_start": round(rss[0] / 2**20, 1),
+            "rss_mb_peak": round(max(rss) / 2**20, 1),
+            "rss_mb_end": round(rss[-1] / 2**20, 1),
+        }
+
+
+async def cache_counters(client: httpx.AsyncClient) -> Dict[str, float]:
+    """Server-side capsule cache hits/misses (per worker) from /api/metrics"""
+    try:
+        text = (await client.get("/api/metrics")).text
+    except httpx.HTTPError:
+        return {}
+    counters = {}
+    for kind in ("hits", "misses"):
+        match = re.search(
+            rf'capsuleos_cache_{kind}_total{{cache="capsule"}} ([0-9.]+)', text
+        )
+        if match:
+            counters[kind] = float(match.group(1))
+    return counters
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"capsule", "analyze", "products", "closet"}
+    if unknown:
+        raise SystemExit(f"unknown endpoints in --mix: {sorted(unknown)}")
+    return mix
+
+
+async def run_load(args, pid: Optional[int]) -> dict:
+    mix = parse_mix(args.mix)
+    workload = Workload(args.seed, args.capsule_keys, args.zipf, args.pages)
+    stats = {name: EndpointStats() for name in mix}
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    rng = random.Random(args.seed + 1)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    in_flight = set()
+    dropped = 0
+
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=timeout
+    ) as client:
+        before = await cache_counters(client)
+        sampler = ProcessSampler(pid)
+        stop = asyncio.Event()
+        sampler_task = asyncio.create_task(sampler.run(stop))
+
+        async def fire(name: str):
+            start = time.perf_counter()
+            try:
+                status, hit = await getattr(workload, name)(client)
+            except httpx.HTTPError:
+                status, hit = None, False
+            stats[name].record(time.perf_counter() - start, status, hit)
+
+        start = time.monotonic()
+        next_at = start
+        while True:
+            next_at += rng.expovariate(args.rps)
+            if next_at - start >= args.duration:
+                break
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+            if len(in_flight) >= args.concurrency:
+                dropped += 1  # client saturated: the server isn't keeping up
+                continue
+            task = asyncio.create_task(fire(rng.choices(names, weights)[0]))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.wait(in_flight)
+        elapsed = time.monotonic() - start
+        stop.set()
+        await sampler_task
+        after = await cache_counters(client)
+
+    report = {name: s.summary(elapsed) for name, s in stats.items()}
+    if "capsule" in report and before and after:
+        hits = after.get("hits", 0) - before.get("hits", 0)
+        lookups = hits + after.get("misses", 0) - before.get("misses", 0)
+        report["capsule"]["cache_hit_rate"] = (
+            round(hits / lookups, 4) if lookups else None
+        )
+    if "products" in report:
+        s = stats["products"]
+        report["products"]["cache_hit_rate"] = (
+            round(s.hits / len(s.latencies), 4) if s.latencies else None
+        )
+    total = sum(len(s.latencies) for s in stats.values())
+    return {
+        "config": {
+            "url": args.url,
+            "target_rps": args.rps,
+            "duration_s": args.duration,
+            "mix": mix,
+            "capsule_keys": args.capsule_keys,
+            "zipf_s": args.zipf,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "achieved_rps": round(total / elapsed, 2),
+        "dropped": dropped,
+        "endpoints": report,
+        "server": sampler.summary(),
+    }
+
+
+def spawn_server(port: int, workers: int, db_path: Optional[str]):
+    """Start uvicorn on a copy of the database; returns (process, scratch dir, url)"""
+    scratch = tempfile.mkdtemp(prefix="capsuleos-load-")
+    target = os.path.join(scratch, "load.db")
+    if db_path:
+        shutil.copy(db_path, target)
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{target}")
+    log = open(os.path.join(scratch, "server.log"), "w")
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=BACKEND,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    log.close()
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn exited during startup, see {scratch}/server.log")
+        try:
+            if httpx.get(f"{url}/api/ready", timeout=1).status_code == 200:
+                return proc, scratch, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("uvicorn did not become ready within 30s")
+
+
+def print_report(result: dict):
+    print(
+        f"\n{result['achieved_rps']} req/s achieved "
+        f"(target {result['config']['target_rps']}), "
+        f"{result['dropped']} dropped, {result['elapsed_s']}s"
+    )
+    header = f"{'endpoint':<10} {'reqs':>6} {'rps':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'hit%':>6}"
+    print(header)
+    for name, s in result["endpoints"].items():
+        hit = s.get("cache_hit_rate")
+        hit_text = f"{hit * 100:>5.1f}" if hit is not None else f"{'-':>5}"
+        print(
+            f"{name:<10} {s['requests']:>6} {s['throughput_rps']:>7.1f} "
+            f"{s['error_rate'] * 100:>5.1f} {s['p50_ms']:>7.1f}ms {s['p95_ms']:>6.1f}ms "
+            f"{s['p99_ms']:>6.1f}ms {hit_text}"
+        )
+    server = result["server"]
+    if server:
+        print(
+            f"server pid {server['pid']}: CPU mean {server['cpu_pct_mean']}% "
+            f"(max {server['cpu_pct_max']}%), RSS {server['rss_mb_start']} -> "
+            f"{server['rss_mb_end']} MB (peak {server['rss_mb_peak']})"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CapsuleOS HTTP load test")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--pid", type=int, help="server PID for CPU/RSS sampling")
+    parser.add_argument(
+        "--spawn", action="store_true", help="start uvicorn for the run"
+    )
+    parser.add_argument("--port", type=int, default=8765, help="port for --spawn")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="uvicorn workers for --spawn"
+    )
+    parser.add_argument(
+        "--db",
+        default=str(BACKEND / "capsuleos.db"),
+        help="database copied for --spawn (empty string: fresh database)",
+    )
+    parser.add_argument("--rps", type=float, default=50.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--capsule-keys", type=int, default=200)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--pages", type=int, default=10, help="product pages in play")
+    parser.add_argument("--concurrency", type=int, default=64, help="max in flight")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args()
+
+    proc = scratch = None
+    pid = args.pid
+    if args.spawn:
+        db = args.db if args.db and os.path.exists(args.db) else None
+        proc, scratch, args.url = spawn_server(args.port, args.workers, db)
+        pid = proc.pid
+    try:
+        result = asyncio.run(run_load(args, pid))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    print_report(result)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(result, indent=2))
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
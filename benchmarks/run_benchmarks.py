@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Hot-path benchmark suite over synthetic catalogs, with baseline comparison.
+
+For each catalog size, a fresh interpreter seeds a scratch SQLite database with
+synthetic products, reviews and a closet, then measures:
+  seed_db.products / seed_db.reviews   seeding throughput (scripts/seed_db.py)
+  capsule.generate.cold / .cached      CapsuleGenerator.generate, cache cleared vs hit
+  analyze.item                         ItemAnalyzer.analyze (description + price)
+  reviews.signals                      ReviewAnalyzer signal extraction, 1k reviews
+  products.list@offset                 list_products pages at shallow and deep offsets
+  closet.upload_10k                    upload_closet with 10k items
+
+Results are written as JSON and compared against a stored baseline; metrics more
+than --tolerance worse than the baseline are reported as regressions.
+Run from repo root: python benchmarks/run_benchmarks.py [--sizes 1k,100k,1M]
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND = REPO_ROOT / "backend"
+BENCHMARKS = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCHMARKS / "baseline.json"
+DEFAULT_OUTPUT = BENCHMARKS / "results" / "latest.json"
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+# Reviews are generated for the first products only (per-product corpus size is
+# what the analyzers see; total corpus size only changes seeding time)
+REVIEW_PRODUCTS = 20_000
+REVIEWS_PER_PRODUCT = 3
+CLOSET_ITEMS = 10_000
+
+
+def timing(samples_s):
+    """Timing metric (lower is better) from per-run durations in seconds"""
+    samples_ms = sorted(s * 1000 for s in samples_s)
+    p95_index = min(len(samples_ms) - 1, int(round(0.95 * (len(samples_ms) - 1))))
+    return {
+        "value": round(statistics.median(samples_ms), 3),
+        "unit": "ms",
+        "better": "lower",
+        "min_ms": round(samples_ms[0], 3),
+        "p95_ms": round(samples_ms[p95_index], 3),
+        "runs": len(samples_ms),
+    }
+
+
+def throughput(rows, seconds):
+    """Throughput metric (higher is better)"""
+    return {
+        "value": round(rows / seconds, 1),
+        "unit": "rows/s",
+        "better": "higher",
+        "rows": rows,
+        "seconds": round(seconds, 3),
+    }
+
+
+def measure(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return timing(samples)
+
+
+# --- Worker (runs inside a fresh interpreter bound to a scratch database) ---
+
+
+def run_worker(n: int, repeat: int) -> dict:
+    sys.path.insert(0, str(BACKEND))
+    sys.path.insert(0, str(BACKEND / "scripts"))
+    from loguru import logger
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    from starlette.requests import Request
+
+    from app.database import Review, SessionLocal, init_db
+    from app.models import Climate, Quarter
+    from app.routers.closet import upload_closet
+    from app.routers.products import list_products
+    from app.services.cache import capsule_cache
+    from app.services.capsule_generator import CapsuleGenerator
+    from app.services.item_analyzer import ItemAnalyzer
+    from app.services.review_analyzer import ReviewAnalyzer
+    from seed_db import seed_products, seed_reviews
+    from synthetic import make_closet, make_products, make_reviews
+
+    results = {}
+    init_db()
+    db = SessionLocal()
+    try:
+        products = make_products(n)
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            seed_products(db, products)
+        results["seed_db.products"] = throughput(n, time.perf_counter() - start)
+        del products
+
+        reviews = make_reviews(min(n, REVIEW_PRODUCTS), REVIEWS_PER_PRODUCT)
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            seed_reviews(db, reviews)
+        results["seed_db.reviews"] = throughput(
+            len(reviews), time.perf_counter() - start
+        )
+        del reviews
+    finally:
+        db.close()
+
+    generator = CapsuleGenerator()
+    capsule_args = (Quarter.Q1, Climate.COLD, ["minimal", "classic"], 1200.0, [], [])
+
+    def capsule_cold():
+        capsule_cache.clear()
+        asyncio.run(generator.generate(*capsule_args))
+
+    results["capsule.generate.cold"] = measure(capsule_cold, repeat)
+    results["capsule.generate.cached"] = measure(
+        lambda: asyncio.run(generator.generate(*capsule_args)), repeat * 20
+    )
+
+    analyzer = ItemAnalyzer()
+    results["analyze.item"] = measure(
+        lambda: asyncio.run(
+            analyzer.analyze(
+                product_link=None,
+                product_description="Relaxed linen shirt",
+                price=78.0,
+                brand="Everlane",
+            )
+        ),
+        repeat * 4,
+    )
+
+    db = SessionLocal()
+    try:
+        corpus = db.query(Review).limit(1000).all()
+    finally:
+        db.close()
+    review_analyzer = ReviewAnalyzer()
+
+    def review_signals():
+        review_analyzer._extract_fit_signals(corpus)
+        review_analyzer._extract_quality_signals(corpus)
+        review_analyzer._compute_sentiment(corpus)
+
+    results["reviews.signals"] = measure(review_signals, repeat * 4)
+
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    for label, offset in (("0", 0), ("mid", n // 2), ("end", max(0, n - 100))):
+        results[f"products.list@{label}"] = measure(
+            lambda offset=offset: list_products(
+                request, category=None, limit=100, offset=offset
+            ),
+            repeat * 4,
+        )
+
+    closet = make_closet(CLOSET_ITEMS)
+
+    def closet_upload():
+        db = SessionLocal()
+        try:
+            asyncio.run(upload_closet(closet, user_id=1, db=db))
+        finally:
+            db.close()
+
+    results["closet.upload_10k"] = measure(closet_upload, repeat)
+    return results
+
+
+def run_size(label: str, repeat: int) -> dict:
+    """Benchmark one catalog size in a subprocess with its own database"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        for key in ("LLM_PROVIDER", "EMBEDDING_MODEL"):
+            env.pop(key, None)
+        env.update(
+            DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+            EMBEDDING_INDEX_DIR=f"{tmp}/embeddings",
+            EMBEDDING_STORE_PATH=f"{tmp}/vector_store.sqlite",
+            ANN_INDEX_DIR=f"{tmp}/ann_index",
+            WARMUP_ENABLED="false",
+        )
+        proc = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--worker",
+                str(SIZES[label]),
+                "--repeat",
+                str(repeat),
+            ],
+            cwd=BACKEND,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{label} benchmark failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(
+    current: dict, baseline: dict, tolerance: float, min_delta_ms: float = 0.5
+) -> list:
+    """Print current vs baseline per metric; return regressed metric names.
+    Timings must also move by at least min_delta_ms (sub-ms jitter is noise)."""
+    regressions = []
+    print(f"\n{'metric':<40} {'baseline':>12} {'current':>12} {'change':>9}")
+    for size, metrics in current["sizes"].items():
+        base_metrics = baseline.get("sizes", {}).get(size, {})
+        for name, metric in metrics.items():
+            key = f"{size}/{name}"
+            base = base_metrics.get(name)
+            if base is None or not base["value"]:
+                print(f"{key:<40} {'-':>12} {metric['value']:>12.3f}")
+                continue
+            change = metric["value"] / base["value"] - 1
+            worse = -change if metric["better"] == "higher" else change
+            if (
+                metric["unit"] == "ms"
+                and abs(metric["value"] - base["value"]) < min_delta_ms
+            ):
+                worse = 0.0
+            flag = ""
+            if worse > tolerance:
+                flag = "  REGRESSION"
+                regressions.append(key)
+            elif worse < -tolerance:
+                flag = "  improved"
+            print(
+                f"{key:<40} {base['value']:>12.3f} {metric['value']:>12.3f} "
+                f"{change:>+8.1%}{flag}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CapsuleOS hot-path benchmarks")
+    parser.add_argument("--sizes", default="1k,100k", help=f"any of {list(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=0.5)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.repeat)))
+        return 0
+
+    labels = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in labels if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes {unknown}; choose from {list(SIZES)}")
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    current = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "sizes": {},
+    }
+    for label in labels:
+        print(f"Benchmarking {label} catalog...", flush=True)
+        current["sizes"][label] = run_size(label, args.repeat)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(current, indent=2))
+    print(f"Results written to {args.output}")
+
+    regressions = []
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        print(f"Compared with baseline from {baseline['meta'].get('commit')}")
+        regressions = compare(current, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+    else:
+        print(f"No baseline at {args.baseline}")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(current, indent=2))
+        print(f"Baseline updated: {args.baseline}")
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
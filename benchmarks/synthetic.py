@@ -0,0 +1,121 @@
+"""
+Deterministic synthetic data for benchmarks: catalogs, review corpora, closets.
+
+Rows use the same shape as data/sample_products.json / sample_reviews.json, so
+they go through the real seeding code (backend/scripts/seed_db.py).
+"""
+
+import random
+from typing import Any, Dict, List
+
+BRANDS = [
+    "Everlane",
+    "Aritzia",
+    "COS",
+    "Uniqlo",
+    "Madewell",
+    "J.Crew",
+    "Reformation",
+    "Vince",
+    "Theory",
+    "& Other Stories",
+    "Arket",
+    "Quince",
+]
+COLORS = [
+    "black",
+    "white",
+    "navy",
+    "cream",
+    "camel",
+    "gray",
+    "olive",
+    "burgundy",
+    "tan",
+    "denim blue",
+]
+MATERIALS = ["organic_cotton", "linen", "wool", "cashmere", "silk", "denim", "leather"]
+FITS = ["relaxed", "slim", "regular", "oversized"]
+
+# (category, product nouns, typical price range)
+CATEGORIES = [
+    ("Top", ["Crew Tee", "Oxford Shirt", "Turtleneck", "Tank", "Sweater"], (18, 160)),
+    ("Bottom", ["Straight Jean", "Wide Trouser", "Chino", "Midi Skirt"], (40, 220)),
+    ("Outerwear", ["Trench Coat", "Wool Coat", "Blazer", "Denim Jacket"], (90, 600)),
+    ("Shoes", ["Loafer", "Ankle Boot", "Sneaker", "Sandal"], (50, 350)),
+    ("Dress", ["Slip Dress", "Shirt Dress", "Knit Dress"], (60, 300)),
+    ("Accessory", ["Leather Belt", "Tote Bag", "Wool Scarf", "Sunglasses"], (20, 250)),
+]
+
+REVIEW_PHRASES = [
+    "True to size and the fabric feels great.",
+    "Runs small, I had to size up.",
+    "A bit loose in the shoulders, runs large.",
+    "Started pilling after a few washes.",
+    "Slightly see through in daylight.",
+    "Shrunk in the wash, disappointed.",
+    "Very durable, well-made and lasts for years.",
+    "Perfect fit and beautiful color.",
+    "Quality is fine for the price.",
+]
+
+
+def make_products(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """n catalog rows with ids 1..n"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, n + 1):
+        category, nouns, (low, high) = CATEGORIES[i % len(CATEGORIES)]
+        brand = rng.choice(BRANDS)
+        material = rng.choice(MATERIALS)
+        noun = rng.choice(nouns)
+        rows.append(
+            {
+                "id": i,
+                "brand": brand,
+                "name": f"The {material.replace('_', ' ').title()} {noun} {i}",
+                "category": category,
+                "price": round(rng.uniform(low, high), 2),
+                "description": f"{rng.choice(FITS).title()} {noun.lower()} in {material.replace('_', ' ')}",
+                "colors": rng.sample(COLORS, rng.randint(1, 4)),
+                "image_url": f"https://images.example.com/{i}.jpg",
+                "link": f"https://shop.example/{brand.lower().replace(' ', '-')}/{i}",
+                "metadata": {"material": material, "fit": rng.choice(FITS)},
+            }
+        )
+    return rows
+
+
+def make_reviews(
+    n_products: int, per_product: int = 3, seed: int = 0
+) -> List[Dict[str, Any]]:
+    """per_product reviews for each of products 1..n_products"""
+    rng = random.Random(seed + 1)
+    return [
+        {
+            "product_id": product_id,
+            "rating": rng.randint(1, 5),
+            "text": " ".join(rng.sample(REVIEW_PHRASES, 2)),
+            "reviewer_info": {"size": rng.choice(["XS", "S", "M", "L", "XL"])},
+        }
+        for product_id in range(1, n_products + 1)
+        for _ in range(per_product)
+    ]
+
+
+def make_closet(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """n closet items in the /api/closet/upload payload shape"""
+    rng = random.Random(seed + 2)
+    items = []
+    for _ in range(n):
+        category, nouns, (low, high) = rng.choice(CATEGORIES)
+        items.append(
+            {
+                "brand": rng.choice(BRANDS),
+                "category": category,
+                "color": rng.choice(COLORS),
+                "description": rng.choice(nouns),
+                "price": round(rng.uniform(low, high), 2),
+            }
+        )
+    return items
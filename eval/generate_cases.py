@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Expand the labeled seed cases (eval/cases.jsonl) into a large eval set.
+
+Capsule cases cover the quarter x climate x style x budget grid (their quality
+metrics need no labels). Analyze cases are the labeled seeds with the price
+jittered by at most --jitter, so each keeps its human verdict label.
+Run from repo root: python eval/generate_cases.py --n 5000 --output eval/cases_large.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import random
+from pathlib import Path
+
+EVAL_DIR = Path(__file__).resolve().parent
+
+QUARTERS = ["Q1", "Q2", "Q3", "Q4"]
+CLIMATES = ["cold", "moderate", "warm", "hot"]
+STYLES = [
+    "relaxed, minimal, French",
+    "classic elevated",
+    "effortless",
+    "cozy neutral",
+    "edgy bold",
+    "romantic",
+    "sporty casual",
+    "professional polished",
+    "coastal relaxed",
+    "bohemian",
+    "quiet minimal",
+    "preppy classic",
+]
+BUDGETS = [300, 500, 800, 1000, 1500, 2000, 3000]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seeds", type=Path, default=EVAL_DIR / "cases.jsonl")
+    parser.add_argument("--n", type=int, default=5000)
+    parser.add_argument("--capsule-share", type=float, default=0.4)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=EVAL_DIR / "cases_large.jsonl")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    seeds = [json.loads(line) for line in args.seeds.read_text().splitlines() if line]
+    labeled = [c for c in seeds if c["kind"] == "analyze" and "expect" in c]
+
+    grid = list(itertools.product(QUARTERS, CLIMATES, STYLES, BUDGETS))
+    rng.shuffle(grid)
+    n_capsule = int(args.n * args.capsule_share)
+
+    cases = []
+    for i in range(n_capsule):
+        quarter, climate, style, budget = grid[i % len(grid)]
+        cases.append(
+            {
+                "id": f"capsule-g{i:05d}",
+                "kind": "capsule",
+                "request": {
+                    "quarter": quarter,
+                    "climate": climate,
+                    "style_three_words": style,
+                    "budget": budget,
+                    "shopping_preferences": [],
+                },
+            }
+        )
+    for i in range(args.n - n_capsule):
+        seed = labeled[i % len(labeled)]
+        request = dict(seed["request"])
+        scale = 1 + rng.uniform(-args.jitter, args.jitter)
+        request["price"] = round(request["price"] * scale, 2)
+        cases.append(
+            {
+                "id": f"{seed['id']}-g{i:05d}",
+                "kind": "analyze",
+                "request": request,
+                "expect": seed["expect"],
+            }
+        )
+    rng.shuffle(cases)
+
+    with open(args.output, "w") as f:
+        for case in cases:
+            f.write(json.dumps(case) + "\n")
+    print(f"Wrote {len(cases)} cases to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,294 @@
 #!/usr/bin/env python3
 """
-CapsuleOS evaluation harness (skeleton).
+CapsuleOS evaluation harness.
 
-Runs capsule and scanner APIs against fixed test cases and reports
-response shape, basic assertions, and placeholder metrics.
-Run from repo root: python eval/run_eval.py
-Or from backend with DB: cd backend && python ../eval/run_eval.py
+Runs labeled capsule and scanner cases (JSONL, one case per line) against the
+API and reports response-shape checks, recommendation quality (palette
+coherence, budget adherence, verdict accuracy) and per-case latency, so one run
+shows whether a performance change also moved quality.
+
+Cases run in parallel across a process pool; every process has its own app
+instance (TestClient with startup hooks) on its own copy of the seeded SQLite
+database. Case format:
+  {"id": "...", "kind": "capsule" | "analyze", "request": {...},
+   "expect": {"verdict": "buy"}}   # expect is optional
+
+Run from repo root: python eval/run_eval.py [--cases eval/cases.jsonl] [--workers 4]
+Larger sets: python eval/generate_cases.py --n 5000, then --cases eval/cases_large.jsonl
 """
 
+import argparse
 import json
+import math
+import multiprocessing
 import os
+import shutil
+import subprocess
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-# Run from repo root; ensure backend is on path for main:app
 REPO_ROOT = Path(__file__).resolve().parent.parent
 BACKEND = REPO_ROOT / "backend"
-if str(BACKEND) not in sys.path:
-    sys.path.insert(0, str(BACKEND))
-os.chdir(BACKEND)
+EVAL_DIR = Path(__file__).resolve().parent
+DEFAULT_CASES = EVAL_DIR / "cases.jsonl"
+DEFAULT_DB = BACKEND / "capsuleos.db"
+VERDICTS = ("buy", "wait", "skip")
 
-from fastapi.testclient import TestClient
+# Per-process state (set by _init_worker)
+_client = None
+_capsule_cache = None
 
-from main import app
 
-client = TestClient(app)
+def _init_worker(db_source: str, scratch: str, cold: bool):
+    """Give this process its own database copy and app instance"""
+    global _client, _capsule_cache
+    db_path = os.path.join(scratch, f"eval-{os.getpid()}.db")
+    shutil.copy(db_source, db_path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["WARMUP_ENABLED"] = "false"
+    os.chdir(BACKEND)
+    if str(BACKEND) not in sys.path:
+        sys.path.insert(0, str(BACKEND))
 
-# --- Test cases ---
-CAPSULE_PAYLOAD = {
-    "quarter": "Q1",
-    "climate": "moderate",
-    "style_three_words": "relaxed, minimal, classic",
-    "budget": 800,
-    "shopping_preferences": ["Everlane", "Aritzia"],
-}
+    from loguru import logger
 
-ANALYZE_PAYLOAD = {
-    "product_description": "Classic white crewneck tee",
-    "price": 28.0,
-    "brand": "Everlane",
-}
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
 
+    import asyncio
 
-def eval_capsule():
-    """Call generate-capsule and check response shape and coherence score."""
-    r = client.post("/api/generate-capsule", json=CAPSULE_PAYLOAD)
-    assert r.status_code == 200, f"Capsule API returned {r.status_code}: {r.text}"
-    data = r.json()
-    assert "quarter" in data and data["quarter"] == "Q1"
-    assert "palette" in data and isinstance(data["palette"], list)
-    assert "outfit_formulas" in data and isinstance(data["outfit_formulas"], list)
-    assert "items" in data and len(data["items"]) <= 12
-    assert "do_not_buy" in data
-    scores = data.get("coherence_scores")
-    if scores:
-        total = scores.get("total_score")
-        assert total is not None and 0 <= total <= 1, f"total_score out of range: {total}"
-    return {"ok": True, "items_count": len(data["items"]), "has_scores": scores is not None}
-
-
-def eval_analyze():
-    """Call analyze-item and check verdict and structure."""
-    r = client.post("/api/analyze-item", json=ANALYZE_PAYLOAD)
-    assert r.status_code == 200, f"Analyze API returned {r.status_code}: {r.text}"
-    data = r.json()
-    assert "verdict" in data and data["verdict"] in ("buy", "wait", "skip")
-    assert "pros" in data and isinstance(data["pros"], list)
-    assert "cons" in data and isinstance(data["cons"], list)
-    assert "alternatives" in data and isinstance(data["alternatives"], list)
-    return {"ok": True, "verdict": data["verdict"]}
+    from fastapi.testclient import TestClient
 
+    from main import app
 
-def main():
-    print("CapsuleOS evaluation harness (skeleton)\n")
-    results = {}
+    # Run the startup hooks once; an entered TestClient would keep its portal
+    # thread alive and block the pool worker from exiting
+    asyncio.run(app.router.startup())
+    _client = TestClient(app)
+    if cold:
+        from app.services.cache import capsule_cache
 
-    try:
-        results["capsule"] = eval_capsule()
-        print("  [PASS] Capsule: response shape and coherence score OK")
-    except Exception as e:
-        results["capsule"] = {"ok": False, "error": str(e)}
-        print(f"  [FAIL] Capsule: {e}")
+        _capsule_cache = capsule_cache
+
+
+def check_capsule(case: dict, data: dict) -> dict:
+    """Shape assertions plus palette coherence and budget adherence"""
+    request = case["request"]
+    assert data.get("quarter") == request["quarter"], "quarter mismatch"
+    assert isinstance(data.get("palette"), list), "palette missing"
+    assert isinstance(data.get("outfit_formulas"), list), "outfit_formulas missing"
+    assert isinstance(data.get("items"), list) and len(data["items"]) <= 12, "items"
+    assert "do_not_buy" in data, "do_not_buy missing"
+    scores = data.get("coherence_scores") or {}
+    total = scores.get("total_score")
+    if total is not None:
+        assert 0 <= total <= 1, f"total_score out of range: {total}"
 
+    spend = sum(item["best_value"]["price"] for item in data["items"])
+    budget = request["budget"]
+    return {
+        "palette_score": scores.get("palette_score"),
+        "coherence": total,
+        "items": len(data["items"]),
+        "spend_ratio": spend / budget if budget else None,
+        "within_budget": spend
+        <= budget * case.get("expect", {}).get("max_spend_ratio", 1.0),
+    }
+
+
+def check_analyze(case: dict, data: dict) -> dict:
+    """Shape assertions plus verdict agreement with the label"""
+    assert data.get("verdict") in VERDICTS, f"bad verdict {data.get('verdict')}"
+    for field in ("pros", "cons", "alternatives"):
+        assert isinstance(data.get(field), list), f"{field} missing"
+    expected = case.get("expect", {}).get("verdict")
+    return {
+        "verdict": data["verdict"],
+        "expected": expected,
+        "correct": None if expected is None else data["verdict"] == expected,
+    }
+
+
+ROUTES = {
+    "capsule": ("/api/generate-capsule", check_capsule),
+    "analyze": ("/api/analyze-item", check_analyze),
+}
+
+
+def run_case(case: dict) -> dict:
+    """Run one case in this worker's app; never raises"""
+    result = {"id": case.get("id"), "kind": case.get("kind"), "ok": False}
     try:
-        results["analyze"] = eval_analyze()
-        print("  [PASS] Scanner: verdict and structure OK")
+        path, check = ROUTES[case["kind"]]
+        if _capsule_cache is not None and case["kind"] == "capsule":
+            _capsule_cache.clear()
+        start = time.perf_counter()
+        response = _client.post(path, json=case["request"])
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        assert (
+            response.status_code == 200
+        ), f"{path} returned {response.status_code}: {response.text[:200]}"
+        result["metrics"] = check(case, response.json())
+        result["ok"] = True
     except Exception as e:
-        results["analyze"] = {"ok": False, "error": str(e)}
-        print(f"  [FAIL] Scanner: {e}")
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
 
-    passed = sum(1 for v in results.values() if isinstance(v, dict) and v.get("ok"))
-    total = len(results)
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 4) if values else None
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def aggregate(results: list) -> dict:
+    """Quality and latency summary per case kind"""
+    summary = {}
+    for kind in ROUTES:
+        rows = [r for r in results if r["kind"] == kind]
+        if not rows:
+            continue
+        ok = [r for r in rows if r["ok"]]
+        latencies = [r["latency_ms"] for r in rows if "latency_ms" in r]
+        entry = {
+            "cases": len(rows),
+            "passed": len(ok),
+            "latency_ms": {
+                "p50": _percentile(latencies, 0.50),
+                "p95": _percentile(latencies, 0.95),
+                "p99": _percentile(latencies, 0.99),
+                "mean": _mean(latencies),
+            },
+        }
+        metrics = [r["metrics"] for r in ok]
+        if kind == "capsule":
+            entry["palette_coherence"] = _mean(m["palette_score"] for m in metrics)
+            entry["coherence_total"] = _mean(m["coherence"] for m in metrics)
+            entry["budget_adherence"] = _mean(
+                float(m["within_budget"]) for m in metrics
+            )
+            entry["mean_spend_ratio"] = _mean(m["spend_ratio"] for m in metrics)
+        else:
+            labeled = [m for m in metrics if m["correct"] is not None]
+            entry["labeled"] = len(labeled)
+            entry["verdict_accuracy"] = _mean(float(m["correct"]) for m in labeled)
+            entry["confusion"] = {
+                expected: {
+                    got: sum(
+                        1
+                        for m in labeled
+                        if m["expected"] == expected and m["verdict"] == got
+                    )
+                    for got in VERDICTS
+                }
+                for expected in VERDICTS
+            }
+        summary[kind] = entry
+    return summary
+
+
+def load_cases(path: Path) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def seeded_database(scratch: str) -> str:
+    """Seed a fresh database with the sample catalog (when --db doesn't exist)"""
+    path = os.path.join(scratch, "seed.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+    subprocess.run(
+        [sys.executable, "scripts/seed_db.py"],
+        cwd=BACKEND,
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+    return path
+
+
+def print_summary(summary: dict, failures: list, elapsed: float, workers: int):
+    total = sum(s["cases"] for s in summary.values())
+    passed = sum(s["passed"] for s in summary.values())
+    print(f"Ran {total} cases on {workers} workers in {elapsed:.1f}s\n")
+    if "capsule" in summary:
+        s = summary["capsule"]
+        print(
+            f"  Capsule  {s['passed']}/{s['cases']} ok   "
+            f"palette coherence {s['palette_coherence']}   "
+            f"total coherence {s['coherence_total']}   "
+            f"budget adherence {s['budget_adherence']} "
+            f"(mean spend {s['mean_spend_ratio']}x)"
+        )
+    if "analyze" in summary:
+        s = summary["analyze"]
+        print(
+            f"  Scanner  {s['passed']}/{s['cases']} ok   "
+            f"verdict accuracy {s['verdict_accuracy']} over {s['labeled']} labeled"
+        )
+        for expected, row in s["confusion"].items():
+            counts = "  ".join(f"{got}={n}" for got, n in row.items())
+            print(f"           expected {expected:<4} -> {counts}")
+    print("\n  Latency (ms)      p50       p95       p99")
+    for kind, s in summary.items():
+        lat = s["latency_ms"]
+        print(f"  {kind:<12} {lat['p50']:>9} {lat['p95']:>9} {lat['p99']:>9}")
+    for failure in failures[:10]:
+        print(f"  [FAIL] {failure['id']}: {failure['error']}")
+    if len(failures) > 10:
+        print(f"  ... {len(failures) - 10} more failures")
     print(f"\nResult: {passed}/{total} checks passed")
-    return 0 if passed == total else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CapsuleOS evaluation harness")
+    parser.add_argument("--cases", type=Path, default=DEFAULT_CASES)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help="seeded database")
+    parser.add_argument(
+        "--cold", action="store_true", help="clear the capsule cache before each case"
+    )
+    parser.add_argument("--output", type=Path, help="write summary + cases as JSON")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases)
+    scratch = tempfile.mkdtemp(prefix="capsuleos-eval-")
+    try:
+        db_source = str(args.db) if args.db.exists() else seeded_database(scratch)
+        start = time.monotonic()
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(db_source, scratch, args.cold),
+        ) as pool:
+            chunksize = max(1, len(cases) // (args.workers * 8))
+            results = list(pool.map(run_case, cases, chunksize=chunksize))
+        elapsed = time.monotonic() - start
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    summary = aggregate(results)
+    failures = [r for r in results if not r["ok"]]
+    print("CapsuleOS evaluation harness\n")
+    print_summary(summary, failures, elapsed, args.workers)
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {"elapsed_s": round(elapsed, 2), "summary": summary, "cases": results},
+                indent=2,
+            )
+        )
+        print(f"Report written to {args.output}")
+    return 0 if not failures else 1
 
 
 if __name__ == "__main__":